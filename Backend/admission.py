@@ -0,0 +1,136 @@
+"""
+Admission control for solver workloads.
+
+Every node runs at most a fixed number of solves at once. Further requests wait
+in one queue per priority class, and a freed slot goes to the oldest waiter of
+the most urgent class, so interactive requests overtake batch ones. A request
+arriving at a full queue is turned away at once, with an estimate of when to
+retry based on how long recent solves took, instead of slowing down everyone
+already waiting.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+import asyncio
+import math
+import statistics
+import time
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+# Priority classes, most urgent first.
+PRIORITIES = (INTERACTIVE, BATCH)
+
+class Overloaded(Exception):
+    """
+    Raised for a request turned away because its queue is full.
+
+    Attributes:
+        retry_after (int): Estimated seconds until the request would be admitted.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Solver queue is full, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded wait queue per priority class.
+
+    Counts admitted and rejected requests per class in ``stats``.
+    """
+
+    def __init__(self, concurrency: int = 1, queue_limits: Dict[str, int] = None, default_duration: float = 30.0, window: int = 50):
+        """
+        Args:
+            concurrency (int, optional): Solves running at once. Defaults to 1.
+            queue_limits (Dict[str, int], optional): Requests that may wait, per priority class.
+                Defaults to 8 interactive and 2 batch requests.
+            default_duration (float, optional): Seconds a solve is assumed to take before any was
+                observed. Defaults to 30.
+            window (int, optional): Number of recent solve durations the estimates use. Defaults to 50.
+        """
+        self.concurrency = concurrency
+        self.queue_limits = queue_limits if queue_limits is not None else {INTERACTIVE: 8, BATCH: 2}
+        self.default_duration = default_duration
+        self.running = 0
+        self.stats = {f'{outcome}_{priority}': 0 for priority in PRIORITIES for outcome in ('admitted', 'rejected')}
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        self._durations = deque(maxlen=window)
+
+    def queued(self, priority: str) -> int:
+        """
+        Returns:
+            int: Requests waiting that would be admitted before a new one of the given class.
+        """
+        return sum(len(self._waiters[urgent]) for urgent in PRIORITIES[:PRIORITIES.index(priority) + 1])
+
+    def retry_after(self, priority: str) -> int:
+        """
+        Estimate the seconds until a new request of the given class would be admitted.
+
+        The requests ahead of it, plus itself, share the slots, and each takes as
+        long as the recent solves did on average.
+
+        Returns:
+            int: Whole seconds, at least one.
+        """
+        duration = statistics.mean(self._durations) if self._durations else self.default_duration
+        return max(1, math.ceil(duration * (self.queued(priority) + 1) / self.concurrency))
+
+    @asynccontextmanager
+    async def admit(self, priority: str = INTERACTIVE, record: bool = True):
+        """
+        Hold a solver slot for the duration of the block, waiting for one if needed.
+
+        Args:
+            priority (str, optional): Priority class, one of PRIORITIES. Defaults to INTERACTIVE.
+            record (bool, optional): Whether the block is a solve whose duration the retry
+                estimates learn from. Work paced by something else, such as a client reading
+                a stream, passes False. Defaults to True.
+
+        Raises:
+            ValueError: For an unknown priority class.
+            Overloaded: When the queue of the class is full.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        await self._acquire(priority)
+        self.stats[f'admitted_{priority}'] += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            if record:
+                self._durations.append(time.monotonic() - started)
+            self._release()
+
+    async def _acquire(self, priority: str) -> None:
+        if self.running < self.concurrency and not self.queued(priority):
+            self.running += 1
+            return
+        waiters = self._waiters[priority]
+        if len(waiters) >= self.queue_limits[priority]:
+            self.stats[f'rejected_{priority}'] += 1
+            raise Overloaded(self.retry_after(priority))
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            # The releasing request hands its slot over by resolving the waiter
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.running -= 1
@@ -1,12 +1,20 @@
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import HTMLResponse
-from csp import generate
-from model import Constraint, Course, CreateConstraint, CreateCourse, TimetableAIModel, train_ai_model, predict_timetable, ConstraintTemplate, ConstraintTemplateManager, TimetableCommit, TimetableBranch, commit_timetable, get_commits, get_commit, merge_commits, branch_commit
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from starlette.background import BackgroundTask
+from starlette.responses import HTMLResponse, StreamingResponse
+from csp import iter_timetables, OPTIMAL, INFEASIBLE
+from cache import SingleFlight, SolutionCache, problem_key
+from jobs import JobQueue, DONE, FAILED, job_status, solve_inputs
+from sandbox import SolverPool, LimitExceeded, WorkerLost
+from admission import AdmissionController, Overloaded, BATCH, INTERACTIVE, PRIORITIES
+from model import Constraint, Course, CreateConstraint, CreateCourse, TimetableAIModel, ConstraintTemplate, ConstraintTemplateManager, TimetableCommit, TimetableBranch, commit_timetable, get_commits, get_commit, merge_commits, branch_commit
+from fastapi import FastAPI, HTTPException, Depends, Query, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import motor.motor_asyncio
 import hypercorn.asyncio
 import os
+import asyncio
+import contextlib
+import json
 import logging
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
@@ -37,6 +45,29 @@ load_dotenv()
 # Get the MongoDB connection string from environment variables
 MONGODB_CONNECTION_STRING = os.getenv('MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017/timetable')
 
+# Search budget of a single timetable generation, in seconds and search nodes (0 disables the node budget)
+SOLVER_TIME_LIMIT = float(os.getenv('SOLVER_TIME_LIMIT', '30'))
+SOLVER_NODE_LIMIT = int(os.getenv('SOLVER_NODE_LIMIT', '0')) or None
+# Number of solver processes racing in portfolio mode (1 searches in the request's own process)
+SOLVER_WORKERS = int(os.getenv('SOLVER_WORKERS', '1'))
+# Timetables kept in the in-process tier of the solution cache, and seconds they are kept in Redis
+SOLUTION_CACHE_SIZE = int(os.getenv('SOLUTION_CACHE_SIZE', '128'))
+SOLUTION_CACHE_TTL = int(os.getenv('SOLUTION_CACHE_TTL', '86400'))
+# Sandboxed solver processes of this node, tasks each runs before it is replaced, CPU seconds
+# of a task and megabytes of address space of a process (0 disables a limit)
+SOLVER_POOL_SIZE = int(os.getenv('SOLVER_POOL_SIZE', '0')) or None
+SOLVER_POOL_MAX_TASKS = int(os.getenv('SOLVER_POOL_MAX_TASKS', '50'))
+SOLVER_CPU_LIMIT = float(os.getenv('SOLVER_CPU_LIMIT', '120')) or None
+SOLVER_MEMORY_LIMIT = int(os.getenv('SOLVER_MEMORY_LIMIT', '2048')) * 2 ** 20 or None
+# Solves this node runs at once (0 shares the solver processes between solves, each using
+# SOLVER_WORKERS processes in portfolio mode), and interactive and batch requests that may
+# wait for a slot before new ones are turned away
+SOLVER_CONCURRENCY = int(os.getenv('SOLVER_CONCURRENCY', '0'))
+SOLVER_QUEUE_LIMIT = int(os.getenv('SOLVER_QUEUE_LIMIT', '8'))
+SOLVER_BATCH_QUEUE_LIMIT = int(os.getenv('SOLVER_BATCH_QUEUE_LIMIT', '2'))
+# Seconds a generation job stays claimed by a worker that stopped renewing its lease
+JOB_LEASE = float(os.getenv('JOB_LEASE', '60'))
+
 client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_CONNECTION_STRING, maxPoolSize=50, minPoolSize=10)
 database = client.timetable
 courses_collection = database.courses
@@ -47,9 +78,26 @@ timetables_collection = database.timetables
 collaboration_collection = database.collaboration
 commits_collection = database.commits
 branches_collection = database.branches
+jobs_collection = database.jobs
 
 app = FastAPI()
 
+# Solutions of previously generated timetables; the Redis tier is attached on startup
+solution_cache = SolutionCache(maxsize=SOLUTION_CACHE_SIZE, ttl=SOLUTION_CACHE_TTL)
+# In-flight solves shared by concurrent requests for the same inputs; the Redis lock is attached
+# on startup and renewed while its solve waits for a slot and runs
+single_flight = SingleFlight(lock_ttl=30)
+# Solver processes of the synchronous endpoint; they are started on startup
+solver_pool = SolverPool(size=SOLVER_POOL_SIZE, max_tasks=SOLVER_POOL_MAX_TASKS, cpu_limit=SOLVER_CPU_LIMIT, memory_limit=SOLVER_MEMORY_LIMIT)
+# Bounds the solves waiting for and running in the solver pool
+admission = AdmissionController(
+    concurrency=SOLVER_CONCURRENCY or max(1, solver_pool.size // SOLVER_WORKERS),
+    queue_limits={INTERACTIVE: SOLVER_QUEUE_LIMIT, BATCH: SOLVER_BATCH_QUEUE_LIMIT},
+    default_duration=SOLVER_TIME_LIMIT
+)
+# Generation jobs, solved by the worker processes started with `python jobs.py`
+job_queue = JobQueue(jobs_collection, lease=JOB_LEASE)
+
 origins = [
     "http://localhost:3000",
 ]
@@ -604,6 +652,10 @@ async def on_startup() -> None:
     """
     redis = await aioredis.create_redis_pool("redis://localhost", minsize=5, maxsize=10)
     await FastAPILimiter.init(redis)
+    solution_cache.redis = redis
+    single_flight.redis = redis
+    await job_queue.ensure_indexes()
+    solver_pool.start()
     sentry_sdk.init(
         dsn=os.getenv('SENTRY_DSN'),
         integrations=[FastAPIIntegration()]
@@ -611,6 +663,13 @@ async def on_startup() -> None:
     start_http_server(8001)  # Start Prometheus metrics server
     Instrumentator().instrument(app).expose(app)
 
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    """
+    Event handler for application shutdown.
+    """
+    solver_pool.shutdown()
+
 @app.get("/get-courses", dependencies=[Depends(RateLimiter(times=10, seconds=60))])
 @cached(ttl=60)
 async def get_courses(current_user: User = Depends(get_current_active_user), skip: int = 0, limit: int = 10) -> List[Course]:
@@ -642,6 +701,7 @@ async def post_course(course: CreateCourse, current_user: User = Depends(get_cur
     """
     document = course.dict()
     await courses_collection.insert_one(document)
+    await solution_cache.clear()
     return document
 
 @app.post("/add-constraints", response_model=Constraint)
@@ -651,12 +711,14 @@ async def post_constraints(constraint: CreateConstraint, current_user: User = De
     """
     document = constraint.dict()
     await constraints_collection.insert_one(document)
+    await solution_cache.clear()
     return document
 
-@app.get("/generate-timetable")
-async def generate_timetable(current_user: User = Depends(get_current_active_user)) -> dict:
+async def load_solver_inputs() -> Optional[tuple]:
     """
-    Endpoint to generate a timetable based on constraints and courses.
+    Load the latest constraints and every course as the solver expects them.
+
+    Returns None when either is missing.
     """
     constraints = []
     cursor = constraints_collection.find({})
@@ -669,26 +731,224 @@ async def generate_timetable(current_user: User = Depends(get_current_active_use
         courses.append(Course(**document))
 
     if not constraints or not courses:
+        return None
+    return constraints[-1].dict(), [item.dict() for item in courses]
+
+@app.get("/generate-timetable")
+async def generate_timetable(response: Response, warm_start: bool = False, priority: str = INTERACTIVE, current_user: User = Depends(get_current_active_user)) -> dict:
+    """
+    Endpoint to generate a timetable based on constraints and courses.
+
+    The search stops after SOLVER_TIME_LIMIT seconds and returns the best timetable
+    found so far, with its status and rule violations; the status and the search
+    statistics are also sent as headers. With
+    SOLVER_WORKERS above 1, several search strategies race in separate processes.
+    Optimal and infeasible results are cached by the canonical hash of the inputs.
+    With warm_start, a changed problem is repaired starting from the latest optimal
+    timetable, so only the lectures affected by the change move; a failed repair
+    falls back to a search from scratch. Concurrent requests
+    for the same inputs share one search, across app processes through Redis. The
+    search runs in the sandboxed solver pool of this node and fails with 503 when it
+    breaks the pool's CPU time or memory limits; /timetable-jobs hands it to the
+    worker processes instead. At most SOLVER_CONCURRENCY searches run at once; the
+    others wait, interactive ones before batch ones, and requests arriving at a full
+    queue get 429 with a Retry-After estimated from recent search durations. A
+    request sharing the search of a rejected one is not rejected with it, but
+    waits for a slot of its own priority.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority class: {priority}")
+    inputs = await load_solver_inputs()
+    if inputs is None:
         logger.error("Constraints or courses are missing")
         return HTMLResponse(status_code=400)
+    constraints, courses = inputs
+    key = problem_key(constraints, courses)
+    cached = await solution_cache.get(key)
+    if cached is not None:
+        set_solver_headers(response, cached, "hit")
+        return timetable_body(cached)
+
+    rejected = False
+
+    async def computeTimetable() -> dict:
+        nonlocal rejected
+        previous = await solution_cache.latest() if warm_start else None
+        try:
+            async with admission.admit(priority):
+                result = await asyncio.wrap_future(solver_pool.submit(
+                    solve_inputs, constraints, courses, previous["timetable"] if previous is not None else None,
+                    workers=SOLVER_WORKERS, time_limit=SOLVER_TIME_LIMIT, node_limit=SOLVER_NODE_LIMIT
+                ))
+        except Overloaded as error:
+            logger.warning(f"Timetable generation rejected: {error}")
+            rejected = True
+            raise HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+        except (LimitExceeded, WorkerLost) as error:
+            logger.error(f"Timetable generation aborted: {error}")
+            raise HTTPException(status_code=503, detail=f"Timetable generation aborted: {error}")
+        if result.status != OPTIMAL:
+            logger.warning(f"Timetable generation ended {result.status}: {result.violations} {result.reasons}")
+        data = result.to_dict()
+        # Budget-limited results may improve on a later attempt, so only settled ones are cached
+        if result.status in (OPTIMAL, INFEASIBLE):
+            await solution_cache.set(key, data)
+        return data
+
+    # Concurrent requests for the same inputs, on any app process, wait for a single solve
+    while True:
+        try:
+            data, shared = await single_flight.run(key, computeTimetable)
+            break
+        except HTTPException as error:
+            # The leader was admitted with its own priority; a follower turned away
+            # with it tries again, leading the next search if nobody else does
+            if error.status_code != 429 or rejected:
+                raise
+            logger.info("Timetable generation shared a rejected search, retrying")
+    set_solver_headers(response, data, "shared" if shared else "miss")
+    if "moved" in data["stats"]:
+        response.headers["X-Solver-Moved"] = str(data["stats"]["moved"])
+    return timetable_body(data)
+
+@app.post("/timetable-jobs", status_code=202)
+async def submit_timetable_job(warm_start: bool = False, current_user: User = Depends(get_current_active_user)) -> dict:
+    """
+    Endpoint to queue the generation of a timetable for the current constraints and courses.
+
+    The job is solved by a worker process; poll its status and fetch the timetable
+    once it is done. A cached result completes the job right away.
+    """
+    inputs = await load_solver_inputs()
+    if inputs is None:
+        logger.error("Constraints or courses are missing")
+        return HTMLResponse(status_code=400)
+    constraints, courses = inputs
+    cached = await solution_cache.get(problem_key(constraints, courses))
+    job = await job_queue.submit(constraints, courses, warm_start, result=cached)
+    return job_status(job)
 
-    courses = [item.dict() for item in courses]
+@app.get("/timetable-jobs/{job_id}")
+async def get_timetable_job(job_id: str, current_user: User = Depends(get_current_active_user)) -> dict:
+    """
+    Endpoint to poll the status of a timetable generation job.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
 
-    # Load historical data in the specified format
-    historical_data = [
-        {"features": [0.1, 0.2, 0.3], "label": 1},
-        {"features": [0.4, 0.5, 0.6], "label": 0}
-    ]
+@app.get("/timetable-jobs/{job_id}/result")
+async def get_timetable_job_result(job_id: str, response: Response, current_user: User = Depends(get_current_active_user)) -> dict:
+    """
+    Endpoint to fetch the timetable of a finished generation job, with the same
+    solver headers as /generate-timetable.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = job["result"]
+    set_solver_headers(response, result, "hit" if job["cached"] else "miss")
+    if "moved" in result["stats"]:
+        response.headers["X-Solver-Moved"] = str(result["stats"]["moved"])
+    return timetable_body(result)
+
+@app.delete("/timetable-jobs/{job_id}")
+async def cancel_timetable_job(job_id: str, current_user: User = Depends(get_current_active_user)) -> dict:
+    """
+    Endpoint to cancel a queued or running timetable generation job.
+
+    A running job's solver process is killed when its worker next renews the lease.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job_status(await job_queue.get(job_id))
 
-    # Use AI model for timetable prediction
-    ai_model = train_ai_model(historical_data)
+def timetable_body(result: dict) -> dict:
+    """
+    Build the response body of a solve result: the timetable with its status and rule
+    violations, so a least violating timetable is not mistaken for a valid one.
+    """
+    return {**(result["timetable"] or {}), "status": result["status"], "violations": result["violations"]}
 
-    # Prepare input data in the specified format
-    input_data = [0.7, 0.8, 0.9]
-    predicted_timetable = predict_timetable(ai_model, input_data)
+def set_solver_headers(response: Response, result: dict, cache: str) -> None:
+    """
+    Report the status and search statistics of a solve result as response headers.
+    """
+    response.headers["X-Solver-Status"] = result["status"]
+    response.headers["X-Solver-Nodes"] = str(result["stats"].get("nodes", 0))
+    if result["stats"].get("strategy"):
+        response.headers["X-Solver-Strategy"] = result["stats"]["strategy"]
+    response.headers["X-Solver-Elapsed"] = f"{result['stats'].get('elapsed', 0.0):.3f}"
+    response.headers["X-Solver-Cache"] = cache
 
-    data = generate(constraints[-1].dict(), courses)
-    return data
+@app.get("/timetable-alternatives")
+async def timetable_alternatives(limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0), priority: str = INTERACTIVE, current_user: User = Depends(get_current_active_user)) -> StreamingResponse:
+    """
+    Endpoint to stream distinct alternative timetables as newline-delimited JSON.
+
+    Alternatives are computed lazily, so the first one is sent as soon as it is
+    found. Pages are selected with offset and limit; the whole stream shares the
+    SOLVER_TIME_LIMIT budget. The enumeration runs in the sandboxed solver pool:
+    its process is killed when the client disconnects, and a limit breach ends
+    the stream early. The stream holds a solver slot while it runs, admitted like
+    the searches of /generate-timetable; as its pace is set by the client, it is
+    left out of the solve durations Retry-After is estimated from.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority class: {priority}")
+    inputs = await load_solver_inputs()
+    if inputs is None:
+        logger.error("Constraints or courses are missing")
+        return HTMLResponse(status_code=400)
+    constraints, courses = inputs
+
+    slot = contextlib.AsyncExitStack()
+    try:
+        await slot.enter_async_context(admission.admit(priority, record=False))
+    except Overloaded as error:
+        logger.warning(f"Timetable alternatives rejected: {error}")
+        raise HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+    try:
+        loop = asyncio.get_running_loop()
+        found = asyncio.Queue()
+        task = solver_pool.stream(
+            lambda timetable: loop.call_soon_threadsafe(found.put_nowait, timetable),
+            iter_timetables, constraints, courses, limit=offset + limit, time_limit=SOLVER_TIME_LIMIT, node_limit=SOLVER_NODE_LIMIT
+        )
+        # Closing the slot stops the search first, then frees the slot
+        slot.callback(task.cancel)
+        # Queued after every alternative, as both come from the pool thread serving the task
+        task.add_done_callback(lambda _: loop.call_soon_threadsafe(found.put_nowait, None))
+    except BaseException:
+        # No response will close the slot, so it is freed before the error is raised
+        await slot.aclose()
+        raise
+
+    async def streamAlternatives():
+        try:
+            index = 0
+            while True:
+                timetable = await found.get()
+                if timetable is None:
+                    break
+                if index >= offset:
+                    yield json.dumps({"index": index, "timetable": timetable}) + "\n"
+                index += 1
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Timetable alternatives aborted: {task.exception()}")
+        finally:
+            await slot.aclose()
+
+    # The background task also stops a search whose stream was never started
+    return StreamingResponse(streamAlternatives(), media_type="application/x-ndjson", background=BackgroundTask(slot.aclose))
 
 class UpdateCourse(BaseModel):
     name: str
@@ -708,6 +968,7 @@ async def update_course(course_id: str, course: UpdateCourse, current_user: User
     if result.matched_count == 0:
         logger.error(f"Course with id {course_id} not found")
         raise HTTPException(status_code=404, detail="Course not found")
+    await solution_cache.clear()
     updated_course = await courses_collection.find_one({"_id": course_id})
     return updated_course
 
@@ -0,0 +1,525 @@
+"""
+Benchmarks for the timetable solvers.
+
+Run from the Backend directory:
+
+    python benchmark.py
+
+Each fixture is solved with the current formulation used by ``csp.solve`` and
+with the legacy formulation, where every rule was a single function constraint
+over all time slots. Search effort is reported as visited nodes; the legacy runs
+are capped at ``NODE_CAP`` nodes since they degenerate into brute force. The
+genetic solver is timed over ``GENERATIONS`` generations per fixture, and its time
+to the first timetable keeping every hard rule is compared with the legacy scoring,
+which only counted the rules a timetable kept entirely, over ``SEEDS`` seeds. The
+island model runs ``ISLANDS`` populations of the same size for the same number of
+generations, and is compared with a single population on the penalty it reaches.
+The memetic mode refines every new elite genome with up to ``REFINE_STEPS`` swaps.
+Min-conflicts local search is compared with backtracking, capped at ``TIME_LIMIT``
+seconds, on week-long instances of ``SCALED_HOURS`` hours per day. The variable and
+value orderings of the backtracking search are compared on every fixture and on
+week-long instances of ``ORDERING_HOURS`` hours per day, capped at ``NODE_CAP`` nodes
+and ``TIME_LIMIT`` seconds. The conflict-directed backjumping engine is compared with
+the backtracking search, under the same caps, on every fixture and on infeasible weeks
+of ``LATE_DAYS`` days whose late slots only one lecture can take. Symmetry breaking
+is measured by enumerating every timetable of ``IDENTICAL_WEEKS`` weeks of identical
+days, and by the first timetable of every fixture, for each set of broken symmetries.
+"""
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from constraint import Problem
+from islands import solve_islands
+from csp import EMPTY_SLOT, LECTURES, OPTIMAL, ORDERINGS, SYMMETRIES, BackjumpingSolver, CompiledProblem, TimetableSolver, build_model, compile_problem, get_time_slots, pair_rule, solve, solve_genetic, solve_min_conflicts, weighted_penalty
+
+NODE_CAP = 200000
+GENERATIONS = 1000
+SEEDS = 5
+ISLANDS = 4
+REFINE_STEPS = 20
+TIME_LIMIT = 5
+SCALED_HOURS = (100, 300, 700)
+ORDERING_HOURS = (10, 14)
+LATE_DAYS = (2, 3, 4)
+IDENTICAL_WEEKS = ((2, 1), (3, 2), (3, 3))
+
+COURSES = [
+    {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+]
+
+FIXTURES = {
+    # The fixture used throughout tests/test_csp.py (14 slots for 8 lecture hours).
+    "test_csp": (
+        {
+            "working_days": [
+                {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 8},
+                {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 8}
+            ],
+            "consecutive_subjects": ["Math", "Science"],
+            "non_consecutive_subjects": ["History", "Art"]
+        },
+        COURSES
+    ),
+    # The same courses on days sized so that the lectures exactly fill the week.
+    "test_csp_feasible": (
+        {
+            "working_days": [
+                {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+                {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+            ],
+            "consecutive_subjects": [""],
+            "non_consecutive_subjects": ["History", "Art"]
+        },
+        COURSES
+    ),
+    # A full week with a double-period lab and restricted teacher windows.
+    "week_blocks": (
+        {
+            "working_days": [
+                {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 7}
+                for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+            ],
+            "consecutive_subjects": [""],
+            "non_consecutive_subjects": ["History", "Art"]
+        },
+        [dict(course, lectureno=4) for course in COURSES] + [
+            {"name": "Music", "lectureno": 4, "duration": 1, "start_hr": 12, "end_hr": 17},
+            {"name": "Lab", "lectureno": 5, "duration": 2, "start_hr": 9, "end_hr": 17}
+        ]
+    ),
+    # A full week where most courses are confined to a part of the day.
+    "week_windows": (
+        {
+            "working_days": [
+                {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 8}
+                for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+            ],
+            "consecutive_subjects": [""],
+            "non_consecutive_subjects": ["History", "Art"]
+        },
+        [
+            {"name": "Math", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 11},
+            {"name": "Science", "lectureno": 5, "duration": 1, "start_hr": 11, "end_hr": 14},
+            {"name": "History", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+            {"name": "Art", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+            {"name": "Music", "lectureno": 6, "duration": 1, "start_hr": 14, "end_hr": 17},
+            {"name": "PE", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+            {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17}
+        ]
+    ),
+}
+
+
+def legacy_problem(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], solver: TimetableSolver) -> Problem:
+    """
+    Build the problem the way ``generate`` did before its rules were decomposed.
+    """
+    constraints_dict = {}
+    start_times = {}
+    end_times = {2: [], 3: []}
+    offset = 0
+    subject_hrs = {}
+    subjects = []
+    subject_data = {}
+    consecutive_subjects = {}
+
+    for course in constraints["working_days"]:
+        constraints_dict[course["day"]] = course["total_hours"]
+        start_times[course["day"]] = int(course["start_hr"])
+        end_times[2].append((int(course["total_hours"]) - 2) + offset)
+        for i in range(int(course["total_hours"]) - 3 + offset, int(course["total_hours"]) - 1 + offset):
+            end_times[3].append(i)
+        offset += int(course["total_hours"]) - 1
+
+    for item in courses:
+        subject_hrs[item["name"]] = int(item['lectureno']) * int(item["duration"])
+        subjects.append(item["name"])
+        subject_data[item['name']] = {'start_hr': int(item['start_hr']), 'end_hr': int(item['end_hr'])}
+        if item["duration"] != 1:
+            consecutive_subjects[item["name"]] = item["duration"]
+
+    time_slots, slot_time, mapping = get_time_slots(constraints_dict, start_times)
+
+    def everySubject(*Timetable: str) -> bool:
+        return all(Timetable.count(subject) == subject_hrs[subject] for subject in subjects)
+
+    def sameConsecutive(*Timetable: str) -> bool:
+        for key, value in consecutive_subjects.items():
+            index = Timetable.index(key)
+            if (value == 2 and index in end_times[2]) or (value == 3 and index in end_times[3]):
+                return False
+            for i in range(value - 1):
+                if Timetable[index + i + 1] != key:
+                    return False
+        return True
+
+    def teacherTimings(*Timetable: str) -> bool:
+        for i, subject in enumerate(Timetable):
+            hour = slot_time[time_slots[i]]
+            if hour < subject_data[subject]["start_hr"] or hour >= subject_data[subject]["end_hr"]:
+                return False
+        return True
+
+    def pairs(pair: List[str], together: bool):
+        def rule(*Timetable: str) -> bool:
+            for i, subject in enumerate(Timetable):
+                if subject not in pair[:2]:
+                    continue
+                other = pair[1] if subject == pair[0] else pair[0]
+                neighbours = Timetable[max(i - 1, 0):i] + Timetable[i + 1:i + 2]
+                if together and any(value != other for value in neighbours):
+                    return False
+                if not together and other in neighbours:
+                    return False
+            return True
+        return rule
+
+    Scheduling = Problem(solver)
+    Scheduling.addVariables(time_slots, subjects)
+    Scheduling.addConstraint(everySubject, time_slots)
+    Scheduling.addConstraint(sameConsecutive, time_slots)
+    Scheduling.addConstraint(teacherTimings, time_slots)
+    if len(constraints['consecutive_subjects']) > 1 and constraints['consecutive_subjects'][0] != "":
+        Scheduling.addConstraint(pairs(constraints['consecutive_subjects'], True), time_slots)
+    if len(constraints['non_consecutive_subjects']) > 1 and constraints['non_consecutive_subjects'][0] != "":
+        Scheduling.addConstraint(pairs(constraints['non_consecutive_subjects'], False), time_slots)
+    return Scheduling
+
+
+def run() -> None:
+    """
+    Solve every fixture with both formulations and print the search effort.
+    """
+    print(f"{'fixture':<20} {'model':<8} {'nodes':>10} {'backtracks':>11} {'solved':>7} {'seconds':>9}")
+    for name, (constraints, courses) in FIXTURES.items():
+        solver = TimetableSolver(max_nodes=NODE_CAP)
+        started = time.perf_counter()
+        solved = legacy_problem(constraints, courses, solver).getSolution() is not None
+        elapsed = time.perf_counter() - started
+        nodes = f"{'>' if solver.stats['exhausted'] else ''}{solver.stats['nodes']}"
+        print(f"{name:<20} {'legacy':<8} {nodes:>10} {solver.stats['backtracks']:>11} {str(solved):>7} {elapsed:>9.3f}")
+
+        solver = TimetableSolver()
+        started = time.perf_counter()
+        solved = solve(constraints, courses, solver).status == OPTIMAL
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20} {'current':<8} {solver.stats['nodes']:>10} {solver.stats['backtracks']:>11} {str(solved):>7} {elapsed:>9.3f}")
+
+
+def run_genetic() -> None:
+    """
+    Time the genetic solver on every fixture and print its throughput.
+
+    Early termination is disabled so every run goes through all generations.
+    """
+    print(f"{'fixture':<20} {'generations/s':>14}")
+    for name, (constraints, courses) in FIXTURES.items():
+        problem = compile_problem(constraints, courses)
+        started = time.perf_counter()
+        solve_genetic(problem, generations=GENERATIONS, target_penalty=None)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<20} {GENERATIONS / elapsed:>14.1f}")
+
+
+def legacy_genetic(problem: CompiledProblem, generations: int) -> Tuple[Optional[Tuple[int, float]], List[int]]:
+    """
+    Run the genetic solver with the scoring it used before penalties were graded.
+
+    A genome scored one point for teacher timings, one if every lecture count was
+    met, one if no lecture blocks clashed and one per subject pair rule kept in every
+    slot, so most genomes tied.
+
+    Returns:
+        Tuple[Optional[Tuple[int, float]], List[int]]: Generation and seconds after which a
+        genome first kept every hard rule (None if none did), and the fittest timetable.
+    """
+    started = time.perf_counter()
+    size = problem.size
+    hours = problem.hours.tolist()
+    slot_day = problem.slot_day.tolist()
+    multi_hour = problem.duration > 1
+    blocks = [(subject, int(problem.duration[subject])) for subject, _ in problem.blocks]
+    gene_domains = [[subject for subject in range(len(hours)) if problem.eligible[subject, slot] and not multi_hour[subject]] or [EMPTY_SLOT] for slot in range(size)]
+    gene_domains.extend(problem.start_slots(subject) for subject, _ in problem.blocks)
+    pair_rules = [pair_rule(pair, together) for pair, together in ((problem.together, True), (problem.apart, False)) if pair]
+
+    def decode(genome: List[int]) -> List[int]:
+        timetable = genome[:size]
+        for (subject, duration), start in zip(blocks, genome[size:]):
+            timetable[start:start + duration] = [subject] * duration
+        return timetable
+
+    def counts_met(timetable: List[int]) -> bool:
+        return all(timetable.count(subject) == hour for subject, hour in enumerate(hours)) and EMPTY_SLOT not in timetable
+
+    def blocks_apart(genome: List[int]) -> bool:
+        placed = list(zip(blocks, genome[size:]))
+        for i, ((subject, duration), start) in enumerate(placed):
+            for (other, other_duration), other_start in placed[i + 1:]:
+                gap = duration if other_start >= start else other_duration
+                if abs(other_start - start) < gap or (subject == other and abs(other_start - start) == gap and slot_day[start] == slot_day[other_start]):
+                    return False
+        return True
+
+    def fitness(genome: List[int]) -> Tuple[int, bool]:
+        timetable = decode(genome)
+        hard = [counts_met(timetable), blocks_apart(genome)]
+        pairs = [all(rule(left, right) for left, right in zip(timetable, timetable[1:])) for rule in pair_rules]
+        return 1 + sum(hard) + sum(pairs), all(hard)
+
+    reached = None
+    population = [[random.choice(domain) for domain in gene_domains] for _ in range(100)]
+    for generation in range(generations):
+        scored = sorted(((fitness(genome), genome) for genome in population), key=lambda item: item[0][0], reverse=True)
+        if reached is None and any(feasible for (_, feasible), _ in scored):
+            reached = generation, time.perf_counter() - started
+        population = [genome for _, genome in scored]
+        next_generation = population[:10]
+        for _ in range(90):
+            parent1 = random.choice(population[:50])
+            parent2 = random.choice(population[:50])
+            crossover_point = random.randint(0, len(parent1) - 1)
+            child = parent1[:crossover_point] + parent2[crossover_point:]
+            for i in range(len(child)):
+                if random.random() < 0.01:
+                    child[i] = random.choice(gene_domains[i])
+            next_generation.append(child)
+        population = next_generation
+    return reached, decode(population[0])
+
+def run_time_to_feasible() -> None:
+    """
+    Compare how fast the legacy and the graded scoring reach a timetable keeping every hard rule,
+    and the median weighted penalty of the timetables they return.
+    """
+    print(f"{'fixture':<20} {'scoring':<8} {'feasible':>9} {'generations':>12} {'seconds':>9} {'penalty':>8}")
+    for name, (constraints, courses) in FIXTURES.items():
+        problem = compile_problem(constraints, courses)
+        for scoring in ('legacy', 'graded'):
+            reached = []
+            penalties = []
+            for seed in range(SEEDS):
+                random.seed(seed)
+                if scoring == 'legacy':
+                    result, values = legacy_genetic(problem, GENERATIONS)
+                else:
+                    stats = {}
+                    values = solve_genetic(problem, generations=GENERATIONS, stats=stats)
+                    result = (stats['feasible_at'], stats['feasible_after']) if stats['feasible_at'] is not None else None
+                if result is not None:
+                    reached.append(result)
+                penalties.append(weighted_penalty(problem.violations(values)))
+            generations = f"{statistics.median(g for g, _ in reached):.0f}" if reached else '-'
+            seconds = f"{statistics.median(s for _, s in reached):.3f}" if reached else '-'
+            print(f"{name:<20} {scoring:<8} {f'{len(reached)}/{SEEDS}':>9} {generations:>12} {seconds:>9} {statistics.median(penalties):>8.0f}")
+
+
+def run_islands() -> None:
+    """
+    Compare the median penalty and seconds of a single population and of the island model.
+    """
+    print(f"{'fixture':<20} {'islands':>7} {'penalty':>8} {'seconds':>9}")
+    for name, (constraints, courses) in FIXTURES.items():
+        problem = compile_problem(constraints, courses)
+        for islands in (1, ISLANDS):
+            penalties = []
+            durations = []
+            for seed in range(SEEDS):
+                random.seed(seed)
+                started = time.perf_counter()
+                if islands == 1:
+                    values = solve_genetic(problem, generations=GENERATIONS)
+                else:
+                    values = solve_islands(problem, islands, generations=GENERATIONS)
+                durations.append(time.perf_counter() - started)
+                penalties.append(weighted_penalty(problem.violations(values)))
+            print(f"{name:<20} {islands:>7} {statistics.median(penalties):>8.0f} {statistics.median(durations):>9.3f}")
+
+
+def run_memetic() -> None:
+    """
+    Compare the plain and the memetic genetic solver on generations, seconds and penalty.
+    """
+    print(f"{'fixture':<20} {'refine':>6} {'generations':>12} {'seconds':>9} {'penalty':>8}")
+    for name, (constraints, courses) in FIXTURES.items():
+        problem = compile_problem(constraints, courses)
+        for refine_steps in (0, REFINE_STEPS):
+            runs = []
+            for seed in range(SEEDS):
+                random.seed(seed)
+                stats = {}
+                solve_genetic(problem, generations=GENERATIONS, refine_steps=refine_steps, stats=stats)
+                runs.append((stats['generations'], stats['elapsed'], stats['penalty']))
+            generations, seconds, penalty = (statistics.median(run[column] for run in runs) for column in range(3))
+            print(f"{name:<20} {refine_steps:>6} {generations:>12.0f} {seconds:>9.3f} {penalty:>8.0f}")
+
+
+def scaled_fixture(hours: int) -> Tuple[Dict[str, List[Dict[str, int]]], List[Dict[str, int]]]:
+    """
+    Build a seven day week of the given hours per day, filled exactly by five courses.
+    """
+    slots = 7 * hours
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 0, "end_hr": 24, "total_hours": hours + 1}
+            for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "History", "lectureno": slots // 4, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6},
+        {"name": "Art", "lectureno": slots // 4, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6},
+        {"name": "Lab", "lectureno": 7, "duration": 2, "start_hr": 0, "end_hr": hours // 2},
+        {"name": "Music", "lectureno": slots // 10, "duration": 1, "start_hr": hours // 2, "end_hr": 10 ** 6},
+        {"name": "Math", "lectureno": slots - slots // 4 * 2 - 14 - slots // 10, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6}
+    ]
+    return constraints, courses
+
+
+def run_min_conflicts() -> None:
+    """
+    Compare min-conflicts and backtracking on instances of thousands of slots.
+    """
+    print(f"{'slots':>6} {'solver':<14} {'status':<10} {'steps/nodes':>11} {'seconds':>9}")
+    for hours in SCALED_HOURS:
+        constraints, courses = scaled_fixture(hours)
+        problem = compile_problem(constraints, courses)
+        random.seed(0)
+        stats = {}
+        values = solve_min_conflicts(problem, time_limit=TIME_LIMIT, stats=stats)
+        status = OPTIMAL if not any(problem.violations(values).values()) else f"penalty {stats['penalty']}"
+        print(f"{problem.size:>6} {'min-conflicts':<14} {status:<10} {stats['steps']:>11} {stats['elapsed']:>9.3f}")
+        started = time.perf_counter()
+        result = solve(constraints, courses, time_limit=TIME_LIMIT)
+        print(f"{problem.size:>6} {'backtracking':<14} {result.status:<10} {result.stats['nodes']:>11} {time.perf_counter() - started:>9.3f}")
+
+
+def run_orderings() -> None:
+    """
+    Solve every fixture with each variable ordering, with and without least constraining
+    values, and print the search effort.
+    """
+    fixtures = dict(FIXTURES)
+    fixtures.update((f'week_{hours}_hours', scaled_fixture(hours)) for hours in ORDERING_HOURS)
+    print(f"{'fixture':<20} {'ordering':<9} {'lcv':<6} {'nodes':>10} {'backtracks':>11} {'solved':>7} {'seconds':>9}")
+    for name, (constraints, courses) in fixtures.items():
+        for ordering in ORDERINGS:
+            for lcv in (False, True):
+                solver = TimetableSolver(max_nodes=NODE_CAP, time_limit=TIME_LIMIT, ordering=ordering, lcv=lcv)
+                started = time.perf_counter()
+                solved = solve(constraints, courses, solver).status == OPTIMAL
+                elapsed = time.perf_counter() - started
+                nodes = f"{'>' if solver.stats['exhausted'] else ''}{solver.stats['nodes']}"
+                print(f"{name:<20} {ordering:<9} {str(lcv):<6} {nodes:>10} {solver.stats['backtracks']:>11} {str(solved):>7} {elapsed:>9.3f}")
+
+
+def late_slots_fixture(days: int) -> Tuple[Dict[str, List[Dict[str, int]]], List[Dict[str, int]]]:
+    """
+    Build an infeasible week whose first two days end with a slot only Math may take,
+    while Math has a single lecture.
+    """
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 8 if index < 2 else 7}
+            for index, day in enumerate(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"][:days])
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    rest = 6 * days - 3
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 12},
+        {"name": "Math", "lectureno": 1, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": rest - rest // 3 * 2, "duration": 1, "start_hr": 9, "end_hr": 15},
+        {"name": "History", "lectureno": rest // 3, "duration": 1, "start_hr": 9, "end_hr": 15},
+        {"name": "Art", "lectureno": rest // 3, "duration": 1, "start_hr": 9, "end_hr": 15}
+    ]
+    return constraints, courses
+
+
+def run_backjumping() -> None:
+    """
+    Compare conflict-directed backjumping with the backtracking search.
+    """
+    fixtures = dict(FIXTURES)
+    fixtures.update((f'late_slots_{days}_days', late_slots_fixture(days)) for days in LATE_DAYS)
+    print(f"{'fixture':<20} {'solver':<13} {'status':<10} {'nodes':>10} {'backtracks':>11} {'seconds':>9}")
+    for name, (constraints, courses) in fixtures.items():
+        for label, solver in (('backtracking', TimetableSolver(max_nodes=NODE_CAP, time_limit=TIME_LIMIT)), ('backjumping', BackjumpingSolver(max_nodes=NODE_CAP, time_limit=TIME_LIMIT))):
+            started = time.perf_counter()
+            result = solve(constraints, courses, solver)
+            elapsed = time.perf_counter() - started
+            nodes = f"{'>' if solver.stats['exhausted'] else ''}{solver.stats['nodes']}"
+            print(f"{name:<20} {label:<13} {result.status:<10} {nodes:>10} {solver.stats['backtracks']:>11} {elapsed:>9.3f}")
+
+
+def identical_days_fixture(days: int, labs: int) -> Tuple[Dict[str, List[Dict[str, int]]], List[Dict[str, int]]]:
+    """
+    Build a week of identical four hour days without pair rules, filled exactly by a
+    two hour Lab and three single hour courses.
+    """
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 5}
+            for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"][:days]
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    rest = 4 * days - 2 * labs
+    courses = [
+        {"name": "Lab", "lectureno": labs, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Math", "lectureno": rest // 3, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": rest // 3, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": rest - rest // 3 * 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    return constraints, courses
+
+
+def run_symmetry() -> None:
+    """
+    Compare the search effort with no symmetry broken, with interchangeable lectures
+    ordered, and with interchangeable days ordered as well.
+    """
+    variants = (('none', ()), ('lectures', (LECTURES,)), ('all', SYMMETRIES))
+    print(f"{'fixture':<20} {'search':<7} {'broken':<9} {'solutions':>10} {'nodes':>10} {'pruned':>8} {'seconds':>9}")
+    enumerated = {f'identical_{days}x{labs}': identical_days_fixture(days, labs) for days, labs in IDENTICAL_WEEKS}
+    for name, (constraints, courses) in list(enumerated.items()) + list(FIXTURES.items()):
+        problem = compile_problem(constraints, courses)
+        for label, symmetries in variants:
+            solver = TimetableSolver(max_nodes=NODE_CAP, time_limit=TIME_LIMIT)
+            model = build_model(problem, solver, symmetries)
+            started = time.perf_counter()
+            if name in enumerated:
+                search, solutions = 'all', sum(1 for _ in model.getSolutionIter())
+            else:
+                search, solutions = 'first', int(model.getSolution() is not None)
+            elapsed = time.perf_counter() - started
+            nodes = f"{'>' if solver.stats['exhausted'] else ''}{solver.stats['nodes']}"
+            print(f"{name:<20} {search:<7} {label:<9} {solutions:>10} {nodes:>10} {solver.stats['symmetry_pruned']:>8} {elapsed:>9.3f}")
+
+
+if __name__ == '__main__':
+    run()
+    print()
+    run_genetic()
+    print()
+    run_time_to_feasible()
+    print()
+    run_islands()
+    print()
+    run_memetic()
+    print()
+    run_min_conflicts()
+    print()
+    run_orderings()
+    print()
+    run_backjumping()
+    print()
+    run_symmetry()
@@ -0,0 +1,264 @@
+"""
+Content-addressed cache of timetable solutions.
+
+Solutions are keyed by the canonical hash of the compiled problem, so identical
+constraints and courses map to the same entry however their documents are
+ordered. Entries live in an in-process LRU and, when a Redis pool is given, in
+Redis where every app process can reuse them. The latest optimal result is kept
+apart from the entries so a changed problem can be re-solved starting from it.
+Concurrent solves of the same problem are coalesced into one, within a process
+and, through a Redis lock, across processes.
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import uuid
+
+from csp import OPTIMAL, compile_problem
+
+logger = logging.getLogger(__name__)
+
+def problem_key(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]]) -> str:
+    """
+    Compute the canonical hash of the normalized constraints and courses.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+
+    Returns:
+        str: Hex digest identifying the timetable problem.
+    """
+    return compile_problem(constraints, courses).key
+
+class SolutionCache:
+    """
+    Two-tier cache of solve results: an in-process LRU in front of Redis.
+
+    Redis is optional and treated as best effort: when it is unreachable the
+    cache keeps working from the in-process tier.
+    """
+
+    def __init__(self, redis=None, maxsize: int = 128, ttl: int = 86400, prefix: str = 'timetable:solution:'):
+        """
+        Args:
+            redis (optional): aioredis pool of the app. Defaults to None (in-process tier only).
+            maxsize (int, optional): Entries kept in the in-process tier. Defaults to 128.
+            ttl (int, optional): Seconds an entry is kept in Redis. Defaults to one day.
+            prefix (str, optional): Prefix of the Redis keys. Defaults to 'timetable:solution:'.
+        """
+        self.redis = redis
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._latest = None
+
+    def _remember(self, key: str, result: Dict) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached result, promoting Redis hits into the in-process tier.
+
+        Args:
+            key (str): Canonical hash of the problem.
+
+        Returns:
+            Optional[Dict]: The cached result, or None on a miss.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self.redis is None:
+            return None
+        try:
+            cached = await self.redis.get(self.prefix + key)
+        except Exception as error:
+            logger.warning(f"Solution cache lookup failed: {error}")
+            return None
+        if cached is None:
+            return None
+        result = json.loads(cached)
+        self._remember(key, result)
+        return result
+
+    async def set(self, key: str, result: Dict) -> None:
+        """
+        Store a result in both tiers.
+
+        Args:
+            key (str): Canonical hash of the problem.
+            result (Dict): JSON serializable result.
+        """
+        self._remember(key, result)
+        if result.get('status') == OPTIMAL:
+            self._latest = result
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self.prefix + key, json.dumps(result), expire=self.ttl)
+            await self.redis.sadd(self.prefix + 'keys', key)
+            if result.get('status') == OPTIMAL:
+                await self.redis.set(self.prefix + 'latest', json.dumps(result))
+        except Exception as error:
+            logger.warning(f"Solution cache store failed: {error}")
+
+    async def latest(self) -> Optional[Dict]:
+        """
+        Returns:
+            Optional[Dict]: The most recently stored optimal result, or None.
+        """
+        if self.redis is not None:
+            try:
+                cached = await self.redis.get(self.prefix + 'latest')
+            except Exception as error:
+                logger.warning(f"Solution cache lookup failed: {error}")
+            else:
+                if cached is not None:
+                    self._latest = json.loads(cached)
+        return self._latest
+
+    async def clear(self) -> None:
+        """
+        Drop every cached result, e.g. after a course or constraint changed.
+
+        The latest optimal result survives: it is the starting point for re-solving
+        the changed problem.
+        """
+        self._entries.clear()
+        if self.redis is None:
+            return
+        try:
+            keys = await self.redis.smembers(self.prefix + 'keys')
+            if keys:
+                await self.redis.delete(*[self.prefix + (key.decode() if isinstance(key, bytes) else key) for key in keys])
+            await self.redis.delete(self.prefix + 'keys')
+        except Exception as error:
+            logger.warning(f"Solution cache invalidation failed: {error}")
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same problem into one.
+
+    Callers in this process share one in-flight computation per key. When a Redis
+    pool is given, the process that takes the key's lock computes the result and
+    publishes it under the lock's token, while the other processes wait for it. If
+    the computing process gives up or dies, its lock is released or expires and a
+    waiting process takes over. The computing process renews its lock while the
+    computation runs, however long it waits before it starts. Like the cache, Redis is best effort: when it is
+    unreachable every process computes on its own.
+    """
+
+    def __init__(self, redis=None, lock_ttl: int = 60, result_ttl: int = 60, poll_interval: float = 0.1, prefix: str = 'timetable:flight:'):
+        """
+        Args:
+            redis (optional): aioredis pool of the app. Defaults to None (this process only).
+            lock_ttl (int, optional): Seconds the lock of a computation outlives the process holding
+                it; the lock is renewed every third of it. Defaults to 60.
+            result_ttl (int, optional): Seconds a published result is kept for waiting processes.
+                Defaults to 60.
+            poll_interval (float, optional): Seconds between checks for a published result. Defaults to 0.1.
+            prefix (str, optional): Prefix of the Redis keys. Defaults to 'timetable:flight:'.
+        """
+        self.redis = redis
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self._flights = {}
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, bool]:
+        """
+        Compute the result of a problem, unless a computation of it is in flight.
+
+        The computation is not cancelled with the caller that started it, as others
+        may be waiting for it.
+
+        Args:
+            key (str): Canonical hash of the problem.
+            compute (Callable[[], Awaitable[Dict]]): Computes the JSON serializable result.
+
+        Returns:
+            Tuple[Dict, bool]: The result, and whether it was computed for another caller.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = asyncio.ensure_future(self._lead(key, compute))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        result, published = await asyncio.shield(flight)
+        return result, shared or published
+
+    async def _lead(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, bool]:
+        if self.redis is None:
+            return await compute(), False
+        lock = self.prefix + 'lock:' + key
+        while True:
+            token = uuid.uuid4().hex
+            try:
+                locked = await self.redis.set(lock, token, expire=self.lock_ttl, exist=self.redis.SET_IF_NOT_EXIST)
+            except Exception as error:
+                logger.warning(f"Single-flight lock failed: {error}")
+                return await compute(), False
+            if locked:
+                return await self._compute(lock, token, compute), False
+            result = await self._wait(lock)
+            if result is not None:
+                return result, True
+
+    async def _compute(self, lock: str, token: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        renewal = asyncio.ensure_future(self._renew(lock, token))
+        try:
+            result = await compute()
+            try:
+                await self.redis.set(self.prefix + 'result:' + token, json.dumps(result), expire=self.result_ttl)
+            except Exception as error:
+                logger.warning(f"Single-flight publish failed: {error}")
+            return result
+        finally:
+            renewal.cancel()
+            try:
+                if await self.redis.get(lock) == token.encode():
+                    await self.redis.delete(lock)
+            except Exception as error:
+                logger.warning(f"Single-flight unlock failed: {error}")
+
+    async def _renew(self, lock: str, token: str) -> None:
+        """
+        Extend the lock while this process holds it, like the lease of a job.
+        """
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if await self.redis.get(lock) != token.encode():
+                    logger.warning(f"Single-flight lock {lock} was lost")
+                    return
+                await self.redis.expire(lock, self.lock_ttl)
+            except Exception as error:
+                logger.warning(f"Single-flight lock renewal failed: {error}")
+
+    async def _wait(self, lock: str) -> Optional[Dict]:
+        """
+        Wait for the result of the computation holding the lock, or None if it ended without one.
+        """
+        try:
+            token = await self.redis.get(lock)
+            while token is not None:
+                published = await self.redis.get(self.prefix + 'result:' + token.decode())
+                if published is not None:
+                    return json.loads(published)
+                if await self.redis.get(lock) != token:
+                    # Published just before the lock was released, or not at all
+                    published = await self.redis.get(self.prefix + 'result:' + token.decode())
+                    return json.loads(published) if published is not None else None
+                await asyncio.sleep(self.poll_interval)
+        except Exception as error:
+            logger.warning(f"Single-flight wait failed: {error}")
+        return None
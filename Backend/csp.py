@@ -1,6 +1,55 @@
+from collections import OrderedDict
 from constraint import *
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import hashlib
+import itertools
+import json
+import logging
+import math
 import random
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Subject id of an empty slot, and of a subject pair member that is not a course.
+EMPTY_SLOT = -1
+UNKNOWN_SUBJECT = -2
+
+# Outcome of a timetable search: every rule holds (optimal), only subject pair
+# rules are broken (feasible), the budget ran out before a usable timetable was
+# found (partial), or no timetable can satisfy every rule (infeasible).
+OPTIMAL = 'optimal'
+FEASIBLE = 'feasible'
+PARTIAL = 'partial'
+INFEASIBLE = 'infeasible'
+
+# Rules whose violations make a timetable unusable, as opposed to the subject pair rules.
+HARD_RULES = ('empty_slots', 'lecture_counts', 'consecutive', 'teacher_timings')
+
+# Variable orderings of the backtracking search: most constraints first (python-constraint's
+# default), smallest domain first, and smallest domain relative to the weighted degree, where
+# constraints weigh more the more often they caused a failure.
+DEGREE = 'degree'
+MRV = 'mrv'
+DOM_WDEG = 'dom/wdeg'
+ORDERINGS = (DEGREE, MRV, DOM_WDEG)
+
+# Symmetries the backtracking model can break: interchangeable lectures of a course, and
+# interchangeable days.
+LECTURES = 'lectures'
+DAYS = 'days'
+SYMMETRIES = (LECTURES, DAYS)
+
+# Weight of a single violation of each rule in the penalty minimized by the genetic solver.
+PENALTY_WEIGHTS = {
+    'empty_slots': 10,
+    'lecture_counts': 10,
+    'consecutive': 10,
+    'teacher_timings': 10,
+    'consecutive_subjects': 1,
+    'non_consecutive_subjects': 1,
+}
 
 def get_time_slots(slot_dict: Dict[str, int], start_times: Dict[str, int]) -> Tuple[List[str], Dict[str, int], Dict[str, str]]:
     """
@@ -19,9 +68,10 @@ def get_time_slots(slot_dict: Dict[str, int], start_times: Dict[str, int]) -> Tu
     for i in slot_dict:
         start = start_times[i]
         for j in range(int(slot_dict[i]) - 1):
-            subjects.append(f"{i[0]}{j + 1}")
-            mapping[f"{i[0]}{j + 1}"] = i.lower()
-            slot_time[f"{i[0]}{j + 1}"] = start
+            key = f"{i.lower()}{j + 1}"
+            subjects.append(key)
+            mapping[key] = i.lower()
+            slot_time[key] = start
             if start == 12:
                 start += 2
             else:
@@ -29,298 +79,2070 @@ def get_time_slots(slot_dict: Dict[str, int], start_times: Dict[str, int]) -> Tu
 
     return subjects, slot_time, mapping
 
-def generate(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]]) -> Dict[str, List[Dict[str, str]]]:
+class CompiledProblem:
     """
-    Generate a timetable based on the provided constraints and courses.
+    Integer-indexed form of a timetabling problem, shared by every solver.
+
+    Subjects and time slots are numbered from zero (subjects in name order, slots
+    in chronological order) and everything the solvers need is precomputed once as
+    read-only NumPy arrays, so solver inner loops only compare integers. Instances
+    are immutable and hash by a digest of their normalized inputs, so two problems
+    built from equal courses and constraints compare equal.
+    """
+
+    def __init__(self, days: List[Tuple[str, int, int]], courses: List[Tuple[str, int, int, int, int]], together: Optional[Tuple[str, str]] = None, apart: Optional[Tuple[str, str]] = None):
+        """
+        Args:
+            days (List[Tuple[str, int, int]]): Working days as (name, start hour, total hours), in order.
+            courses (List[Tuple[str, int, int, int, int]]): Courses as (name, lecture count, duration, start hour, end hour).
+            together (Optional[Tuple[str, str]], optional): Subjects that must be scheduled next to each other. Defaults to None.
+            apart (Optional[Tuple[str, str]], optional): Subjects that must not be scheduled next to each other. Defaults to None.
+        """
+        self.key = hashlib.sha256(json.dumps([days, courses, together, apart]).encode()).hexdigest()
+        self.subjects = tuple(name for name, *_ in courses)
+        self.subject_ids = {name: subject for subject, name in enumerate(self.subjects)}
+        self.lectures = self._frozen([lectures for _, lectures, _, _, _ in courses])
+        self.duration = self._frozen([duration for _, _, duration, _, _ in courses])
+        self.hours = self._frozen(self.lectures * self.duration)
+        self.window = self._frozen([[start, end] for _, _, _, start, end in courses]).reshape(-1, 2)
+
+        time_slots, slot_time, mapping = get_time_slots({name: total for name, _, total in days}, {name: start for name, start, _ in days})
+        self.day_names = tuple(name.lower() for name, _, _ in days)
+        self.slots = tuple(time_slots)
+        self.slot_hour = self._frozen([slot_time[slot] for slot in time_slots])
+        self.slot_day = self._frozen([self.day_names.index(mapping[slot]) for slot in time_slots])
+        self.day_bounds = self._frozen([[np.searchsorted(self.slot_day, day), np.searchsorted(self.slot_day, day, side='right')] for day in range(len(days))]).reshape(-1, 2)
+
+        self.eligible = self._frozen((self.window[:, :1] <= self.slot_hour) & (self.slot_hour < self.window[:, 1:]))
+        starts = np.zeros_like(self.eligible)
+        cover = np.zeros_like(self.eligible)
+        for subject, duration in enumerate(self.duration):
+            for first, last in self.day_bounds:
+                for start in range(first, last - duration + 1):
+                    if self.eligible[subject, start:start + duration].all():
+                        starts[subject, start] = True
+                        cover[subject, start:start + duration] = True
+        self.starts = self._frozen(starts)
+        self.cover = self._frozen(cover)
+        self.blocks = tuple((subject, lecture) for subject in np.flatnonzero(self.duration > 1).tolist() for lecture in range(int(self.lectures[subject])))
+
+        self.together = self._pair(together)
+        self.apart = self._pair(apart)
+
+    @staticmethod
+    def _frozen(values) -> np.ndarray:
+        array = np.array(values)
+        if array.dtype != bool:
+            array = array.astype(np.int64)
+        array.setflags(write=False)
+        return array
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        for value in state.values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+
+    def _pair(self, pair: Optional[Tuple[str, str]]) -> Optional[Tuple[int, int]]:
+        if pair is None:
+            return None
+        return tuple(self.subject_ids.get(name, UNKNOWN_SUBJECT) for name in pair)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompiledProblem) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of time slots.
+        """
+        return len(self.slots)
+
+    def slot_domains(self) -> List[List[int]]:
+        """
+        Get the subjects that may be placed in each slot.
+
+        A subject is allowed in a slot when the slot lies within its teacher's
+        window and, for multi-hour subjects, inside a lecture that fits in the day.
+
+        Returns:
+            List[List[int]]: Subject ids allowed in each slot.
+        """
+        return [np.flatnonzero(self.cover[:, slot]).tolist() for slot in range(self.size)]
+
+    def start_slots(self, subject: int) -> List[int]:
+        """
+        Get the slots where a lecture of the subject may start.
+
+        Args:
+            subject (int): Subject id.
+
+        Returns:
+            List[int]: Slot ids of the valid start slots.
+        """
+        return np.flatnonzero(self.starts[subject]).tolist()
+
+    def infeasibility_reasons(self) -> List[str]:
+        """
+        Find reasons why a timetable cannot exist, without searching.
+
+        Returns:
+            List[str]: Human-readable reasons, empty if no obvious conflict was found.
+        """
+        reasons = []
+        total_hours = int(self.hours.sum())
+        if total_hours != self.size:
+            reasons.append(f"courses need {total_hours} slots but the working days have {self.size}")
+        for slot in np.flatnonzero(~self.cover.any(axis=0)):
+            reasons.append(f"no course can be taught in slot {self.slots[slot]}")
+        for subject, name in enumerate(self.subjects):
+            duration = int(self.duration[subject])
+            eligible = 0
+            for first, last in self.day_bounds:
+                run = 0
+                for allowed in list(self.cover[subject, first:last]) + [False]:
+                    if allowed:
+                        run += 1
+                    else:
+                        eligible += run - run % duration
+                        run = 0
+            if eligible < self.hours[subject]:
+                reasons.append(f"course {name} has {eligible} eligible slots but needs {self.hours[subject]}")
+        return reasons
+
+    def violations(self, values: Sequence[int]) -> Dict[str, int]:
+        """
+        Count the rule violations of a complete or partial timetable.
+
+        Args:
+            values (Sequence[int]): Subject id of every slot, or EMPTY_SLOT.
+
+        Returns:
+            Dict[str, int]: Number of violations per rule: slots left empty, total
+            deviation from the lecture counts, lectures of multi-hour courses not scheduled as one block
+            of their duration, slots outside their teacher's window, and adjacent
+            slots breaking the consecutive and non-consecutive subject pairs.
+        """
+        values = np.asarray(values, dtype=np.int64)
+        filled = values != EMPTY_SLOT
+        counts = np.bincount(values[filled], minlength=len(self.subjects))
+        violations = {
+            'empty_slots': int((~filled).sum()),
+            'lecture_counts': int(np.abs(counts - self.hours).sum()),
+            'consecutive': 0,
+            'teacher_timings': int((~self.eligible[values[filled], np.flatnonzero(filled)]).sum()),
+            'consecutive_subjects': 0,
+            'non_consecutive_subjects': 0,
+        }
+        for first, last in self.day_bounds:
+            for subject, run in itertools.groupby(values[first:last].tolist()):
+                if subject != EMPTY_SLOT and self.duration[subject] > 1 and len(list(run)) != self.duration[subject]:
+                    violations['consecutive'] += 1
+        for key, pair, together in (('consecutive_subjects', self.together, True), ('non_consecutive_subjects', self.apart, False)):
+            if pair:
+                rule = pair_rule(pair, together)
+                violations[key] = sum(not rule(left, right) for left, right in zip(values.tolist(), values[1:].tolist()))
+        return violations
+
+    def conflicted_slots(self, values: Sequence[int]) -> List[int]:
+        """
+        Find the slots involved in a rule violation of a complete timetable.
+
+        Args:
+            values (Sequence[int]): Subject id of every slot, or EMPTY_SLOT.
+
+        Returns:
+            List[int]: Slots that are empty, outside their teacher's window, part of a
+            misshapen lecture block, or next to a slot breaking a subject pair rule.
+        """
+        values = list(values)
+        conflicted = set()
+        for slot, value in enumerate(values):
+            if value == EMPTY_SLOT or not self.eligible[value, slot]:
+                conflicted.add(slot)
+        for first, last in self.day_bounds:
+            slot = int(first)
+            for subject, run in itertools.groupby(values[first:last]):
+                length = len(list(run))
+                if subject != EMPTY_SLOT and self.duration[subject] > 1 and length != self.duration[subject]:
+                    conflicted.update(range(slot, slot + length))
+                slot += length
+        rules = [pair_rule(pair, together) for pair, together in ((self.together, True), (self.apart, False)) if pair]
+        for slot in range(len(values) - 1):
+            if not all(rule(values[slot], values[slot + 1]) for rule in rules):
+                conflicted.update((slot, slot + 1))
+        return sorted(conflicted)
+
+    def interchangeable_days(self) -> List[List[int]]:
+        """
+        Find the groups of days whose contents can be swapped without changing any rule.
+
+        Days with the same hours offer the same slots to every course. Subject pair
+        rules also hold between the last slot of a day and the first of the next one,
+        so days are only interchangeable when no pair rule names a known course.
+
+        Returns:
+            List[List[int]]: Groups of at least two day indices, each in order.
+        """
+        if any(subject != UNKNOWN_SUBJECT for pair in (self.together, self.apart) if pair for subject in pair):
+            return []
+        groups = {}
+        for day, (first, last) in enumerate(self.day_bounds):
+            groups.setdefault(tuple(self.slot_hour[first:last].tolist()), []).append(day)
+        return [days for days in groups.values() if len(days) > 1]
+
+    def canonical(self, values: Sequence[int]) -> Tuple:
+        """
+        Identify a timetable up to swapping the contents of days with the same hours.
+
+        Args:
+            values (Sequence[int]): Subject id of every slot, or EMPTY_SLOT.
+
+        Returns:
+            Tuple: Equal for timetables that only differ by such swaps.
+        """
+        days = {}
+        for first, last in self.day_bounds:
+            days.setdefault(tuple(self.slot_hour[first:last].tolist()), []).append(tuple(values[first:last]))
+        return tuple(sorted((hours, tuple(sorted(contents))) for hours, contents in days.items()))
+
+    def values_from_timetable(self, timetable: Dict[str, List[Dict[str, str]]]) -> List[int]:
+        """
+        Map a timetable formatted by ``timetable`` back onto the slots of this problem.
+
+        Lectures of courses or on days that are no longer part of the problem are
+        dropped, and slots the timetable does not fill are left empty.
+
+        Args:
+            timetable (Dict[str, List[Dict[str, str]]]): A timetable, possibly of an older version of the problem.
+
+        Returns:
+            List[int]: Subject id of every slot, or EMPTY_SLOT.
+        """
+        slots = {(self.day_names[day], int(hour)): slot for slot, (day, hour) in enumerate(zip(self.slot_day, self.slot_hour))}
+        values = [EMPTY_SLOT] * self.size
+        for day, entries in timetable.items():
+            for entry in entries:
+                slot = slots.get((day, int(entry['startTime'][11:13])))
+                if slot is not None and entry['name'] in self.subject_ids:
+                    values[slot] = self.subject_ids[entry['name']]
+        return values
+
+    def timetable(self, values: Sequence[int]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Format subject ids per slot as the timetable returned by the API.
+
+        Args:
+            values (Sequence[int]): Subject id of every slot, or EMPTY_SLOT.
+
+        Returns:
+            Dict[str, List[Dict[str, str]]]: A dictionary containing the timetable.
+        """
+        resp_data = {'monday': [], 'tuesday': [], 'wednesday': [], 'thursday': [], 'friday': [], 'saturday': [], 'sunday': []}
+        for slot, value in enumerate(values):
+            if value == EMPTY_SLOT:
+                continue
+            hour = int(self.slot_hour[slot])
+            resp_data[self.day_names[self.slot_day[slot]]].append({
+                'id': 1,
+                'name': self.subjects[value],
+                'type': 'custom',
+                'startTime': f'2018-02-25T{str(hour).zfill(2)}:00:00',
+                'endTime': f'2018-02-25T{str(hour+1).zfill(2)}:00:00'
+            })
+        return resp_data
+
+def compile_problem(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]]) -> CompiledProblem:
+    """
+    Normalize the constraints and courses documents into a compiled problem.
+
+    Later entries win when a day or course name is repeated, and subject pairs are
+    ignored when they are empty or incomplete.
 
     Args:
         constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
         courses (List[Dict[str, int]]): List of dictionaries containing the course information.
 
     Returns:
-        Dict[str, List[Dict[str, str]]]: A dictionary containing the generated timetable.
+        CompiledProblem: The compiled problem.
     """
-    constraints_dict = {}
-    start_times = {}
-    end_times = {2: [], 3: []}
-    offset = 0
-    subject_hrs = {}
-    subjects = []
-    subject_data = {}
-    consecutive_subjects = {}
-    diff_consecutive_mode = True
-    diff_non_consecutive_mode = True
-
-    for course in constraints["working_days"]:
-        constraints_dict[course["day"]] = course["total_hours"]
-        start_times[course["day"]] = int(course["start_hr"])
-        end_times[2].append((int(course["total_hours"]) - 2) + offset)
-        for i in range(int(course["total_hours"]) - 3 + offset, int(course["total_hours"]) - 1 + offset):
-            end_times[3].append(i)
-        offset += int(course["total_hours"]) - 1
-
+    days = {}
+    for day in constraints["working_days"]:
+        days[day["day"]] = (int(day["start_hr"]), int(day["total_hours"]))
+    subjects = {}
     for item in courses:
-        subject_hrs[item["name"]] = int(item['lectureno']) * int(item["duration"])
-        subjects.append(item["name"])
-        subject_data[item['name']] = {'start_hr': int(item['start_hr']), 'end_hr': int(item['end_hr'])}
-        if item["duration"] != 1:
-            consecutive_subjects[item["name"]] = item["duration"]
+        subjects[item["name"]] = (int(item["lectureno"]), int(item["duration"]), int(item["start_hr"]), int(item["end_hr"]))
 
-    if constraints['consecutive_subjects'][0] == "":
-        diff_consecutive_mode = False
+    def pair(values: List[str]) -> Optional[Tuple[str, str]]:
+        if len(values) < 2 or values[0] == "":
+            return None
+        return (values[0], values[1])
 
-    if constraints['non_consecutive_subjects'][0] == "":
-        diff_non_consecutive_mode = False
+    return CompiledProblem(
+        [(name, start, total) for name, (start, total) in days.items()],
+        [(name, *subjects[name]) for name in sorted(subjects)],
+        pair(constraints.get('consecutive_subjects', [])),
+        pair(constraints.get('non_consecutive_subjects', []))
+    )
 
-    time_slots, slot_time, mapping = get_time_slots(constraints_dict, start_times)
+class TimetableSolver(Solver):
+    """
+    Backtracking solver with forward checking, search budgets and statistics.
 
-    Scheduling = Problem()
-    Scheduling.addVariables(time_slots, subjects)
+    The search itself mirrors python-constraint's BacktrackingSolver, with a choice
+    of variable ordering: degree then domain size (the BacktrackingSolver order),
+    domain size then degree (MRV), or domain size over weighted degree (dom/wdeg),
+    where every constraint starts with weight one and gains one each time it fails.
+    Values can be tried least constraining first: each value is forward checked and
+    the ones pruning the fewest values from other domains go first. On top of it the
+    solver counts visited nodes, backtracks and the values rejected by symmetry
+    breaking constraints (see ``build_model``), stops once its node or time budget
+    is spent, and keeps the deepest consistent partial assignment it reached in
+    ``best`` so callers can fall back on it when no solution was found. A seed
+    randomizes the order in which values are tried and breaks ties between
+    equally constrained variables, so several solvers can explore different parts
+    of the search space. Hints name the value to try first for some variables,
+    e.g. the previous solution when re-solving.
+    """
 
-    def everySubject(*args: str) -> bool:
+    def __init__(self, forwardcheck: bool = True, max_nodes: int = None, time_limit: float = None, seed: int = None, hints: Dict = None, ordering: str = DEGREE, lcv: bool = False):
         """
-        Ensure every subject is scheduled the required number of times.
+        Args:
+            forwardcheck (bool, optional): Whether constraints may prune unassigned domains. Defaults to True.
+            max_nodes (int, optional): Stop searching after this many nodes. Defaults to None (unbounded).
+            time_limit (float, optional): Stop searching after this many seconds. Defaults to None (unbounded).
+            seed (int, optional): Seed of the randomized value and tie-breaking order. Defaults to None
+                (the deterministic order of python-constraint).
+            hints (Dict, optional): Value to try first for each variable. Defaults to None.
+            ordering (str, optional): Variable ordering, one of ORDERINGS. Defaults to DEGREE.
+            lcv (bool, optional): Whether to try the least constraining values first. Defaults to False.
         """
-        Timetable = args
-        for subject in subjects:
-            if Timetable.count(subject) != subject_hrs[subject]:
-                return False
-        return True
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown variable ordering: {ordering}")
+        self._forwardcheck = forwardcheck
+        self._ordering = ordering
+        self._lcv = lcv
+        self._max_nodes = max_nodes
+        self._time_limit = time_limit
+        self._seed = seed
+        self._hints = hints or {}
+        self.best = {}
+        self.stats = {'nodes': 0, 'backtracks': 0, 'depth': 0, 'elapsed': 0.0, 'exhausted': False}
 
-    def sameConsecutive(*args: str) -> bool:
+    def _out_of_budget(self, deadline: Optional[float]) -> bool:
+        if self._max_nodes is not None and self.stats['nodes'] >= self._max_nodes:
+            return True
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _order_key(self, domains, vconstraints, weighted: Dict, ties: Dict):
         """
-        Ensure consecutive subjects are scheduled together.
+        Build the sort key picking the next variable to assign.
         """
-        Timetable = args
-        for key, value in consecutive_subjects.items():
-            index = Timetable.index(key)
-            if (value == 2 and index in end_times[2]) or (value == 3 and index in end_times[3]):
-                return False
-            for i in range(value - 1):
-                if Timetable[index + i + 1] != key:
-                    return False
+        if self._ordering == MRV:
+            return lambda variable: (len(domains[variable]), -len(vconstraints[variable]), ties[variable])
+        if self._ordering == DOM_WDEG:
+            return lambda variable: (len(domains[variable]) / weighted[variable], ties[variable])
+        return lambda variable: (-len(vconstraints[variable]), len(domains[variable]), ties[variable])
+
+    def _least_constraining(self, variable, values: List, domains, vconstraints, assignments: Dict, pushdomains: List) -> List:
+        """
+        Sort values so the one pruning the fewest values from the other domains is popped first.
+
+        Values failing their forward check are kept, to be tried last.
+        """
+        remaining = {}
+        for value in values:
+            assignments[variable] = value
+            for domain in pushdomains:
+                domain.pushState()
+            before = sum(len(domain) for domain in pushdomains)
+            if all(constraint(variables, domains, assignments, pushdomains) for constraint, variables in vconstraints[variable]):
+                remaining[value] = sum(len(domain) for domain in pushdomains) - before
+            else:
+                remaining[value] = -before - 1
+            for domain in pushdomains:
+                domain.popState()
+        del assignments[variable]
+        return sorted(values, key=lambda value: remaining[value])
+
+    def _record(self, started: float, symmetry: List) -> None:
+        self.stats['elapsed'] = time.monotonic() - started
+        self.stats['symmetry_pruned'] = sum(constraint.pruned for constraint in symmetry)
+
+    def getSolutionIter(self, domains, constraints, vconstraints):
+        started = time.monotonic()
+        deadline = started + self._time_limit if self._time_limit is not None else None
+        self.best = {}
+        self.stats = {'nodes': 0, 'backtracks': 0, 'depth': 0, 'elapsed': 0.0, 'exhausted': False, 'symmetry_pruned': 0}
+        symmetry = [constraint for constraint, _ in constraints if isinstance(constraint, LexLeqConstraint)]
+        assignments = {}
+        queue = []
+        shuffle = random.Random(self._seed) if self._seed is not None else None
+        ties = {variable: shuffle.random() if shuffle else 0 for variable in domains}
+        # Weighted degree of every variable: the summed weights of its constraints
+        weighted = {variable: len(vconstraints[variable]) or 1 for variable in domains}
+        key = self._order_key(domains, vconstraints, weighted, ties)
+
+        while True:
+            order = sorted(domains, key=key)
+            for variable in order:
+                if variable not in assignments:
+                    values = domains[variable][:]
+                    if shuffle:
+                        shuffle.shuffle(values)
+                    if self._forwardcheck:
+                        pushdomains = [domains[x] for x in domains if x not in assignments and x != variable]
+                    else:
+                        pushdomains = None
+                    if self._lcv and len(values) > 1:
+                        values = self._least_constraining(variable, values, domains, vconstraints, assignments, pushdomains or [])
+                    if self._hints.get(variable) in values:
+                        values.remove(self._hints[variable])
+                        values.append(self._hints[variable])
+                    break
+            else:
+                self._record(started, symmetry)
+                yield assignments.copy()
+                if not queue:
+                    return
+                variable, values, pushdomains = queue.pop()
+                if pushdomains:
+                    for domain in pushdomains:
+                        domain.popState()
+
+            while True:
+                if not values:
+                    self.stats['backtracks'] += 1
+                    del assignments[variable]
+                    while queue:
+                        variable, values, pushdomains = queue.pop()
+                        if pushdomains:
+                            for domain in pushdomains:
+                                domain.popState()
+                        if values:
+                            break
+                        del assignments[variable]
+                    else:
+                        self._record(started, symmetry)
+                        return
+
+                if self._out_of_budget(deadline):
+                    self.stats['exhausted'] = True
+                    self._record(started, symmetry)
+                    return
+                self.stats['nodes'] += 1
+                assignments[variable] = values.pop()
+
+                if pushdomains:
+                    for domain in pushdomains:
+                        domain.pushState()
+
+                for constraint, variables in vconstraints[variable]:
+                    if not constraint(variables, domains, assignments, pushdomains):
+                        for other in variables:
+                            weighted[other] += 1
+                        break
+                else:
+                    break
+
+                if pushdomains:
+                    for domain in pushdomains:
+                        domain.popState()
+
+            if len(assignments) > self.stats['depth']:
+                self.stats['depth'] = len(assignments)
+                self.best = assignments.copy()
+            queue.append((variable, values, pushdomains))
+
+    def getSolution(self, domains, constraints, vconstraints):
+        try:
+            return next(self.getSolutionIter(domains, constraints, vconstraints))
+        except StopIteration:
+            return None
+
+    def getSolutions(self, domains, constraints, vconstraints):
+        return list(self.getSolutionIter(domains, constraints, vconstraints))
+
+class GlobalCardinalityConstraint(Constraint):
+    """
+    Constraint ensuring every subject fills exactly its number of slots.
+
+    Per-subject counts are kept up to date as the solver assigns and retracts
+    slots instead of being recounted on every check. The trail of counted
+    assignments is reconciled lazily, which relies on the chronological
+    assignment order of the backtracking solvers. With forward checking, a
+    subject is hidden from the remaining slots as soon as its quota is full, and
+    the search fails as soon as the slots left cannot cover the outstanding hours.
+    """
+
+    def __init__(self, subject_hrs: Dict[str, int]):
+        """
+        Args:
+            subject_hrs (Dict[str, int]): Number of slots each subject has to fill.
+        """
+        self._hours = dict(subject_hrs)
+        self._counts = dict.fromkeys(subject_hrs, 0)
+        self._outstanding = sum(subject_hrs.values())
+        self._trail = []
+        self._scope = frozenset()
+
+    def preProcess(self, variables, domains, constraints, vconstraints):
+        self._scope = frozenset(variables)
+        self._counts = dict.fromkeys(self._hours, 0)
+        self._outstanding = sum(self._hours.values())
+        self._trail = []
+
+    def _retract(self) -> None:
+        variable, value = self._trail.pop()
+        self._counts[value] -= 1
+        if self._counts[value] < self._hours[value]:
+            self._outstanding += 1
+
+    def _count(self, variable, value) -> None:
+        self._trail.append((variable, value))
+        self._counts[value] += 1
+        if self._counts[value] <= self._hours[value]:
+            self._outstanding -= 1
+
+    def __call__(self, variables, domains, assignments, forwardcheck=False):
+        while self._trail and assignments.get(self._trail[-1][0], Unassigned) != self._trail[-1][1]:
+            self._retract()
+        variable = next(reversed(assignments), None)
+        if variable not in self._scope:
+            return True
+        value = assignments[variable]
+        if not self._trail or self._trail[-1] != (variable, value):
+            self._count(variable, value)
+
+        if self._counts[value] > self._hours[value]:
+            return False
+        if self._outstanding > len(self._scope) - len(self._trail):
+            return False
+        if forwardcheck and self._counts[value] == self._hours[value]:
+            for other in variables:
+                if other not in assignments and value in domains[other]:
+                    domains[other].hideValue(value)
+                    if not domains[other]:
+                        return False
         return True
 
-    def teacherTimings(*args: str) -> bool:
+class LexLeqConstraint(Constraint):
+    """
+    Constraint keeping one sequence of variables lexicographically no greater than another.
+
+    Used to break symmetries: of all the assignments that only differ by swapping
+    two interchangeable sequences, only the one with the sequences in order is
+    searched. With forward checking, the first undecided position is pruned as
+    soon as one of its two values is known. The values it rejected or hid are
+    counted in ``pruned``.
+    """
+
+    def __init__(self, size: int):
         """
-        Ensure subjects are scheduled within the teacher's available hours.
+        Args:
+            size (int): Length of each sequence; the constraint's variables are the first
+                sequence followed by the second.
         """
-        Timetable = args
-        for key, value in subject_data.items():
-            indexes = [i for i, letter in enumerate(Timetable) if letter == key]
-            for i in indexes:
-                if slot_time[time_slots[i]] < value["start_hr"] or slot_time[time_slots[i]] >= value["end_hr"]:
+        self._size = size
+        self.pruned = 0
+
+    def preProcess(self, variables, domains, constraints, vconstraints):
+        self.pruned = 0
+
+    def __call__(self, variables, domains, assignments, forwardcheck=False):
+        for left, right in zip(variables[:self._size], variables[self._size:]):
+            first = assignments.get(left, Unassigned)
+            second = assignments.get(right, Unassigned)
+            if first is not Unassigned and second is not Unassigned:
+                if first == second:
+                    continue
+                if first > second:
+                    self.pruned += 1
                     return False
+                return True
+            if forwardcheck and first is not Unassigned:
+                domain = domains[right]
+                hidden = [value for value in domain if value < first]
+            elif forwardcheck and second is not Unassigned:
+                domain = domains[left]
+                hidden = [value for value in domain if value > second]
+            else:
+                return True
+            for value in hidden:
+                domain.hideValue(value)
+            self.pruned += len(hidden)
+            return bool(domain)
         return True
 
-    def diffConsecutive(*args: str) -> bool:
+def block_cover_rule(subject: int, duration: int, index: int):
+    """
+    Build the rule linking a lecture block to one of the slots it may cover.
+
+    Args:
+        subject (int): Id of the multi-hour subject.
+        duration (int): Number of consecutive slots of a lecture.
+        index (int): Id of the slot.
+
+    Returns:
+        Callable[[int, int], bool]: Rule over the block start and the slot.
+    """
+    def sameConsecutive(start: int, value: int) -> bool:
+        """
+        Ensure the slots covered by a lecture block hold its subject.
+        """
+        return not start <= index < start + duration or value == subject
+    return sameConsecutive
+
+def block_member_rule(subject: int, duration: int, index: int):
+    """
+    Build the rule allowing a multi-hour subject in a slot only inside one of its blocks.
+
+    Args:
+        subject (int): Id of the multi-hour subject.
+        duration (int): Number of consecutive slots of a lecture.
+        index (int): Id of the slot.
+
+    Returns:
+        Callable[..., bool]: Rule over the slot followed by the subject's blocks.
+    """
+    def sameConsecutive(value: int, *starts: int) -> bool:
+        """
+        Ensure a slot only holds a multi-hour subject when one of its blocks covers it.
+        """
+        if value != subject or Unassigned in starts:
+            return True
+        return any(start <= index < start + duration for start in starts)
+    return sameConsecutive
+
+def block_spacing_rule(duration: int, slot_day: List[int]):
+    """
+    Build the rule keeping two lectures of the same multi-hour subject apart.
+
+    Args:
+        duration (int): Number of consecutive slots of a lecture.
+        slot_day (List[int]): Day index of each slot.
+
+    Returns:
+        Callable[[int, int], bool]: Rule over two block starts.
+    """
+    def sameConsecutive(first: int, second: int) -> bool:
+        """
+        Ensure lectures of the same subject neither overlap nor run into each other.
+        """
+        return slot_day[first] != slot_day[second] or abs(first - second) > duration
+    return sameConsecutive
+
+def pair_rule(pair: Tuple[int, int], together: bool):
+    """
+    Build the rule for two adjacent slots given a pair of subjects.
+
+    Args:
+        pair (Tuple[int, int]): Ids of the two subjects of the rule.
+        together (bool): Whether the subjects must always be adjacent to each other
+            (``consecutive_subjects``) or never adjacent (``non_consecutive_subjects``).
+
+    Returns:
+        Callable[[int, int], bool]: Rule over two adjacent slots.
+    """
+    partner = {first: second for first, second in (pair, pair[::-1]) if first != UNKNOWN_SUBJECT}
+
+    def diffConsecutive(left: int, right: int) -> bool:
         """
         Ensure different consecutive subjects are scheduled together.
         """
-        Timetable = args
-        for index, value in enumerate(constraints['consecutive_subjects']):
-            indexes = [i for i, letter in enumerate(Timetable) if letter == value]
-            for i in indexes:
-                if index == 0:
-                    if i == 0:
-                        if Timetable[i + 1] != constraints['consecutive_subjects'][1]:
-                            return False
-                    elif i == len(Timetable) - 1:
-                        if Timetable[i - 1] != constraints['consecutive_subjects'][1]:
-                            return False
-                    else:
-                        if Timetable[i + 1] != constraints['consecutive_subjects'][1] or Timetable[i - 1] != constraints['consecutive_subjects'][1]:
-                            return False
-                else:
-                    if i == 0:
-                        if Timetable[i + 1] != constraints['consecutive_subjects'][0]:
-                            return False
-                    elif i == len(Timetable) - 1:
-                        if Timetable[i - 1] != constraints['consecutive_subjects'][0]:
-                            return False
-                    else:
-                        if Timetable[i + 1] != constraints['consecutive_subjects'][0] or Timetable[i - 1] != constraints['consecutive_subjects'][0]:
-                            return False
-        return True
+        return (left not in partner or right == partner[left]) and (right not in partner or left == partner[right])
 
-    def diffNonConsecutive(*args: str) -> bool:
+    def diffNonConsecutive(left: int, right: int) -> bool:
         """
         Ensure different non-consecutive subjects are not scheduled together.
         """
-        Timetable = args
-        for index, value in enumerate(constraints['non_consecutive_subjects']):
-            indexes = [i for i, letter in enumerate(Timetable) if letter == value]
-            for i in indexes:
-                if index == 0:
-                    if i == 0:
-                        if Timetable[i + 1] == constraints['non_consecutive_subjects'][1]:
-                            return False
-                    elif i == len(Timetable) - 1:
-                        if Timetable[i - 1] == constraints['non_consecutive_subjects'][1]:
-                            return False
-                    else:
-                        if Timetable[i + 1] == constraints['non_consecutive_subjects'][1] or Timetable[i - 1] == constraints['non_consecutive_subjects'][1]:
-                            return False
-                else:
-                    if i == 0:
-                        if Timetable[i + 1] == constraints['non_consecutive_subjects'][0]:
-                            return False
-                    elif i == len(Timetable) - 1:
-                        if Timetable[i - 1] == constraints['non_consecutive_subjects'][0]:
-                            return False
-                    else:
-                        if Timetable[i + 1] == constraints['non_consecutive_subjects'][0] or Timetable[i - 1] == constraints['non_consecutive_subjects'][0]:
-                            return False
-        return True
+        return partner.get(left) != right
 
-    Scheduling.addConstraint(everySubject, time_slots)
-    Scheduling.addConstraint(sameConsecutive, time_slots)
-    Scheduling.addConstraint(teacherTimings, time_slots)
-    if diff_consecutive_mode:
-        Scheduling.addConstraint(diffConsecutive, time_slots)
-    if diff_non_consecutive_mode:
-        Scheduling.addConstraint(diffNonConsecutive, time_slots)
+    return diffConsecutive if together else diffNonConsecutive
 
-    solution = Scheduling.getSolution()
+def build_model(problem: CompiledProblem, solver: Solver = None, symmetries: Sequence[str] = (LECTURES,)) -> Problem:
+    """
+    Build the constraint model of a compiled problem.
+
+    Slot variables are the slot ids and take subject ids. Each lecture of a
+    multi-hour course is a single block variable, named ``(subject, lecture)``,
+    whose domain only holds the slots where the whole lecture fits in one day; the
+    slots it covers are then forced by forward checking. Subject pairs are checked
+    on adjacent slots, and lecture counts are tracked by a single propagating
+    cardinality constraint.
+
+    Lectures of the same course are interchangeable, and so are the contents of
+    the days ``interchangeable_days`` finds. Breaking the LECTURES symmetry keeps
+    the lectures of a course in descending order of their start, and breaking the
+    DAYS symmetry keeps interchangeable days in descending lexicographic order of
+    their subjects, so only one timetable of every group of equivalent ones is
+    searched. Descending orders agree with the solver trying the last values of a
+    domain first. Ordering the days pays off when the whole search space is
+    explored, but can delay the first solution.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        solver (Solver, optional): Solver used for the search. Defaults to a new TimetableSolver.
+        symmetries (Sequence[str], optional): Symmetries to break, out of SYMMETRIES. Break none when
+            other constraints pin some slots, as they may rule out the ordered timetables.
+            Defaults to LECTURES only.
+
+    Returns:
+        Problem: The python-constraint problem.
+    """
+    Scheduling = Problem(solver or TimetableSolver())
+    slot_domains = problem.slot_domains()
+    groups = {}
+    for slot, domain in enumerate(slot_domains):
+        groups.setdefault(tuple(domain), []).append(slot)
+    for domain, slots in groups.items():
+        Scheduling.addVariables(slots, list(domain))
+    for block in problem.blocks:
+        Scheduling.addVariable(block, problem.start_slots(block[0]))
+
+    Scheduling.addConstraint(GlobalCardinalityConstraint(dict(enumerate(problem.hours.tolist()))), list(range(problem.size)))
+
+    slot_day = problem.slot_day.tolist()
+    for subject in np.flatnonzero(problem.duration > 1).tolist():
+        duration = int(problem.duration[subject])
+        lectures = [block for block in problem.blocks if block[0] == subject]
+        for slot in np.flatnonzero(problem.cover[subject]).tolist():
+            for block in lectures:
+                Scheduling.addConstraint(block_cover_rule(subject, duration, slot), [block, slot])
+            Scheduling.addConstraint(FunctionConstraint(block_member_rule(subject, duration, slot), assigned=False), [slot] + lectures)
+        for i, first in enumerate(lectures):
+            for second in lectures[i + 1:]:
+                Scheduling.addConstraint(block_spacing_rule(duration, slot_day), [first, second])
+            if LECTURES in symmetries and i + 1 < len(lectures):
+                Scheduling.addConstraint(LexLeqConstraint(1), [lectures[i + 1], first])
+
+    if DAYS in symmetries:
+        for days in problem.interchangeable_days():
+            for first, second in zip(days, days[1:]):
+                slots = list(range(*problem.day_bounds[second])) + list(range(*problem.day_bounds[first]))
+                Scheduling.addConstraint(LexLeqConstraint(len(slots) // 2), slots)
+
+    for slot in range(problem.size - 1):
+        if problem.together:
+            Scheduling.addConstraint(pair_rule(problem.together, True), [slot, slot + 1])
+        if problem.apart:
+            Scheduling.addConstraint(pair_rule(problem.apart, False), [slot, slot + 1])
+    return Scheduling
+
+class BackjumpingSolver:
+    """
+    Conflict-directed backjumping search over the slots of a compiled problem.
+
+    Unlike ``TimetableSolver`` this engine does not go through the python-constraint
+    model: it fills the slots in chronological order and checks every rule directly
+    on the compiled arrays, so each failure can be explained by the earlier slots
+    that caused it. Besides the rules, every subject, and every pair of subjects,
+    must keep enough slots ahead for its outstanding hours; subjects with the least
+    to spare are tried first. A slot's conflict set collects the explanations; when no
+    subject fits, the search jumps straight back to the latest slot in the set
+    instead of the previous one, and hands it the rest of the set. The values of
+    the conflict set are also learned as a nogood, an assignment that cannot be
+    extended to a timetable, and checked whenever its last slot is assigned again.
+    At most ``max_nogoods`` nogoods of up to ``nogood_size`` slots are kept, the
+    least recently used ones being evicted first. An empty conflict set proves
+    that no timetable exists.
+
+    Pass an instance to ``solve`` or ``generate`` in place of a TimetableSolver; it
+    reports the same ``stats`` and ``best`` partial assignment, plus the slots
+    skipped by backjumps and the nogoods learned, matched and evicted.
+    """
+
+    def __init__(self, max_nodes: int = None, time_limit: float = None, max_nogoods: int = 10000, nogood_size: int = 16):
+        """
+        Args:
+            max_nodes (int, optional): Stop searching after this many nodes. Defaults to None (unbounded).
+            time_limit (float, optional): Stop searching after this many seconds. Defaults to None (unbounded).
+            max_nogoods (int, optional): Nogoods kept in the store. Defaults to 10000.
+            nogood_size (int, optional): Slots of the largest nogood worth learning. Defaults to 16.
+        """
+        self._max_nodes = max_nodes
+        self._time_limit = time_limit
+        self._max_nogoods = max_nogoods
+        self._nogood_size = nogood_size
+        self.nogoods = OrderedDict()
+        self.best = {}
+        self.stats = {'nodes': 0, 'backtracks': 0, 'depth': 0, 'elapsed': 0.0, 'exhausted': False}
+
+    def _learn(self, nogood: Tuple[Tuple[int, int], ...]) -> None:
+        if len(nogood) > self._nogood_size or nogood in self.nogoods:
+            return
+        self.nogoods[nogood] = None
+        self._watched.setdefault(nogood[-1], {})[nogood] = None
+        self.stats['learned'] += 1
+        if len(self.nogoods) > self._max_nogoods:
+            evicted, _ = self.nogoods.popitem(last=False)
+            del self._watched[evicted[-1]][evicted]
+            self.stats['evicted'] += 1
+
+    def _violated_nogood(self, slot: int, subject: int, values: List[int]) -> Optional[set]:
+        for nogood in self._watched.get((slot, subject), ()):
+            if all(values[other] == value for other, value in nogood[:-1]):
+                self.nogoods.move_to_end(nogood)
+                self.stats['nogood_hits'] += 1
+                return {other for other, _ in nogood[:-1]}
+        return None
+
+    def search(self, problem: CompiledProblem) -> Optional[Dict[int, int]]:
+        """
+        Search for a timetable satisfying every rule.
+
+        Args:
+            problem (CompiledProblem): The compiled problem.
+
+        Returns:
+            Optional[Dict[int, int]]: Subject id of every slot, or None when there is no
+            timetable or the budget ran out (``stats['exhausted']`` tells which).
+        """
+        started = time.monotonic()
+        deadline = started + self._time_limit if self._time_limit is not None else None
+        self.best = {}
+        self.nogoods = OrderedDict()
+        # Nogoods are sorted by slot and watched by the value of their last slot
+        self._watched = {}
+        self.stats = {'nodes': 0, 'backtracks': 0, 'depth': 0, 'elapsed': 0.0, 'exhausted': False, 'jumped': 0, 'learned': 0, 'nogood_hits': 0, 'evicted': 0}
+
+        size = problem.size
+        subjects = range(len(problem.subjects))
+        hours = problem.hours.tolist()
+        duration = problem.duration.tolist()
+        starts = problem.starts.tolist()
+        domains = problem.slot_domains()
+        same_day = [False] + (problem.slot_day[1:] == problem.slot_day[:-1]).tolist()
+        cover_slots = [np.flatnonzero(row).tolist() for row in problem.cover]
+        # capacity[subject][slot] is the most hours the subject can fill from ``slot`` on, lectures
+        # of multi-hour subjects being laid out in whole blocks that do not run into each other
+        capacity = []
+        for subject in subjects:
+            length = duration[subject]
+            fill = [0] * (size + 2)
+            for slot in range(size - 1, -1, -1):
+                fill[slot] = fill[slot + 1]
+                if starts[subject][slot]:
+                    after = slot + length + 1 if length > 1 and slot + length < size and same_day[slot + length] else slot + length
+                    fill[slot] = max(fill[slot], length + fill[after])
+            capacity.append(fill)
+        # joint[first][second][slot] is the number of slots from ``slot`` on either subject may fill
+        joint = [[None] * len(problem.subjects) for _ in problem.subjects]
+        for first, second in itertools.combinations(subjects, 2):
+            either = problem.cover[first] | problem.cover[second]
+            joint[first][second] = joint[second][first] = np.concatenate([np.cumsum(either[::-1])[::-1], [0]]).tolist()
+        rules = [pair_rule(pair, together) for pair, together in ((problem.together, True), (problem.apart, False)) if pair]
+        allowed = [[all(rule(left, right) for rule in rules) for right in subjects] for left in subjects]
+
+        values = [EMPTY_SLOT] * size
+        counts = [0] * len(problem.subjects)
+        run = [0] * size
+        conflicts = [set() for _ in range(size)]
+        orders = [[] for _ in range(size)]
+        tried = [0] * size
+
+        def runReason(slot: int) -> set:
+            """
+            Explain the length of the run of one subject ending at a slot.
+            """
+            first = slot - run[slot] + 1
+            return set(range(first - 1 if same_day[first] else first, slot + 1))
+
+        def check(slot: int, subject: int) -> Optional[set]:
+            """
+            Check placing a subject in the next slot, returning the earlier slots to blame on failure.
+            """
+            if counts[subject] >= hours[subject]:
+                return {other for other in range(slot) if values[other] == subject}
+            continuing = False
+            if slot:
+                left = values[slot - 1]
+                if not allowed[left][subject]:
+                    return {slot - 1}
+                if same_day[slot]:
+                    if duration[left] > 1 and (left == subject) == (run[slot - 1] == duration[left]):
+                        return runReason(slot - 1)
+                    continuing = left == subject
+            if duration[subject] > 1 and not continuing and not starts[subject][slot]:
+                return {slot - 1} if same_day[slot] else set()
+            conflict = self._violated_nogood(slot, subject, values)
+            if conflict is not None:
+                return conflict
+            for other in domains[slot]:
+                if other == subject:
+                    continue
+                missing = hours[other] - counts[other]
+                if missing > capacity[other][slot + 1]:
+                    return {earlier for earlier in cover_slots[other] if earlier < slot and values[earlier] != other}
+                # Two subjects may fit on their own but not together, e.g. two long lectures in a short day
+                for partner in subjects:
+                    if partner != subject and partner != other and missing + hours[partner] - counts[partner] > joint[other][partner][slot + 1]:
+                        pair = (other, partner)
+                        return {earlier for earlier in set(cover_slots[other]) | set(cover_slots[partner]) if earlier < slot and values[earlier] not in pair}
+            return None
+
+        def order(slot: int) -> List[int]:
+            """
+            Sort the subjects of a slot by the hours they could spare if it went to another subject.
+            """
+            return sorted(domains[slot], key=lambda subject: capacity[subject][slot + 1] - hours[subject] + counts[subject])
+
+        # Capacities falling short before the first slot cannot be blamed on any slot
+        if any(hours[subject] > capacity[subject][0] for subject in subjects) or any(
+            hours[first] + hours[second] > joint[first][second][0] for first, second in itertools.combinations(subjects, 2)
+        ):
+            self.stats['elapsed'] = time.monotonic() - started
+            return None
+
+        slot = 0
+        solution = None
+        while True:
+            if slot == size:
+                solution = dict(enumerate(values))
+                break
+            if self._max_nodes is not None and self.stats['nodes'] >= self._max_nodes or deadline is not None and time.monotonic() >= deadline:
+                self.stats['exhausted'] = True
+                break
+
+            placed = False
+            if not tried[slot]:
+                orders[slot] = order(slot)
+            domain = orders[slot]
+            while tried[slot] < len(domain):
+                subject = domain[tried[slot]]
+                tried[slot] += 1
+                self.stats['nodes'] += 1
+                conflict = check(slot, subject)
+                if conflict is None:
+                    placed = True
+                    break
+                conflicts[slot] |= conflict
+
+            if placed:
+                values[slot] = subject
+                counts[subject] += 1
+                run[slot] = run[slot - 1] + 1 if slot and same_day[slot] and values[slot - 1] == subject else 1
+                slot += 1
+                if slot > self.stats['depth']:
+                    self.stats['depth'] = slot
+                    self.best = dict(enumerate(values[:slot]))
+                if slot < size:
+                    conflicts[slot] = set()
+                    tried[slot] = 0
+                continue
+
+            self.stats['backtracks'] += 1
+            conflict = conflicts[slot]
+            if not conflict:
+                break
+            self._learn(tuple(sorted((other, values[other]) for other in conflict)))
+            target = max(conflict)
+            conflicts[target] |= conflict - {target}
+            self.stats['jumped'] += slot - target - 1
+            for other in range(target, slot):
+                counts[values[other]] -= 1
+                values[other] = EMPTY_SLOT
+            slot = target
+
+        self.stats['elapsed'] = time.monotonic() - started
+        return solution
+
+def least_violating(problem: CompiledProblem, assignments: Dict) -> List[int]:
+    """
+    Complete a partial assignment into a timetable that breaks as few rules as possible.
+
+    The assigned slots and lecture blocks are kept. Unplaced lectures of multi-hour
+    courses are laid into the first free run of slots they may start at, and the
+    remaining slots are filled greedily with the eligible single-hour subject that
+    breaks the fewest subject pair rules with the previous slot, then has the most
+    lecture hours left. Slots no subject has hours left for stay empty.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        assignments (Dict): Partial assignment of the model built by ``build_model``.
+
+    Returns:
+        List[int]: Subject id of every slot, or EMPTY_SLOT.
+    """
+    values = [assignments.get(slot, EMPTY_SLOT) for slot in range(problem.size)]
+    for subject, lecture in problem.blocks:
+        start = assignments.get((subject, lecture))
+        if start is None:
+            continue
+        for slot in range(start, start + problem.duration[subject]):
+            if values[slot] == EMPTY_SLOT:
+                values[slot] = subject
+
+    remaining = problem.hours - np.bincount([value for value in values if value != EMPTY_SLOT], minlength=len(problem.subjects))
+    for subject, lecture in problem.blocks:
+        if (subject, lecture) in assignments or remaining[subject] <= 0:
+            continue
+        duration = problem.duration[subject]
+        for start in problem.start_slots(subject):
+            if all(values[slot] == EMPTY_SLOT for slot in range(start, start + duration)):
+                values[start:start + duration] = [subject] * duration
+                remaining[subject] -= duration
+                break
+
+    rules = [pair_rule(pair, together) for pair, together in ((problem.together, True), (problem.apart, False)) if pair]
+    for slot in range(problem.size):
+        if values[slot] != EMPTY_SLOT:
+            continue
+        candidates = [subject for subject in np.flatnonzero(problem.eligible[:, slot]).tolist() if problem.duration[subject] == 1 and remaining[subject] > 0]
+        if not candidates:
+            continue
+        previous = values[slot - 1] if slot > 0 and problem.slot_day[slot - 1] == problem.slot_day[slot] else EMPTY_SLOT
+        values[slot] = max(candidates, key=lambda subject: (-sum(previous != EMPTY_SLOT and not rule(previous, subject) for rule in rules), remaining[subject]))
+        remaining[values[slot]] -= 1
+    return values
+
+class SolveResult:
+    """
+    Outcome of a budgeted timetable search.
+
+    Attributes:
+        status (str): One of OPTIMAL, FEASIBLE, PARTIAL or INFEASIBLE.
+        values (List[int]): Subject id of every slot, or None when there is nothing to schedule.
+        timetable (Dict[str, List[Dict[str, str]]]): The timetable formatted like ``generate`` returns it.
+        violations (Dict[str, int]): Rule violations of the timetable.
+        reasons (List[str]): Why the instance was rejected before searching, if it was.
+        stats (Dict): Search statistics of the solver.
+    """
+
+    def __init__(self, status: str, values: Optional[List[int]], timetable: Optional[Dict[str, List[Dict[str, str]]]], violations: Dict[str, int], reasons: List[str], stats: Dict):
+        self.status = status
+        self.values = values
+        self.timetable = timetable
+        self.violations = violations
+        self.reasons = reasons
+        self.stats = stats
+
+    def to_dict(self) -> Dict:
+        """
+        Returns:
+            Dict: The result without the raw slot values, ready to be serialized.
+        """
+        return {
+            'status': self.status,
+            'timetable': self.timetable,
+            'violations': self.violations,
+            'reasons': self.reasons,
+            'stats': self.stats,
+        }
 
+def classify(violations: Dict[str, int]) -> str:
+    """
+    Returns:
+        str: OPTIMAL if no rule is broken, FEASIBLE if only subject pair rules are broken, PARTIAL otherwise.
+    """
+    if not any(violations.values()):
+        return OPTIMAL
+    if not any(violations[rule] for rule in HARD_RULES):
+        return FEASIBLE
+    return PARTIAL
+
+def presolve(problem: CompiledProblem, stats: Dict) -> Optional[SolveResult]:
+    """
+    Reject instances that cannot be scheduled without searching them.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        stats (Dict): Search statistics reported with the result.
+
+    Returns:
+        Optional[SolveResult]: The INFEASIBLE result of a rejected instance, or None if it has to be searched.
+    """
+    if not problem.size or not problem.subjects:
+        return SolveResult(INFEASIBLE, None, None, {}, ['Nothing to schedule'], stats)
+
+    reasons = problem.infeasibility_reasons()
+    if reasons:
+        logger.info(f"Timetable rejected before search: {'; '.join(reasons)}")
+        values = least_violating(problem, {})
+        return SolveResult(INFEASIBLE, values, problem.timetable(values), problem.violations(values), reasons, stats)
+    return None
+
+def solve(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], solver: Union[TimetableSolver, BackjumpingSolver] = None, time_limit: float = None, node_limit: int = None, ordering: str = DEGREE, lcv: bool = False, symmetries: Sequence[str] = (LECTURES,)) -> SolveResult:
+    """
+    Search for a timetable within a time and node budget.
+
+    When a timetable satisfying every rule is found the status is OPTIMAL. When
+    the budget runs out first, the deepest partial assignment the search reached
+    is completed by ``least_violating`` and the status tells whether the result
+    keeps every hard rule (FEASIBLE) or not (PARTIAL). Instances rejected before
+    searching, or whose search space was exhausted, are INFEASIBLE and still come
+    with their least violating timetable.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        solver (Union[TimetableSolver, BackjumpingSolver], optional): Solver used for the search.
+            Defaults to a new TimetableSolver with the given budget.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the search may visit. Defaults to None (unbounded).
+        ordering (str, optional): Variable ordering of the new solver, one of ORDERINGS. Defaults to DEGREE.
+        lcv (bool, optional): Whether the new solver tries the least constraining values first. Defaults to False.
+        symmetries (Sequence[str], optional): Symmetries the backtracking model breaks, see ``build_model``.
+            Defaults to LECTURES only.
+
+    Returns:
+        SolveResult: The status, timetable, violations and search statistics.
+    """
+    problem = compile_problem(constraints, courses)
+    if solver is None:
+        solver = TimetableSolver(max_nodes=node_limit, time_limit=time_limit, ordering=ordering, lcv=lcv)
+    rejected = presolve(problem, solver.stats)
+    if rejected is not None:
+        return rejected
+
+    if isinstance(solver, BackjumpingSolver):
+        solution = solver.search(problem)
+    else:
+        solution = build_model(problem, solver, symmetries).getSolution()
     if solution is not None:
-        resp_data = {'monday': [], 'tuesday': [], 'wednesday': [], 'thursday': [], 'friday': [], 'saturday': [], 'sunday': []}
-        for key, value in solution.items():
-            resp_data[mapping[key]].append({
-                'id': 1,
-                'name': value,
-                'type': 'custom',
-                'startTime': f'2018-02-25T{str(slot_time[key]).zfill(2)}:00:00',
-                'endTime': f'2018-02-25T{str(slot_time[key]+1).zfill(2)}:00:00'
-            })
-        return resp_data
+        values = [solution[slot] for slot in range(problem.size)]
+        return SolveResult(OPTIMAL, values, problem.timetable(values), problem.violations(values), [], solver.stats)
+
+    values = least_violating(problem, getattr(solver, 'best', {}))
+    violations = problem.violations(values)
+    reasons = []
+    if getattr(solver, 'stats', {}).get('exhausted'):
+        status = classify(violations)
+        logger.info(f"Timetable search stopped by its budget with a {status} result: {solver.stats}")
     else:
-        return None
+        status = INFEASIBLE
+        reasons = ['No timetable satisfies every rule']
+    return SolveResult(status, values, problem.timetable(values), violations, reasons, solver.stats)
 
-def generate_timetable_genetic(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01) -> Dict[str, List[Dict[str, str]]]:
+def generate(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], solver: Union[TimetableSolver, BackjumpingSolver] = None, time_limit: float = None, node_limit: int = None, ordering: str = DEGREE, lcv: bool = False, symmetries: Sequence[str] = (LECTURES,)) -> Dict[str, List[Dict[str, str]]]:
     """
-    Generate a timetable using a genetic algorithm.
+    Generate a timetable based on the provided constraints and courses.
+
+    The search is bounded by the optional time and node budgets. When no timetable
+    satisfies every rule in time, the least violating one found is returned; use
+    ``solve`` to also get its status, violations and the search statistics.
 
     Args:
         constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
         courses (List[Dict[str, int]]): List of dictionaries containing the course information.
-        population_size (int, optional): Size of the population. Defaults to 100.
-        generations (int, optional): Number of generations. Defaults to 1000.
-        mutation_rate (float, optional): Mutation rate. Defaults to 0.01.
+        solver (Union[TimetableSolver, BackjumpingSolver], optional): Solver used for the search.
+            Defaults to a new TimetableSolver.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the search may visit. Defaults to None (unbounded).
+        ordering (str, optional): Variable ordering of the new solver, one of ORDERINGS: DEGREE, MRV
+            or DOM_WDEG. Defaults to DEGREE.
+        lcv (bool, optional): Whether the new solver tries the least constraining subjects first. Defaults to False.
+        symmetries (Sequence[str], optional): Symmetries the backtracking model breaks, out of SYMMETRIES.
+            Defaults to LECTURES only.
 
     Returns:
         Dict[str, List[Dict[str, str]]]: A dictionary containing the generated timetable.
     """
-    constraints_dict = {}
-    start_times = {}
-    end_times = {2: [], 3: []}
-    offset = 0
-    subject_hrs = {}
-    subjects = []
-    subject_data = {}
-    consecutive_subjects = {}
-    diff_consecutive_mode = True
-    diff_non_consecutive_mode = True
-
-    for course in constraints["working_days"]:
-        constraints_dict[course["day"]] = course["total_hours"]
-        start_times[course["day"]] = int(course["start_hr"])
-        end_times[2].append((int(course["total_hours"]) - 2) + offset)
-        for i in range(int(course["total_hours"]) - 3 + offset, int(course["total_hours"]) - 1 + offset):
-            end_times[3].append(i)
-        offset += int(course["total_hours"]) - 1
+    return solve(constraints, courses, solver, time_limit, node_limit, ordering, lcv, symmetries).timetable
 
-    for item in courses:
-        subject_hrs[item["name"]] = int(item['lectureno']) * int(item["duration"])
-        subjects.append(item["name"])
-        subject_data[item['name']] = {'start_hr': int(item['start_hr']), 'end_hr': int(item['end_hr'])}
-        if item["duration"] != 1:
-            consecutive_subjects[item["name"]] = item["duration"]
+def iter_timetables(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], limit: int = None, time_limit: float = None, node_limit: int = None) -> Iterator[Dict[str, List[Dict[str, str]]]]:
+    """
+    Lazily enumerate distinct timetables satisfying every rule.
+
+    Timetables are produced one at a time as the search finds them. Solutions that
+    only differ by which lecture of a course takes which block, or by swapping the
+    contents of days with the same hours, count as one timetable.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        limit (int, optional): Stop after this many timetables. Defaults to None (all of them).
+        time_limit (float, optional): Seconds the whole enumeration may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the whole enumeration may visit. Defaults to None (unbounded).
+
+    Yields:
+        Dict[str, List[Dict[str, str]]]: The next distinct timetable.
+    """
+    problem = compile_problem(constraints, courses)
+    if presolve(problem, {}) is not None:
+        return
+
+    seen = set()
+    solver = TimetableSolver(max_nodes=node_limit, time_limit=time_limit)
+    for solution in build_model(problem, solver, SYMMETRIES).getSolutionIter():
+        values = [solution[slot] for slot in range(problem.size)]
+        key = problem.canonical(values)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield problem.timetable(values)
+        if limit is not None and len(seen) >= limit:
+            return
+
+def warm_start_hints(problem: CompiledProblem, values: Sequence[int]) -> Dict:
+    """
+    Turn a previous timetable into value hints for the variables of ``build_model``.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        values (Sequence[int]): Subject id of every slot in the previous timetable, or EMPTY_SLOT.
+
+    Returns:
+        Dict: Previous subject of every filled slot, and previous start of the lecture blocks
+        that were scheduled in one piece.
+    """
+    hints = {slot: value for slot, value in enumerate(values) if value != EMPTY_SLOT}
+    starts = {}
+    for first, last in problem.day_bounds:
+        slot = int(first)
+        for subject, run in itertools.groupby(values[first:last]):
+            length = len(list(run))
+            if subject != EMPTY_SLOT and length == problem.duration[subject] > 1:
+                starts.setdefault(subject, []).append(slot)
+            slot += length
+    for subject, lecture in problem.blocks:
+        if lecture < len(starts.get(subject, [])):
+            hints[(subject, lecture)] = starts[subject][lecture]
+    return hints
+
+def repair_neighbourhoods(problem: CompiledProblem, values: Sequence[int]) -> List[List[int]]:
+    """
+    List the growing sets of slots to re-solve when repairing a previous timetable.
+
+    The first set holds the slots that break a rule of the new problem and the slots
+    of courses whose number of lecture hours changed (none when the previous timetable
+    still holds), the second the whole days they lie on, and the last every slot.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        values (Sequence[int]): Subject id of every slot in the previous timetable, or EMPTY_SLOT.
+
+    Returns:
+        List[List[int]]: Distinct sets of slots, smallest first.
+    """
+    counts = np.bincount([value for value in values if value != EMPTY_SLOT], minlength=len(problem.subjects))
+    changed = set(np.flatnonzero(counts != problem.hours).tolist())
+    affected = set(problem.conflicted_slots(values)) | {slot for slot, value in enumerate(values) if value in changed}
+    days = {int(problem.slot_day[slot]) for slot in affected}
+    neighbourhoods = [sorted(affected)]
+    for slots in ({slot for slot in range(problem.size) if problem.slot_day[slot] in days}, set(range(problem.size))):
+        if len(slots) > len(neighbourhoods[-1]):
+            neighbourhoods.append(sorted(slots))
+    return neighbourhoods
+
+def resolve(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], previous: Dict[str, List[Dict[str, str]]], time_limit: float = None, node_limit: int = None) -> SolveResult:
+    """
+    Re-solve a changed problem starting from its previous timetable.
+
+    Only the slots affected by the change are searched while every other slot keeps
+    its previous subject; when that fails the search is widened to the affected days
+    and finally to the whole week. Every search tries the previous subjects first,
+    so the new timetable stays as close to the previous one as possible.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        previous (Dict[str, List[Dict[str, str]]]): The previous timetable.
+        time_limit (float, optional): Seconds the repair may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the repair may visit. Defaults to None (unbounded).
+
+    Returns:
+        SolveResult: Like ``solve``, with the number of slots whose subject changed in ``stats['moved']``
+        and the number of slots that were searched in ``stats['freed']``.
+    """
+    problem = compile_problem(constraints, courses)
+    started = time.monotonic()
+    stats = {'nodes': 0, 'backtracks': 0, 'elapsed': 0.0, 'exhausted': False, 'freed': 0, 'moved': 0}
+    rejected = presolve(problem, stats)
+    if rejected is not None:
+        return rejected
+
+    values = problem.values_from_timetable(previous)
+    hints = warm_start_hints(problem, values)
+    best = {}
+    for free in repair_neighbourhoods(problem, values):
+        remaining = time_limit - (time.monotonic() - started) if time_limit is not None else None
+        solver = TimetableSolver(
+            max_nodes=node_limit - stats['nodes'] if node_limit is not None else None,
+            time_limit=max(remaining, 0.0) if remaining is not None else None,
+            hints=hints
+        )
+        model = build_model(problem, solver, symmetries=())
+        for slot in sorted(set(range(problem.size)) - set(free)):
+            model.addConstraint(InSetConstraint([values[slot]]), [slot])
+        solution = model.getSolution()
+        stats['nodes'] += solver.stats['nodes']
+        stats['backtracks'] += solver.stats['backtracks']
+        stats['freed'] = len(free)
+        if len(solver.best) > len(best):
+            best = solver.best
+        if solution is not None:
+            solved = [solution[slot] for slot in range(problem.size)]
+            stats['moved'] = sum(old != new for old, new in zip(values, solved))
+            stats['elapsed'] = time.monotonic() - started
+            return SolveResult(OPTIMAL, solved, problem.timetable(solved), problem.violations(solved), [], stats)
+        if solver.stats['exhausted']:
+            stats['exhausted'] = True
+            break
+
+    solved = least_violating(problem, best)
+    violations = problem.violations(solved)
+    stats['moved'] = sum(old != new for old, new in zip(values, solved))
+    stats['elapsed'] = time.monotonic() - started
+    if stats['exhausted']:
+        return SolveResult(classify(violations), solved, problem.timetable(solved), violations, [], stats)
+    return SolveResult(INFEASIBLE, solved, problem.timetable(solved), violations, ['No timetable satisfies every rule'], stats)
+
+def weighted_penalty(violations: Dict[str, int], weights: Dict[str, int] = None) -> int:
+    """
+    Returns:
+        int: Sum of the rule violations weighted by ``weights`` (PENALTY_WEIGHTS by default).
+    """
+    weights = weights or PENALTY_WEIGHTS
+    return sum(weights[rule] * count for rule, count in violations.items())
+
+def solve_genetic(problem: CompiledProblem, population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01, weights: Dict[str, int] = None, stats: Dict = None, migrate: Callable[[np.ndarray, np.ndarray], Optional[np.ndarray]] = None, migration_interval: int = 50, target_penalty: Optional[int] = 0, stall_generations: int = None, time_limit: float = None, history: List[Tuple[int, float]] = None, refine_steps: int = 0) -> List[int]:
+    """
+    Search a compiled problem with a genetic algorithm.
+
+    The timetable is cut into units: one per lecture hour of the single-hour
+    courses, one per lecture of the multi-hour courses, and one empty unit per slot
+    left over. A genome is a permutation of the units, decoded by laying them out
+    one after another over the time slots, so every genome holds exactly the
+    required lecture hours of each course and lectures are never split within a
+    day. Order crossover and swap mutation keep genomes permutations, leaving the
+    search to lectures running over a day boundary or into another lecture of the
+    same course, slots outside their teacher's window, and subject pair rules.
+
+    Genomes are ranked by a weighted count of their violations. The population is
+    a 2D array of genomes and every step below works on the whole population at once.
+    The search ends early once the fittest genome reaches the target penalty, once
+    it has not improved for ``stall_generations`` generations, or at the deadline.
+
+    With ``refine_steps`` set the search is memetic: every genome entering the elite
+    is first improved by steepest descent over swaps of its single-hour and empty
+    units, whose penalty change is computed from the few slots they touch.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        population_size (int, optional): Size of the population. Defaults to 100.
+        generations (int, optional): Maximum number of generations. Defaults to 1000.
+        mutation_rate (float, optional): Chance of each gene to be swapped with another. Defaults to 0.01.
+        weights (Dict[str, int], optional): Weight of each rule in the penalty. Defaults to PENALTY_WEIGHTS.
+        stats (Dict, optional): Filled with the generations run, why the search stopped ('target',
+            'generations', 'stalled', 'deadline' or 'migration'), the penalty of the fittest genome, the
+            mean penalty of the population, and the generation and seconds after which a genome first
+            kept every hard rule (None if never), and the number of swaps made by the local search.
+        migrate (Callable[[np.ndarray, np.ndarray], Optional[np.ndarray]], optional): Called every
+            ``migration_interval`` generations with the population and penalties, fittest first. Returns
+            genomes replacing the least fit ones, or None to stop the search. Defaults to None.
+        migration_interval (int, optional): Generations between calls of ``migrate``. Defaults to 50.
+        target_penalty (Optional[int], optional): Stop once a genome has at most this penalty. Defaults
+            to 0 (a timetable keeping every rule); None runs until another criterion stops the search.
+        stall_generations (int, optional): Stop after this many generations without a fitter genome.
+            Defaults to None (never).
+        time_limit (float, optional): Stop after this many seconds. Defaults to None (unbounded).
+        history (List[Tuple[int, float]], optional): Appended with the best and mean penalty of the
+            initial population and of every generation. Defaults to None.
+        refine_steps (int, optional): Maximum number of local search swaps per elite genome.
+            Defaults to 0 (a plain genetic algorithm).
+
+    Returns:
+        List[int]: Subject id of every slot in the fittest timetable, or EMPTY_SLOT.
+    """
+    started = time.monotonic()
+    deadline = started + time_limit if time_limit is not None else None
+    rng = np.random.default_rng(random.getrandbits(64))
+    size = problem.size
+    subjects = np.arange(len(problem.subjects))
+    units = [
+        (subject, int(duration))
+        for subject, duration in enumerate(problem.duration.tolist())
+        for _ in range(int(problem.hours[subject]) if duration == 1 else int(problem.lectures[subject]))
+    ]
+    units.extend([(EMPTY_SLOT, 1)] * max(size - int(problem.hours.sum()), 0))
+    unit_subjects = np.array([subject for subject, _ in units], dtype=int)
+    unit_lengths = np.array([length for _, length in units], dtype=int)
+    unit_blocks = unit_lengths > 1
+    genes = np.arange(len(units))
+    slots = np.arange(size)
+    # One entry per slot covered by a unit: the unit, its subject and the offset from its start.
+    # More lecture hours than slots leave the last units hanging past the end of the timetable.
+    width = max(int(unit_lengths.sum()), size)
+    cell_units = np.repeat(genes, unit_lengths)
+    cell_subjects = unit_subjects[cell_units]
+    cell_offsets = np.concatenate([np.arange(length) for length in unit_lengths]) if len(units) else np.zeros(0, dtype=int)
+    # Whether a slot lies on the same day as the slot before it
+    same_day = np.concatenate([[False], problem.slot_day[1:] == problem.slot_day[:-1]])
+    # broken[(left + 1) * (subjects + 1) + right + 1] is the weighted number of pair rules
+    # forbidding subject ``right`` right after subject ``left`` (EMPTY_SLOT included).
+    weights = weights or PENALTY_WEIGHTS
+    broken = np.zeros((len(subjects) + 1) ** 2, dtype=int)
+    for rule_name, pair, together in (('consecutive_subjects', problem.together, True), ('non_consecutive_subjects', problem.apart, False)):
+        if pair:
+            rule = pair_rule(pair, together)
+            broken += weights[rule_name] * np.array([not rule(left, right) for left in range(-1, len(subjects)) for right in range(-1, len(subjects))], dtype=int)
+
+    def decode(population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lay the units of every genome out one after another.
+
+        Args:
+            population (np.ndarray): Genomes, one per row.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Subject id of every time slot, one timetable
+            per row, and the slot where the unit at each position of the genome starts.
+        """
+        rows = np.arange(len(population))[:, None]
+        lengths = unit_lengths[population]
+        starts = np.cumsum(lengths, axis=1) - lengths
+        unit_starts = np.empty_like(population)
+        unit_starts[rows, population] = starts
+        timetables = np.empty((len(population), width), dtype=int)
+        timetables[rows, unit_starts[:, cell_units] + cell_offsets] = cell_subjects
+        return timetables[:, :size], starts
+
+    def everySubject(timetables: np.ndarray) -> np.ndarray:
+        """
+        Count how far every timetable is from the required number of lecture hours.
 
-    if constraints['consecutive_subjects'][0] == "":
-        diff_consecutive_mode = False
+        Only non-zero when there are more lecture hours than slots.
+        """
+        # Count each row in its own range of bins; bin 0 of every range collects EMPTY_SLOT
+        offsets = np.arange(len(timetables))[:, None] * (len(subjects) + 1) + 1
+        counts = np.bincount((timetables + offsets).ravel(), minlength=len(timetables) * (len(subjects) + 1))
+        return np.abs(counts.reshape(len(timetables), len(subjects) + 1)[:, 1:] - problem.hours).sum(axis=1)
 
-    if constraints['non_consecutive_subjects'][0] == "":
-        diff_non_consecutive_mode = False
+    def sameConsecutive(population: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Count the lectures running over a day boundary or into a lecture of the same subject.
+        """
+        blocks = unit_blocks[population]
+        first = np.minimum(starts, size - 1)
+        last = np.minimum(starts + unit_lengths[population] - 1, size - 1)
+        split = blocks & (problem.slot_day[first] != problem.slot_day[last])
+        abutting = blocks[:, :-1] & (unit_subjects[population[:, :-1]] == unit_subjects[population[:, 1:]]) & same_day[first[:, 1:]]
+        return split.sum(axis=1) + abutting.sum(axis=1)
 
-    time_slots, slot_time, mapping = get_time_slots(constraints_dict, start_times)
+    def teacherTimings(timetables: np.ndarray) -> np.ndarray:
+        """
+        Count the slots outside their teacher's window.
+        """
+        filled = timetables != EMPTY_SLOT
+        return (filled & ~problem.eligible[np.where(filled, timetables, 0), slots]).sum(axis=1)
 
-    def fitness(timetable: List[str]) -> int:
+    def fitness(population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calculate the fitness score of a timetable.
+        Calculate the penalty of every genome; lower is fitter.
 
         Args:
-            timetable (List[str]): List of subjects in the timetable.
+            population (np.ndarray): Genomes, one per row.
 
         Returns:
-            int: Fitness score of the timetable.
+            Tuple[np.ndarray, np.ndarray]: Weighted penalty of every timetable, and
+            whether it keeps every hard rule.
         """
-        score = 0
-        if everySubject(*timetable):
-            score += 1
-        if sameConsecutive(*timetable):
-            score += 1
-        if teacherTimings(*timetable):
-            score += 1
-        if diff_consecutive_mode and diffConsecutive(*timetable):
-            score += 1
-        if diff_non_consecutive_mode and diffNonConsecutive(*timetable):
-            score += 1
-        return score
+        timetables, starts = decode(population)
+        adjacent = (timetables[:, :-1] + 1) * (len(subjects) + 1) + timetables[:, 1:] + 1
+        empty = (timetables == EMPTY_SLOT).sum(axis=1)
+        counts = everySubject(timetables) if width > size else 0
+        clashes = sameConsecutive(population, starts)
+        windows = teacherTimings(timetables)
+        hard = (
+            weights['empty_slots'] * empty + weights['lecture_counts'] * counts
+            + weights['consecutive'] * clashes + weights['teacher_timings'] * windows
+        )
+        return hard + broken[adjacent].sum(axis=1), (empty + counts + clashes + windows) == 0
 
-    def mutate(timetable: List[str]) -> List[str]:
+    def mutate(population: np.ndarray) -> np.ndarray:
         """
-        Mutate a timetable by randomly changing subjects.
+        Mutate genomes by swapping pairs of their genes.
 
         Args:
-            timetable (List[str]): List of subjects in the timetable.
+            population (np.ndarray): Genomes, one per row.
 
         Returns:
-            List[str]: Mutated timetable.
+            np.ndarray: Mutated genomes.
         """
-        for i in range(len(timetable)):
-            if random.random() < mutation_rate:
-                timetable[i] = random.choice(subjects)
-        return timetable
+        swaps = rng.binomial(len(genes), mutation_rate, size=len(population))
+        # One swap per genome and round, so no gene is written twice at once
+        for step in range(swaps.max(initial=0)):
+            rows = np.flatnonzero(swaps > step)
+            first, second = rng.integers(0, len(genes), size=(2, len(rows)))
+            population[rows, first], population[rows, second] = population[rows, second], population[rows, first]
+        return population
 
-    def crossover(parent1: List[str], parent2: List[str]) -> List[str]:
+    def crossover(parents1: np.ndarray, parents2: np.ndarray) -> np.ndarray:
         """
-        Perform crossover between two parent timetables to create a child timetable.
+        Perform order crossover between pairs of parent genomes.
+
+        Every child copies a random segment of its first parent and fills the
+        positions around it with the remaining genes in the order of its second parent.
 
         Args:
-            parent1 (List[str]): First parent timetable.
-            parent2 (List[str]): Second parent timetable.
+            parents1 (np.ndarray): First parent of every child, one per row.
+            parents2 (np.ndarray): Second parent of every child, one per row.
 
         Returns:
-            List[str]: Child timetable.
-        """
-        crossover_point = random.randint(0, len(parent1) - 1)
-        return parent1[:crossover_point] + parent2[crossover_point:]
-
-    population = [[random.choice(subjects) for _ in range(len(time_slots))] for _ in range(population_size)]
-
-    for _ in range(generations):
-        population = sorted(population, key=lambda x: fitness(x), reverse=True)
-        next_generation = population[:10]
-        for _ in range(population_size - 10):
-            parent1 = random.choice(population[:50])
-            parent2 = random.choice(population[:50])
-            child = crossover(parent1, parent2)
-            child = mutate(child)
-            next_generation.append(child)
-        population = next_generation
-
-    best_timetable = population[0]
-    if fitness(best_timetable) > 0:
-        resp_data = {'monday': [], 'tuesday': [], 'wednesday': [], 'thursday': [], 'friday': [], 'saturday': [], 'sunday': []}
-        for index, value in enumerate(best_timetable):
-            resp_data[mapping[time_slots[index]]].append({
-                'id': 1,
-                'name': value,
-                'type': 'custom',
-                'startTime': f'2018-02-25T{str(slot_time[time_slots[index]]).zfill(2)}:00:00',
-                'endTime': f'2018-02-25T{str(slot_time[time_slots[index]]+1).zfill(2)}:00:00'
-            })
-        return resp_data
-    else:
+            np.ndarray: Child genomes.
+        """
+        rows = np.arange(len(parents1))[:, None]
+        bounds = np.sort(rng.integers(0, len(genes) + 1, size=(len(parents1), 2)), axis=1)
+        segment = (bounds[:, :1] <= genes) & (genes < bounds[:, 1:])
+        copied = np.zeros(parents1.shape, dtype=bool)
+        copied[np.nonzero(segment)[0], parents1[segment]] = True
+        children = np.where(segment, parents1, 0)
+        # Every row has as many positions outside the segment as genes left to take
+        children[~segment] = parents2[~copied[rows, parents2]]
+        return children
+
+    # slot_cost[subject + 1, slot] is the weighted teacher window penalty of the subject (EMPTY_SLOT
+    # included) in the slot, and pair_cost[left + 1, right + 1] the one of two adjacent subjects.
+    slot_cost = weights['teacher_timings'] * np.vstack([np.zeros((1, size), dtype=bool), ~problem.eligible]).astype(int)
+    pair_cost = broken.reshape(len(subjects) + 1, len(subjects) + 1)
+
+    def refine(genome: np.ndarray) -> int:
+        """
+        Improve a genome in place by steepest descent over swaps of its single-hour units.
+
+        Swapping two units one slot long leaves every other unit where it is, so a swap
+        only changes the teacher window terms of its two slots and the pair rule terms
+        of the adjacent slots around them.
+
+        Args:
+            genome (np.ndarray): The genome to improve.
+
+        Returns:
+            int: Number of swaps made.
+        """
+        timetable, starts = decode(genome[None])
+        timetable, starts = timetable[0], starts[0]
+        movable = np.flatnonzero((unit_lengths[genome] == 1) & (starts < size))
+        first, second = np.triu_indices(len(movable), k=1)
+        slot, other = starts[movable[first]], starts[movable[second]]
+        # Left slot of every adjacent pair a swap touches; when both slots are neighbours
+        # the pair between them would be counted twice.
+        edges = np.stack([slot - 1, slot, other - 1, other])
+        counted = (edges >= 0) & (edges < size - 1)
+        counted[2] &= other - 1 != slot
+        edges = np.clip(edges, 0, max(size - 2, 0))
+
+        def swapped(indices: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+            return np.where(indices == slot, right, np.where(indices == other, left, timetable[indices]))
+
+        moves = 0
+        while moves < refine_steps and len(slot):
+            left, right = timetable[slot], timetable[other]
+            before = pair_cost[timetable[edges] + 1, timetable[edges + 1] + 1]
+            after = pair_cost[swapped(edges, left, right) + 1, swapped(edges + 1, left, right) + 1]
+            delta = (
+                slot_cost[right + 1, slot] + slot_cost[left + 1, other] - slot_cost[left + 1, slot] - slot_cost[right + 1, other]
+                + ((after - before) * counted).sum(axis=0)
+            )
+            move = np.argmin(delta)
+            if delta[move] >= 0:
+                break
+            genome[movable[[first[move], second[move]]]] = genome[movable[[second[move], first[move]]]]
+            timetable[[slot[move], other[move]]] = right[move], left[move]
+            moves += 1
+        return moves
+
+    population = np.argsort(rng.random((population_size, len(genes))), axis=1)
+    # Whether each genome already went through the local search
+    polished = np.zeros(population_size, dtype=bool)
+    refined = 0
+    elite = min(10, population_size)
+    breeders = min(50, population_size)
+
+    def stopping(generation: int) -> Optional[str]:
+        """
+        Tell why the search should stop after the given generation, or None to go on.
+        """
+        if target_penalty is not None and best <= target_penalty:
+            return 'target'
+        if generation >= generations:
+            return 'generations'
+        if stall_generations is not None and generation - improved_at >= stall_generations:
+            return 'stalled'
+        if deadline is not None and time.monotonic() >= deadline:
+            return 'deadline'
         return None
+
+    scores, feasible = fitness(population)
+    feasible_at = 0 if feasible.any() else None
+    feasible_after = time.monotonic() - started if feasible_at is not None else None
+    best, improved_at = int(scores.min()), 0
+    if history is not None:
+        history.append((best, float(scores.mean())))
+
+    generation = 0
+    stopped = stopping(generation)
+    while stopped is None:
+        generation += 1
+        order = np.argsort(scores, kind='stable')
+        population, scores, polished = population[order], scores[order], polished[order]
+        fresh = np.flatnonzero(~polished[:elite]) if refine_steps else []
+        if len(fresh):
+            for index in fresh:
+                refined += refine(population[index])
+            polished[fresh] = True
+            scores[fresh], feasible = fitness(population[fresh])
+            if feasible_at is None and feasible.any():
+                feasible_at, feasible_after = generation, time.monotonic() - started
+            order = np.argsort(scores, kind='stable')
+            population, scores, polished = population[order], scores[order], polished[order]
+        parents = population[rng.integers(0, breeders, size=(2, population_size - elite))]
+        children = mutate(crossover(parents[0], parents[1]))
+        # The elite is carried over unchanged, so only the children need scoring
+        child_scores, feasible = fitness(children)
+        population = np.concatenate([population[:elite], children])
+        scores = np.concatenate([scores[:elite], child_scores])
+        polished = np.concatenate([polished[:elite], np.zeros(len(children), dtype=bool)])
+        if feasible_at is None and feasible.any():
+            feasible_at, feasible_after = generation, time.monotonic() - started
+        if migrate is not None and generation % migration_interval == 0:
+            order = np.argsort(scores, kind='stable')
+            population, scores, polished = population[order], scores[order], polished[order]
+            immigrants = migrate(population, scores)
+            if immigrants is None:
+                stopped = 'migration'
+            else:
+                # Immigrants replace the least fit genomes, never the elite
+                immigrants = immigrants[:population_size - elite]
+                if len(immigrants):
+                    population[-len(immigrants):] = immigrants
+                    scores[-len(immigrants):] = fitness(immigrants)[0]
+                    polished[-len(immigrants):] = False
+        if scores.min() < best:
+            best, improved_at = int(scores.min()), generation
+        if history is not None:
+            history.append((int(scores.min()), float(scores.mean())))
+        stopped = stopped or stopping(generation)
+
+    if stats is not None:
+        stats.update({
+            'generations': generation,
+            'stopped': stopped,
+            'penalty': int(scores.min()),
+            'mean_penalty': float(scores.mean()),
+            'feasible_at': feasible_at,
+            'feasible_after': feasible_after,
+            'refined': refined,
+            'elapsed': time.monotonic() - started,
+        })
+    return decode(population[np.argmin(scores)][None])[0][0].tolist()
+
+class LocalSearchState:
+    """
+    Complete timetable under local search, with its penalty kept up to date move by move.
+
+    Lectures of multi-hour courses are kept as blocks at valid start slots, so they
+    are never misshapen or outside their teacher's window; single-hour lectures and
+    empty slots fill the other slots. Every remaining penalty term belongs to one
+    slot (teacher windows) or to one pair of adjacent slots (subject pair rules and
+    blocks of the same course running into each other), so a move is evaluated from
+    the handful of slots it changes and the pairs around them, whatever the size of
+    the timetable. Slots involved in a violation are kept in an indexed set, so a
+    random one is drawn in constant time.
+    """
+
+    def __init__(self, problem: CompiledProblem, rng: random.Random, weights: Dict[str, int] = None):
+        """
+        Args:
+            problem (CompiledProblem): The compiled problem.
+            rng (random.Random): Source of randomness of the initial timetable and the moves.
+            weights (Dict[str, int], optional): Weight of each rule in the penalty. Defaults to PENALTY_WEIGHTS.
+        """
+        weights = weights or PENALTY_WEIGHTS
+        self.problem = problem
+        self.rng = rng
+        self.size = problem.size
+        subjects = range(-1, len(problem.subjects))
+        # window[subject + 1][slot] and pair[left + 1][right + 1] are the weighted penalties of a
+        # subject (EMPTY_SLOT included) in a slot and of two subjects in adjacent slots.
+        self._window = [[0] * self.size] + [[0 if ok else weights['teacher_timings'] for ok in row] for row in problem.eligible.tolist()]
+        self._pair = [[0] * len(subjects) for _ in subjects]
+        for rule_name, pair, together in (('consecutive_subjects', problem.together, True), ('non_consecutive_subjects', problem.apart, False)):
+            if pair:
+                rule = pair_rule(pair, together)
+                for left in subjects:
+                    for right in subjects:
+                        self._pair[left + 1][right + 1] += weights[rule_name] * (not rule(left, right))
+        self._abutting = weights['consecutive']
+        slot_day = problem.slot_day.tolist()
+        self._same_day = [False] + [slot_day[slot] == slot_day[slot - 1] for slot in range(1, self.size)]
+        self._starts = [problem.start_slots(subject) if duration > 1 else [] for subject, duration in enumerate(problem.duration.tolist())]
+        self._can_start = problem.starts.tolist()
+
+        self.values = [EMPTY_SLOT] * self.size
+        # Block occupying every slot, or -1, and the subject, start slot and duration of every block
+        self.block_at = [-1] * self.size
+        self.blocks = []
+        self._lay_out()
+        self.penalty = sum(self._window[value + 1][slot] for slot, value in enumerate(self.values)) + sum(self._edge(slot) for slot in range(self.size - 1))
+        self.conflicted = []
+        self._position = {}
+        for slot in range(self.size):
+            self._refresh(slot)
+
+    def _lay_out(self) -> None:
+        """
+        Build the initial timetable: blocks at random valid starts, then the single-hour
+        lectures in random eligible slots, the most constrained courses first.
+        """
+        problem = self.problem
+        for subject in sorted(np.flatnonzero(problem.duration > 1).tolist(), key=lambda subject: len(self._starts[subject])):
+            duration = int(problem.duration[subject])
+            for _ in range(int(problem.lectures[subject])):
+                starts = [start for start in self._starts[subject] if all(self.block_at[slot] == -1 for slot in range(start, start + duration))]
+                # Keep lectures of the same course apart when possible
+                apart = [start for start in starts if self._not_subject(start - 1, subject) and self._not_subject(start + duration, subject)]
+                if starts:
+                    self._place_block(subject, self.rng.choice(apart or starts), duration)
+
+        free = [slot for slot in range(self.size) if self.block_at[slot] == -1]
+        single = sorted(np.flatnonzero(problem.duration == 1).tolist(), key=lambda subject: problem.eligible[subject].sum())
+        unplaced = []
+        for subject in single:
+            eligible = [slot for slot in free if problem.eligible[subject, slot] and self.values[slot] == EMPTY_SLOT]
+            hours = int(problem.hours[subject])
+            chosen = self.rng.sample(eligible, min(hours, len(eligible)))
+            for slot in chosen:
+                self.values[slot] = subject
+            unplaced.extend([subject] * (hours - len(chosen)))
+        empty = [slot for slot in free if self.values[slot] == EMPTY_SLOT]
+        self.rng.shuffle(empty)
+        for slot, subject in zip(empty, unplaced):
+            self.values[slot] = subject
+
+    def _not_subject(self, slot: int, subject: int) -> bool:
+        return not 0 <= slot < self.size or self.values[slot] != subject
+
+    def _place_block(self, subject: int, start: int, duration: int) -> None:
+        block = len(self.blocks)
+        self.blocks.append([subject, start, duration])
+        for slot in range(start, start + duration):
+            self.values[slot] = subject
+            self.block_at[slot] = block
+
+    def _edge(self, slot: int) -> int:
+        """
+        Penalty of the pair of ``slot`` and the slot after it.
+        """
+        left, right = self.values[slot], self.values[slot + 1]
+        cost = self._pair[left + 1][right + 1]
+        block = self.block_at[slot]
+        if left == right and block != -1 and block != self.block_at[slot + 1] and self._same_day[slot + 1]:
+            cost += self._abutting
+        return cost
+
+    def _cost(self, slots: List[int]) -> int:
+        """
+        Penalty of the given slots and of every pair of adjacent slots they are part of.
+        """
+        edges = {edge for slot in slots for edge in (slot - 1, slot) if 0 <= edge < self.size - 1}
+        return sum(self._window[self.values[slot] + 1][slot] for slot in slots) + sum(self._edge(edge) for edge in edges)
+
+    def _apply(self, changes: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+        undo = [(slot, self.values[slot], self.block_at[slot]) for slot, _, _ in changes]
+        for slot, value, block in changes:
+            self.values[slot] = value
+            self.block_at[slot] = block
+        return undo
+
+    def _refresh(self, slot: int) -> None:
+        """
+        Add the slot to or remove it from the conflicted slots.
+        """
+        conflicted = (
+            self._window[self.values[slot] + 1][slot] > 0
+            or (slot > 0 and self._edge(slot - 1) > 0)
+            or (slot < self.size - 1 and self._edge(slot) > 0)
+        )
+        if conflicted and slot not in self._position:
+            self._position[slot] = len(self.conflicted)
+            self.conflicted.append(slot)
+        elif not conflicted and slot in self._position:
+            # Move the last conflicted slot into the hole left by this one
+            index = self._position.pop(slot)
+            last = self.conflicted.pop()
+            if last != slot:
+                self.conflicted[index] = last
+                self._position[last] = index
+
+    def moves(self, slot: int, count: int) -> List[List[Tuple[int, int, int]]]:
+        """
+        Draw moves changing the given slot.
+
+        A slot of a block moves the whole block to another valid start, swapping it with
+        the single-hour lectures there. Any other slot swaps its subject with another
+        slot outside the blocks, or has a block moved over it, which frees slots a
+        misplaced block stands on.
+
+        Args:
+            slot (int): Slot to change.
+            count (int): Number of moves to draw.
+
+        Returns:
+            List[List[Tuple[int, int, int]]]: Every move as the new subject and block of each slot it changes.
+        """
+        moves = []
+        block = self.block_at[slot]
+        if block != -1:
+            starts = self._starts[self.blocks[block][0]]
+            for target in self.rng.sample(starts, min(count, len(starts))):
+                moves.append(self._block_move(block, target))
+            return [move for move in moves if move is not None]
+        for _ in range(count):
+            other = self.rng.randrange(self.size)
+            block = self.block_at[other]
+            if block == -1:
+                if self.values[other] != self.values[slot]:
+                    moves.append([(slot, self.values[other], -1), (other, self.values[slot], -1)])
+                continue
+            subject, _, duration = self.blocks[block]
+            targets = [target for target in range(max(slot - duration + 1, 0), slot + 1) if self._can_start[subject][target]]
+            if targets:
+                moves.append(self._block_move(block, self.rng.choice(targets)))
+        return [move for move in moves if move is not None]
+
+    def _block_move(self, block: int, target: int) -> Optional[List[Tuple[int, int, int]]]:
+        """
+        Build the move of a block to another start slot, or None if other blocks are in the way.
+
+        The slots the block comes to cover hand their subjects, in order, to the slots it leaves.
+        """
+        subject, start, duration = self.blocks[block]
+        covered = [slot for slot in range(target, target + duration) if not start <= slot < start + duration]
+        if target == start or any(self.block_at[slot] != -1 for slot in covered):
+            return None
+        left = [slot for slot in range(start, start + duration) if not target <= slot < target + duration]
+        return (
+            [(slot, self.values[other], -1) for slot, other in zip(left, covered)]
+            + [(slot, subject, block) for slot in range(target, target + duration)]
+        )
+
+    def delta(self, move: List[Tuple[int, int, int]]) -> int:
+        """
+        Compute the change of the penalty a move would make, without making it.
+
+        Args:
+            move (List[Tuple[int, int, int]]): New subject and block of each slot the move changes.
+
+        Returns:
+            int: Penalty after the move minus the penalty before it.
+        """
+        slots = [slot for slot, _, _ in move]
+        before = self._cost(slots)
+        undo = self._apply(move)
+        after = self._cost(slots)
+        self._apply(undo)
+        return after - before
+
+    def commit(self, move: List[Tuple[int, int, int]], delta: int) -> None:
+        """
+        Make a move whose penalty change was computed by ``delta``.
+
+        Args:
+            move (List[Tuple[int, int, int]]): New subject and block of each slot the move changes.
+            delta (int): Penalty change of the move.
+        """
+        self._apply(move)
+        for slot, _, block in move:
+            if block != -1:
+                self.blocks[block][1] = slot
+                break
+        self.penalty += delta
+        for slot in {neighbour for slot, _, _ in move for neighbour in (slot - 1, slot, slot + 1) if 0 <= neighbour < self.size}:
+            self._refresh(slot)
+
+def solve_min_conflicts(problem: CompiledProblem, max_steps: int = 100000, noise: float = 0.1, time_limit: float = None, temperature: float = 1.0, candidates: int = 20, stats: Dict = None) -> List[int]:
+    """
+    Search a compiled problem with min-conflicts local search and simulated annealing.
+
+    The search keeps a complete timetable in a ``LocalSearchState``. Each step
+    draws a random conflicted slot and ``candidates`` moves changing it, and takes
+    the one that lowers the penalty most; a worse move is only made with the
+    simulated annealing probability ``exp(-delta / T)``, where the temperature T
+    cools geometrically from ``temperature`` to a hundredth of it over ``max_steps``.
+    With probability ``noise`` a random one of the moves is made instead, to escape
+    local minima. Moves swap lectures, so every course keeps its lecture hours.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        max_steps (int, optional): Number of steps. Defaults to 100000.
+        noise (float, optional): Probability of a random move. Defaults to 0.1.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        temperature (float, optional): Initial annealing temperature, in penalty points. Defaults to 1.0;
+            0 only makes moves that do not increase the penalty.
+        candidates (int, optional): Moves drawn per step. Defaults to 20.
+        stats (Dict, optional): Filled with the steps taken, the moves made, the weighted penalty of
+            the timetable returned and the seconds the search took.
+
+    Returns:
+        List[int]: Subject id of every slot in the least violating timetable found, or EMPTY_SLOT.
+    """
+    started = time.monotonic()
+    deadline = started + time_limit if time_limit is not None else None
+    rng = random.Random(random.getrandbits(64))
+    state = LocalSearchState(problem, rng)
+    best, best_penalty = state.values[:], state.penalty
+    cooling = 0.01 ** (1 / max_steps) if max_steps else 1.0
+    heat = temperature
+    step = made = 0
+    while step < max_steps and state.conflicted and (deadline is None or time.monotonic() < deadline):
+        step += 1
+        heat *= cooling
+        moves = state.moves(state.conflicted[rng.randrange(len(state.conflicted))], candidates)
+        if not moves:
+            continue
+        if rng.random() < noise:
+            move = rng.choice(moves)
+            delta = state.delta(move)
+        else:
+            delta, _, move = min(((state.delta(move), rng.random(), move) for move in moves), key=lambda scored: scored[:2])
+            if delta > 0 and (heat <= 0 or rng.random() >= math.exp(-delta / heat)):
+                continue
+        state.commit(move, delta)
+        made += 1
+        if state.penalty < best_penalty:
+            best, best_penalty = state.values[:], state.penalty
+
+    if stats is not None:
+        stats.update({
+            'steps': step,
+            'moves': made,
+            'penalty': weighted_penalty(problem.violations(best)),
+            'elapsed': time.monotonic() - started,
+        })
+    return best
+
+def presolve_layout(problem: CompiledProblem) -> Optional[SolveResult]:
+    """
+    Reject instances the genetic algorithm and local search cannot even lay out.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+
+    Returns:
+        Optional[SolveResult]: An INFEASIBLE result without a timetable, or None if the search should run.
+    """
+    if not problem.size or not problem.subjects:
+        return SolveResult(INFEASIBLE, None, None, {}, ['Nothing to schedule'], {})
+    if not problem.starts[problem.duration > 1].any(axis=1).all():
+        logger.info("Timetable rejected before search: a multi-hour course has no valid start slot")
+        return SolveResult(INFEASIBLE, None, None, {}, ['A multi-hour course has no valid start slot'], {})
+    return None
+
+def grade(problem: CompiledProblem, values: List[int], stats: Dict) -> SolveResult:
+    """
+    Grade a timetable found by a local search that cannot prove infeasibility itself.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        values (List[int]): Subject id of every slot, or EMPTY_SLOT.
+        stats (Dict): Search statistics.
+
+    Returns:
+        SolveResult: The timetable with its violations, graded OPTIMAL, FEASIBLE or PARTIAL, or
+        INFEASIBLE when the instance fails a necessary condition.
+    """
+    violations = problem.violations(values)
+    reasons = problem.infeasibility_reasons()
+    status = INFEASIBLE if reasons else classify(violations)
+    return SolveResult(status, values, problem.timetable(values), violations, reasons, stats)
+
+def solve_timetable_genetic(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01, stall_generations: int = None, time_limit: float = None, refine_steps: int = 0) -> SolveResult:
+    """
+    Search for a timetable with the genetic algorithm and grade the result.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        population_size (int, optional): Size of the population. Defaults to 100.
+        generations (int, optional): Maximum number of generations. Defaults to 1000.
+        mutation_rate (float, optional): Mutation rate. Defaults to 0.01.
+        stall_generations (int, optional): Stop after this many generations without improvement.
+            Defaults to None (never).
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        refine_steps (int, optional): Maximum number of local search swaps per elite genome.
+            Defaults to 0 (a plain genetic algorithm).
+
+    Returns:
+        SolveResult: The fittest timetable with its violations, graded OPTIMAL, FEASIBLE or PARTIAL
+        (INFEASIBLE when the instance cannot be scheduled), and the search statistics including its
+        weighted penalty.
+    """
+    problem = compile_problem(constraints, courses)
+    rejected = presolve_layout(problem)
+    if rejected is not None:
+        return rejected
+
+    stats = {}
+    values = solve_genetic(problem, population_size, generations, mutation_rate, stats=stats, stall_generations=stall_generations, time_limit=time_limit, refine_steps=refine_steps)
+    return grade(problem, values, stats)
+
+def solve_timetable_min_conflicts(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], max_steps: int = 100000, time_limit: float = None, temperature: float = 1.0) -> SolveResult:
+    """
+    Search for a timetable with min-conflicts local search and grade the result.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        max_steps (int, optional): Number of steps. Defaults to 100000.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        temperature (float, optional): Initial annealing temperature. Defaults to 1.0.
+
+    Returns:
+        SolveResult: The least violating timetable found with its violations, graded OPTIMAL, FEASIBLE
+        or PARTIAL (INFEASIBLE when the instance cannot be scheduled), and the search statistics.
+    """
+    problem = compile_problem(constraints, courses)
+    rejected = presolve_layout(problem)
+    if rejected is not None:
+        return rejected
+
+    stats = {}
+    values = solve_min_conflicts(problem, max_steps, time_limit=time_limit, temperature=temperature, stats=stats)
+    return grade(problem, values, stats)
+
+def generate_timetable_genetic(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01, stall_generations: int = None, time_limit: float = None, refine_steps: int = 0) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Generate a timetable using a genetic algorithm.
+
+    Use ``solve_timetable_genetic`` to also get the violations and penalty of the timetable.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        population_size (int, optional): Size of the population. Defaults to 100.
+        generations (int, optional): Maximum number of generations. Defaults to 1000.
+        mutation_rate (float, optional): Mutation rate. Defaults to 0.01.
+        stall_generations (int, optional): Stop after this many generations without improvement.
+            Defaults to None (never).
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        refine_steps (int, optional): Maximum number of local search swaps per elite genome.
+            Defaults to 0 (a plain genetic algorithm).
+
+    Returns:
+        Dict[str, List[Dict[str, str]]]: A dictionary containing the generated timetable.
+    """
+    return solve_timetable_genetic(constraints, courses, population_size, generations, mutation_rate, stall_generations, time_limit, refine_steps).timetable
+
+def generate_timetable_min_conflicts(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], max_steps: int = 100000, time_limit: float = None, temperature: float = 1.0) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Generate a timetable using min-conflicts local search.
+
+    Scales to instances far too large for ``generate``. Use ``solve_timetable_min_conflicts``
+    to also get the violations of the timetable.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        max_steps (int, optional): Number of steps. Defaults to 100000.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        temperature (float, optional): Initial annealing temperature. Defaults to 1.0.
+
+    Returns:
+        Dict[str, List[Dict[str, str]]]: A dictionary containing the generated timetable.
+    """
+    return solve_timetable_min_conflicts(constraints, courses, max_steps, time_limit, temperature).timetable
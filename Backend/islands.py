@@ -0,0 +1,154 @@
+"""
+Island model genetic algorithm.
+
+Several populations evolve in separate processes, arranged in a ring. Every few
+generations each island sends copies of its fittest genomes to the next island,
+which replace the least fit genomes there, so good building blocks spread while
+the islands keep exploring different parts of the search space. All islands stop
+as soon as one of them finds a timetable without violations.
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import time
+
+import numpy as np
+
+from csp import CompiledProblem, SolveResult, compile_problem, grade, least_violating, presolve_layout, solve_genetic
+
+logger = logging.getLogger(__name__)
+
+# Seconds the islands get on top of the time limit to report their fittest timetable.
+GRACE_PERIOD = 1.0
+
+def run_island(problem: CompiledProblem, island: int, seed: int, inbox, outbox, results, stop, options: Tuple[int, int, float, int, int, Optional[float]]) -> None:
+    """
+    Evolve one island and report its fittest timetable on the results queue.
+
+    Reports a tuple of the island number, the subject id of every slot and the
+    statistics of the genetic algorithm.
+    """
+    population_size, generations, mutation_rate, migration_interval, migrants, time_limit = options
+    random.seed(seed)
+    # Genomes left for an island that already stopped must not keep this process alive
+    outbox.cancel_join_thread()
+
+    def migrate(population: np.ndarray, scores: np.ndarray) -> Optional[np.ndarray]:
+        if stop.is_set():
+            return None
+        outbox.put(population[:migrants].copy())
+        immigrants = []
+        while True:
+            try:
+                immigrants.append(inbox.get_nowait())
+            except queue.Empty:
+                break
+        return np.concatenate(immigrants) if immigrants else population[:0]
+
+    stats = {}
+    values = solve_genetic(problem, population_size, generations, mutation_rate, stats=stats, migrate=migrate, migration_interval=migration_interval, time_limit=time_limit)
+    results.put((island, values, stats))
+
+def solve_islands(problem: CompiledProblem, islands: int = None, population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01, migration_interval: int = 50, migrants: int = 2, time_limit: float = None, stats: Dict = None) -> List[int]:
+    """
+    Search a compiled problem with one genetic algorithm population per process.
+
+    Args:
+        problem (CompiledProblem): The compiled problem.
+        islands (int, optional): Number of islands. Defaults to the number of CPUs.
+        population_size (int, optional): Size of the population of each island. Defaults to 100.
+        generations (int, optional): Number of generations of each island. Defaults to 1000.
+        mutation_rate (float, optional): Chance of each gene to be swapped with another. Defaults to 0.01.
+        migration_interval (int, optional): Generations between migrations. Defaults to 50.
+        migrants (int, optional): Genomes every island sends to the next one per migration. Defaults to 2.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        stats (Dict, optional): Filled with the statistics of the island that found the fittest
+            timetable, its number, the number of islands and the seconds the search took.
+
+    Returns:
+        List[int]: Subject id of every slot in the fittest timetable, or EMPTY_SLOT.
+    """
+    started = time.monotonic()
+    islands = islands or os.cpu_count() or 1
+    deadline = started + time_limit if time_limit is not None else None
+    seed = random.getrandbits(32)
+    options = (population_size, generations, mutation_rate, migration_interval, migrants, time_limit)
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+    inboxes = [context.Queue() for _ in range(islands)]
+    results = context.Queue()
+    stop = context.Event()
+    processes = [
+        context.Process(target=run_island, args=(problem, island, seed + island, inboxes[island], inboxes[(island + 1) % islands], results, stop, options), daemon=True)
+        for island in range(islands)
+    ]
+    for process in processes:
+        process.start()
+
+    best = None
+    pending = islands
+    try:
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                stop.set()
+                if now >= deadline + GRACE_PERIOD:
+                    break
+            try:
+                island, values, island_stats = results.get(timeout=0.5)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            pending -= 1
+            if best is None or island_stats['penalty'] < best[2]['penalty']:
+                best = (island, values, island_stats)
+            if island_stats['penalty'] == 0:
+                break
+    finally:
+        stop.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        for channel in inboxes + [results]:
+            channel.close()
+
+    if best is None:
+        logger.warning("Island search ended without a report from any island")
+        island, values, island_stats = None, least_violating(problem, {}), {}
+    else:
+        island, values, island_stats = best
+    if stats is not None:
+        stats.update(island_stats, island=island, islands=islands, elapsed=time.monotonic() - started)
+    return values
+
+def solve_timetable_islands(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], islands: int = None, population_size: int = 100, generations: int = 1000, mutation_rate: float = 0.01, migration_interval: int = 50, migrants: int = 2, time_limit: float = None) -> SolveResult:
+    """
+    Search for a timetable with the island model genetic algorithm and grade the result.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        islands (int, optional): Number of islands. Defaults to the number of CPUs.
+        population_size (int, optional): Size of the population of each island. Defaults to 100.
+        generations (int, optional): Number of generations of each island. Defaults to 1000.
+        mutation_rate (float, optional): Chance of each gene to be swapped with another. Defaults to 0.01.
+        migration_interval (int, optional): Generations between migrations. Defaults to 50.
+        migrants (int, optional): Genomes every island sends to the next one per migration. Defaults to 2.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+
+    Returns:
+        SolveResult: The fittest timetable of all islands with its violations and the search statistics.
+    """
+    problem = compile_problem(constraints, courses)
+    rejected = presolve_layout(problem)
+    if rejected is not None:
+        return rejected
+
+    stats = {}
+    values = solve_islands(problem, islands, population_size, generations, mutation_rate, migration_interval, migrants, time_limit, stats)
+    return grade(problem, values, stats)
@@ -0,0 +1,357 @@
+"""
+Asynchronous timetable generation jobs.
+
+A job holds the solver inputs of one generation request in Mongo. The API
+inserts it and answers with its id at once; worker processes, on the API node
+or on any other node sharing the database, claim queued jobs one at a time, run
+the solver and store the result on the job, where the API reads it back. While
+solving, a worker renews the lease on its job, so the jobs of a worker that
+died are claimed again once their lease expired. Cancelling a job makes its
+worker lose the job at the next renewal, and the worker then kills the solver
+process of the job.
+
+Run a worker from the Backend directory:
+
+    python jobs.py
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import functools
+import logging
+import os
+import socket
+import time
+import uuid
+
+from cache import SolutionCache, problem_key
+from csp import INFEASIBLE, OPTIMAL, SolveResult, resolve, solve
+from portfolio import solve_portfolio
+from sandbox import SolverPool, TaskCancelled
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+def solve_inputs(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], previous: Optional[Dict[str, List[Dict[str, str]]]] = None, workers: int = 1, time_limit: float = None, node_limit: int = None) -> SolveResult:
+    """
+    Search for a timetable the way the API configures the solver.
+
+    A previous timetable is repaired with ``resolve`` within half of the budget.
+    Without one, or when the repair does not find a timetable satisfying every rule,
+    several workers race in a portfolio, and a single one runs the backtracking
+    search, within the rest of the budget.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        previous (Dict[str, List[Dict[str, str]]], optional): Timetable to start from. Defaults to None.
+        workers (int, optional): Number of portfolio processes. Defaults to 1.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the search may visit. Defaults to None (unbounded).
+
+    Returns:
+        SolveResult: The status, timetable, violations and search statistics.
+    """
+    if previous is not None:
+        started = time.monotonic()
+        repaired = resolve(
+            constraints, courses, previous,
+            time_limit=time_limit / 2 if time_limit is not None else None,
+            node_limit=node_limit // 2 if node_limit is not None else None
+        )
+        # The repair widens to the whole week last, so an infeasible repair proves the problem infeasible
+        if repaired.status in (OPTIMAL, INFEASIBLE):
+            return repaired
+        logger.info(f"Timetable repair ended {repaired.status}, solving from scratch")
+        if time_limit is not None:
+            time_limit = max(time_limit - (time.monotonic() - started), 0.0)
+        if node_limit is not None:
+            node_limit = max(node_limit - repaired.stats['nodes'], 1)
+    if workers > 1:
+        return solve_portfolio(constraints, courses, workers=workers, time_limit=time_limit, node_limit=node_limit)
+    return solve(constraints, courses, time_limit=time_limit, node_limit=node_limit)
+
+def job_status(job: Dict) -> Dict:
+    """
+    Returns:
+        Dict: The public fields of a job, without its inputs and timetable.
+    """
+    result = job.get('result')
+    return {
+        'job_id': job['_id'],
+        'status': job['status'],
+        'solver_status': result['status'] if result else None,
+        'attempts': job['attempts'],
+        'error': job['error'],
+        'created': job['created'],
+        'started': job['started'],
+        'finished': job['finished'],
+    }
+
+class JobQueue:
+    """
+    Queue of generation jobs stored in a Mongo collection.
+
+    Every state change is a single conditional update, so any number of API and
+    worker processes can share the collection: a job is claimed by exactly one
+    worker, and a worker whose lease was taken over can no longer store a result.
+    """
+
+    def __init__(self, collection, lease: float = 60.0, max_attempts: int = 3):
+        """
+        Args:
+            collection: Motor collection holding the jobs.
+            lease (float, optional): Seconds a claim stays valid without a heartbeat. Defaults to 60.
+            max_attempts (int, optional): Claims of a job before it is failed for losing its workers.
+                Defaults to 3.
+        """
+        self.collection = collection
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+    async def ensure_indexes(self) -> None:
+        """
+        Create the index workers claim jobs by.
+        """
+        await self.collection.create_index([('status', 1), ('created', 1)])
+
+    async def submit(self, constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], warm_start: bool = False, result: Dict = None) -> Dict:
+        """
+        Queue a generation job.
+
+        Args:
+            constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+            courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+            warm_start (bool, optional): Whether the worker repairs the latest optimal timetable. Defaults to False.
+            result (Dict, optional): A result that is already known, e.g. from the solution cache; the job
+                is then stored as done. Defaults to None.
+
+        Returns:
+            Dict: The job document.
+        """
+        now = datetime.utcnow()
+        job = {
+            '_id': uuid.uuid4().hex,
+            'status': QUEUED if result is None else DONE,
+            'key': problem_key(constraints, courses),
+            'constraints': constraints,
+            'courses': courses,
+            'warm_start': warm_start,
+            'cached': result is not None,
+            'result': result,
+            'error': None,
+            'worker': None,
+            'attempts': 0,
+            'created': now,
+            'started': None,
+            'heartbeat': None,
+            'finished': None if result is None else now,
+        }
+        await self.collection.insert_one(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Returns:
+            Optional[Dict]: The job document, or None if there is no such job.
+        """
+        return await self.collection.find_one({'_id': job_id})
+
+    async def claim(self, worker: str) -> Optional[Dict]:
+        """
+        Claim the oldest queued job, or else a job whose lease expired.
+
+        Jobs whose lease expired after ``max_attempts`` claims are failed instead, so
+        an input that keeps killing its workers does not take all of them down.
+
+        Args:
+            worker (str): Identifier of the claiming worker.
+
+        Returns:
+            Optional[Dict]: The claimed job, or None if there is nothing to do.
+        """
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=self.lease)
+        await self.collection.update_many(
+            {'status': RUNNING, 'heartbeat': {'$lt': expired}, 'attempts': {'$gte': self.max_attempts}},
+            {'$set': {'status': FAILED, 'error': 'Job lost its worker too many times', 'finished': now}}
+        )
+        claim = {'status': RUNNING, 'worker': worker, 'started': now, 'heartbeat': now}
+        for query in ({'status': QUEUED}, {'status': RUNNING, 'heartbeat': {'$lt': expired}}):
+            job = await self.collection.find_one_and_update(query, {'$set': claim, '$inc': {'attempts': 1}}, sort=[('created', 1)])
+            if job is not None:
+                job.update(claim, attempts=job['attempts'] + 1)
+                return job
+        return None
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            bool: Whether the job was still queued or running.
+        """
+        update = await self.collection.update_one(
+            {'_id': job_id, 'status': {'$in': [QUEUED, RUNNING]}},
+            {'$set': {'status': CANCELLED, 'finished': datetime.utcnow()}}
+        )
+        return update.matched_count == 1
+
+    async def heartbeat(self, job_id: str, worker: str) -> bool:
+        """
+        Renew the lease of a claimed job.
+
+        Returns:
+            bool: Whether the worker still holds the job.
+        """
+        update = await self.collection.update_one(
+            {'_id': job_id, 'worker': worker, 'status': RUNNING},
+            {'$set': {'heartbeat': datetime.utcnow()}}
+        )
+        return update.matched_count == 1
+
+    async def finish(self, job_id: str, worker: str, result: Dict) -> bool:
+        """
+        Store the result of a claimed job.
+
+        Returns:
+            bool: Whether the worker still held the job.
+        """
+        update = await self.collection.update_one(
+            {'_id': job_id, 'worker': worker, 'status': RUNNING},
+            {'$set': {'status': DONE, 'result': result, 'finished': datetime.utcnow()}}
+        )
+        return update.matched_count == 1
+
+    async def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """
+        Record why a claimed job could not be solved.
+
+        Returns:
+            bool: Whether the worker still held the job.
+        """
+        update = await self.collection.update_one(
+            {'_id': job_id, 'worker': worker, 'status': RUNNING},
+            {'$set': {'status': FAILED, 'error': error, 'finished': datetime.utcnow()}}
+        )
+        return update.matched_count == 1
+
+async def run_job(queue: JobQueue, cache: SolutionCache, job: Dict, worker: str, workers: int = 1, time_limit: float = None, node_limit: int = None, pool: SolverPool = None) -> None:
+    """
+    Solve a claimed job in the solver pool, or else in a thread, renewing its lease
+    until the result is stored. A job the worker lost, because it was cancelled or
+    taken over, has its solver process killed when it runs in the pool. A thread
+    cannot be stopped: the solve of a lost job then runs until its budget is used
+    up, and the worker takes no other job meanwhile.
+    """
+    result = await cache.get(job['key'])
+    if result is None:
+        previous = await cache.latest() if job['warm_start'] else None
+        call = functools.partial(
+            solve_inputs, job['constraints'], job['courses'], previous['timetable'] if previous else None,
+            workers=workers, time_limit=time_limit, node_limit=node_limit
+        )
+        if pool is not None:
+            task = pool.submit(call)
+            future = asyncio.wrap_future(task)
+        else:
+            future = asyncio.get_running_loop().run_in_executor(None, call)
+        lost = False
+        while not (await asyncio.wait({future}, timeout=queue.lease / 3))[0]:
+            if lost or await queue.heartbeat(job['_id'], worker):
+                continue
+            lost = True
+            if pool is not None:
+                logger.warning(f"Job {job['_id']} was cancelled or taken over by another worker, stopping its solver")
+                task.cancel()
+            else:
+                logger.warning(f"Job {job['_id']} was cancelled or taken over by another worker; its solver thread runs until its budget is used up")
+        try:
+            solved = future.result()
+        except (TaskCancelled, asyncio.CancelledError):
+            # The future is done, so this is its own cancellation, before or while it ran
+            logger.info(f"Solver of job {job['_id']} was stopped")
+            return
+        except Exception as error:
+            logger.exception(f"Job {job['_id']} failed")
+            await queue.fail(job['_id'], worker, str(error))
+            return
+        result = solved.to_dict()
+        # Budget-limited results may improve on a later attempt, so only settled ones are cached
+        if solved.status in (OPTIMAL, INFEASIBLE):
+            await cache.set(job['key'], result)
+    if not await queue.finish(job['_id'], worker, result):
+        logger.warning(f"Result of job {job['_id']} dropped, the job was taken over by another worker")
+
+async def run_worker(queue: JobQueue, cache: SolutionCache, worker: str = None, workers: int = 1, time_limit: float = None, node_limit: int = None, poll_interval: float = 1.0, max_jobs: int = None, pool: SolverPool = None) -> int:
+    """
+    Claim and solve jobs until ``max_jobs`` were processed.
+
+    Args:
+        queue (JobQueue): The shared job queue.
+        cache (SolutionCache): Solution cache, for cached results and warm starts.
+        worker (str, optional): Identifier of the worker. Defaults to the host name and process id.
+        workers (int, optional): Number of portfolio processes per job. Defaults to 1.
+        time_limit (float, optional): Seconds the search of a job may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes the search of a job may visit. Defaults to None (unbounded).
+        poll_interval (float, optional): Seconds to wait when no job is queued. Defaults to 1.
+        max_jobs (int, optional): Number of jobs to process. Defaults to None (run forever).
+        pool (SolverPool, optional): Sandboxed processes to solve in. Defaults to None (a thread, which
+            cannot be stopped when its job is cancelled).
+
+    Returns:
+        int: Number of jobs processed.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = await queue.claim(worker)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            continue
+        logger.info(f"Worker {worker} claimed job {job['_id']} (attempt {job['attempts']})")
+        await run_job(queue, cache, job, worker, workers, time_limit, node_limit, pool)
+        processed += 1
+    return processed
+
+async def main() -> None:
+    """
+    Run a worker against the database and Redis the API uses, configured from the same environment.
+    """
+    import aioredis
+    import motor.motor_asyncio
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv('MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017/timetable'))
+    queue = JobQueue(client.timetable.jobs, lease=float(os.getenv('JOB_LEASE', '60')))
+    await queue.ensure_indexes()
+    redis = await aioredis.create_redis_pool("redis://localhost", minsize=1, maxsize=2)
+    cache = SolutionCache(redis, maxsize=int(os.getenv('SOLUTION_CACHE_SIZE', '128')), ttl=int(os.getenv('SOLUTION_CACHE_TTL', '86400')))
+    pool = SolverPool(
+        size=1,
+        max_tasks=int(os.getenv('SOLVER_POOL_MAX_TASKS', '50')),
+        cpu_limit=float(os.getenv('SOLVER_CPU_LIMIT', '120')) or None,
+        memory_limit=int(os.getenv('SOLVER_MEMORY_LIMIT', '2048')) * 2 ** 20 or None
+    )
+    pool.start()
+    try:
+        await run_worker(
+            queue, cache,
+            workers=int(os.getenv('SOLVER_WORKERS', '1')),
+            time_limit=float(os.getenv('SOLVER_TIME_LIMIT', '30')),
+            node_limit=int(os.getenv('SOLVER_NODE_LIMIT', '0')) or None,
+            poll_interval=float(os.getenv('JOB_POLL_INTERVAL', '1')),
+            pool=pool
+        )
+    finally:
+        pool.shutdown()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field
 from bson import ObjectId
+import os
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, LSTM, Dropout, Bidirectional, GRU, Attention
@@ -170,6 +171,21 @@ class TimetableAIModel:
         """
         return self.model.predict(X_test)
 
+    def save(self, path: str) -> None:
+        """
+        Save the trained network into the directory at path.
+        """
+        self.model.save(os.path.join(path, 'model.keras'))
+
+    @classmethod
+    def load(cls, path: str) -> 'TimetableAIModel':
+        """
+        Load a network saved with save() from the directory at path.
+        """
+        instance = cls.__new__(cls)
+        instance.model = tf.keras.models.load_model(os.path.join(path, 'model.keras'))
+        return instance
+
 
 def train_ai_model(historical_data: List[Dict[str, Any]]) -> TimetableAIModel:
     """
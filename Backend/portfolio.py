@@ -0,0 +1,213 @@
+"""
+Parallel solver portfolio.
+
+Races several timetable search strategies in separate processes. The first
+strategy to report a timetable satisfying every rule wins and the other workers
+are terminated; if none does within the time limit, the least violating
+timetable reported so far is returned. Run in a sandboxed worker, every strategy
+gets the CPU time left to the portfolio as its own limit, and a strategy breaking
+it fails the portfolio with LimitExceeded like the worker itself would.
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import signal
+import time
+
+from csp import (
+    DEGREE, DOM_WDEG, HARD_RULES, INFEASIBLE, MRV, OPTIMAL, CompiledProblem, SolveResult, TimetableSolver, build_model, classify,
+    compile_problem, least_violating, presolve, solve_genetic, solve_min_conflicts
+)
+from sandbox import LimitExceeded
+
+logger = logging.getLogger(__name__)
+
+BACKTRACKING = 'backtracking'
+GENETIC = 'genetic'
+MIN_CONFLICTS = 'min-conflicts'
+
+# Seconds the workers get on top of the time limit to report their best timetable.
+GRACE_PERIOD = 1.0
+
+# Variable ordering and least-constraining-value choice of the backtracking strategies raced
+# next to the deterministic search, in the order workers are given to them.
+ORDERING_VARIANTS = ((DOM_WDEG, True), (MRV, False), (DOM_WDEG, False), (MRV, True), (DEGREE, True))
+
+def default_strategies(workers: int) -> List[Tuple[str, str, Optional[int], Dict]]:
+    """
+    Pick the strategies raced by a portfolio of the given size.
+
+    The deterministic backtracking search, min-conflicts and the genetic algorithm
+    come first, then backtracking with the variable and value orderings of
+    ORDERING_VARIANTS; the remaining workers run backtracking with different seeds.
+
+    Args:
+        workers (int): Number of worker processes.
+
+    Returns:
+        List[Tuple[str, str, Optional[int], Dict]]: Name, kind, seed and solver options of every strategy.
+    """
+    strategies = [(BACKTRACKING, BACKTRACKING, None, {}), (MIN_CONFLICTS, MIN_CONFLICTS, 0, {}), (GENETIC, GENETIC, 0, {})]
+    for ordering, lcv in ORDERING_VARIANTS:
+        name = f'{BACKTRACKING}-{ordering}' + ('-lcv' if lcv else '')
+        strategies.append((name, BACKTRACKING, None, {'ordering': ordering, 'lcv': lcv}))
+    seed = 1
+    while len(strategies) < workers:
+        strategies.append((f'{BACKTRACKING}-{seed}', BACKTRACKING, seed, {}))
+        seed += 1
+    return strategies[:max(workers, 1)]
+
+def run_strategy(problem: CompiledProblem, name: str, kind: str, seed: Optional[int], options: Dict, time_limit: Optional[float], node_limit: Optional[int], cpu_limit: Optional[float], results) -> None:
+    """
+    Run one strategy and report its timetable on the results queue.
+
+    The options are keyword arguments of the TimetableSolver of a backtracking
+    strategy, e.g. its ``ordering`` and ``lcv``. The node limit bounds the
+    backtracking search only; local search and the genetic algorithm stop after
+    their own step and generation counts.
+
+    Reports a tuple of the strategy name, the subject id of every slot, whether the
+    search proved that no timetable satisfies every rule, and search statistics.
+    A strategy that breaks its CPU time limit reports no slots and the breach as
+    ``stats['limit']``.
+    """
+    def cpuTimeExceeded(signum, frame):
+        raise LimitExceeded(f"CPU time limit of {cpu_limit:.1f} seconds exceeded by strategy {name}")
+
+    # The process inherits its CPU limit from whichever worker started the fork server,
+    # so it is replaced by the budget of this portfolio
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = hard
+    if cpu_limit is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+        soft = soft if hard == resource.RLIM_INFINITY else min(soft, hard)
+    signal.signal(signal.SIGXCPU, cpuTimeExceeded)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    random.seed(seed)
+    started = time.monotonic()
+    try:
+        values, proved, stats = _search(problem, kind, seed, options, time_limit, node_limit)
+    except LimitExceeded as error:
+        values, proved, stats = None, False, {'limit': str(error)}
+    finally:
+        signal.signal(signal.SIGXCPU, signal.SIG_IGN)
+    stats['elapsed'] = time.monotonic() - started
+    results.put((name, values, proved, stats))
+
+def _search(problem: CompiledProblem, kind: str, seed: Optional[int], options: Dict, time_limit: Optional[float], node_limit: Optional[int]) -> Tuple[List[int], bool, Dict]:
+    proved = False
+    if kind == BACKTRACKING:
+        solver = TimetableSolver(max_nodes=node_limit, time_limit=time_limit, seed=seed, **options)
+        solution = build_model(problem, solver).getSolution()
+        if solution is not None:
+            values = [solution[slot] for slot in range(problem.size)]
+        else:
+            values = least_violating(problem, solver.best)
+            proved = not solver.stats['exhausted']
+        stats = solver.stats
+    elif kind == MIN_CONFLICTS:
+        stats = {}
+        values = solve_min_conflicts(problem, time_limit=time_limit, stats=stats)
+    elif kind == GENETIC:
+        stats = {}
+        values = solve_genetic(problem, stats=stats, time_limit=time_limit)
+    else:
+        raise ValueError(f"Unknown strategy kind: {kind}")
+    return values, proved, stats
+
+def solve_portfolio(constraints: Dict[str, List[Dict[str, int]]], courses: List[Dict[str, int]], workers: int = None, time_limit: float = None, node_limit: int = None, strategies: List[Tuple[str, str, Optional[int], Dict]] = None) -> SolveResult:
+    """
+    Search for a timetable by racing several strategies in parallel.
+
+    Args:
+        constraints (Dict[str, List[Dict[str, int]]]): Dictionary containing the constraints.
+        courses (List[Dict[str, int]]): List of dictionaries containing the course information.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        time_limit (float, optional): Seconds the search may take. Defaults to None (unbounded).
+        node_limit (int, optional): Search nodes each backtracking strategy may visit. Defaults to None (unbounded).
+        strategies (List[Tuple[str, str, Optional[int], Dict]], optional): Name, kind, seed and solver
+            options of the strategies to race. Defaults to ``default_strategies(workers)``.
+
+    Raises:
+        LimitExceeded: When a strategy breaks the CPU time limit of the portfolio's process.
+
+    Returns:
+        SolveResult: The status, timetable, violations and statistics, including the winning strategy.
+    """
+    problem = compile_problem(constraints, courses)
+    started = time.monotonic()
+    rejected = presolve(problem, {'strategy': None, 'elapsed': 0.0})
+    if rejected is not None:
+        return rejected
+
+    if strategies is None:
+        strategies = default_strategies(workers or os.cpu_count() or 1)
+    deadline = started + time_limit + GRACE_PERIOD if time_limit is not None else None
+    cpu_limit = None
+    soft, _ = resource.getrlimit(resource.RLIMIT_CPU)
+    if soft != resource.RLIM_INFINITY:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_limit = max(soft - usage.ru_utime - usage.ru_stime, 1.0)
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_strategy, args=(problem, name, kind, seed, options, time_limit, node_limit, cpu_limit, results), daemon=True)
+        for name, kind, seed, options in strategies
+    ]
+    for process in processes:
+        process.start()
+
+    best = None
+    status = None
+    pending = len(processes)
+    try:
+        while pending:
+            timeout = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                name, values, proved, stats = results.get(timeout=timeout)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            pending -= 1
+            if values is None:
+                raise LimitExceeded(stats['limit'])
+            violations = problem.violations(values)
+            rank = (sum(violations[rule] for rule in HARD_RULES), sum(violations.values()))
+            if best is None or rank < best[0]:
+                best = (rank, name, values, violations, stats)
+            if not any(violations.values()):
+                status = OPTIMAL
+                break
+            if proved:
+                status = INFEASIBLE
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        results.close()
+
+    elapsed = time.monotonic() - started
+    if best is None:
+        values = least_violating(problem, {})
+        return SolveResult(classify(problem.violations(values)), values, problem.timetable(values), problem.violations(values), [], {'strategy': None, 'elapsed': elapsed})
+
+    _, name, values, violations, stats = best
+    stats = dict(stats, strategy=name, elapsed=elapsed)
+    reasons = ['No timetable satisfies every rule'] if status == INFEASIBLE else []
+    if status is None:
+        status = classify(violations)
+        logger.info(f"Timetable portfolio ended without a valid timetable, best {status} result from {name}")
+    return SolveResult(status, values, problem.timetable(values), violations, reasons, stats)
@@ -0,0 +1,177 @@
+"""
+Versioned registry of trained timetable models.
+
+Models are trained offline and published to a directory on disk, one
+subdirectory per version. A version is written to a temporary directory and
+renamed into place once complete, and the LATEST file names the version served
+by default, so readers never see a half-written model. Consumers load a version
+once, on first use, and share it read-only; a version published later is loaded
+on the first use after it, without a restart.
+
+Train and publish a model from the Backend directory:
+
+    HISTORICAL_DATA=history.json python registry.py
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+LATEST = 'LATEST'
+METADATA = 'metadata.json'
+
+class ModelRegistry:
+    """
+    Models published under ``root``, loaded at most once per version.
+
+    The registry does not know how a model is stored: ``save`` writes a model
+    into a directory and ``load`` reads it back from one.
+    """
+
+    def __init__(self, root: str, save: Callable[[Any, str], None], load: Callable[[str], Any], version: Optional[str] = None):
+        """
+        Args:
+            root (str): Directory holding one subdirectory per version.
+            save (Callable[[Any, str], None]): Writes a model into the given directory.
+            load (Callable[[str], Any]): Reads a model back from the given directory.
+            version (str, optional): Version to serve instead of the latest published one.
+        """
+        self.root = root
+        self.save = save
+        self.load = load
+        self.version = version
+        self.pinned = version is not None
+        self._marker = None
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def versions(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Published versions, oldest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if name.isdigit())
+
+    def latest(self) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: The version LATEST names, or None when nothing was published.
+        """
+        try:
+            with open(os.path.join(self.root, LATEST)) as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, version: str) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: What was recorded about the version when it was published.
+        """
+        with open(os.path.join(self.root, version, METADATA)) as file:
+            return json.load(file)
+
+    def publish(self, model: Any, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Store a trained model as a new version and make it the latest one.
+
+        Args:
+            model (Any): The trained model.
+            metadata (Dict[str, Any], optional): JSON-serializable facts about the training run.
+
+        Returns:
+            str: The new version.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            self.save(model, staging)
+            with open(os.path.join(staging, METADATA), 'w') as file:
+                json.dump({"published": datetime.utcnow().isoformat(), **(metadata or {})}, file)
+            # Concurrent publishers race for the next number; the loser takes the one after
+            while True:
+                versions = self.versions()
+                version = f"{int(versions[-1]) + 1 if versions else 1:06d}"
+                try:
+                    os.rename(staging, os.path.join(self.root, version))
+                    break
+                except OSError:
+                    if not os.path.isdir(os.path.join(self.root, version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        pointer = os.path.join(self.root, f'.{LATEST}-{version}')
+        with open(pointer, 'w') as file:
+            file.write(version)
+        os.replace(pointer, os.path.join(self.root, LATEST))
+        logger.info(f"Published model version {version} to {self.root}")
+        return version
+
+    def get(self, version: Optional[str] = None) -> Any:
+        """
+        Return a model, loading it from disk only the first time it is asked for.
+
+        Unless the registry was given a version, the version it serves follows LATEST:
+        a newly published version replaces the served one on the next call.
+
+        Args:
+            version (str, optional): Version to return. Defaults to the version the registry serves.
+
+        Raises:
+            LookupError: When no model was published.
+
+        Returns:
+            Any: The shared model; callers must not modify it.
+        """
+        with self._lock:
+            if version is None:
+                version = self._served()
+            if version not in self._models:
+                self._models[version] = self.load(os.path.join(self.root, version))
+                logger.info(f"Loaded model version {version} from {self.root}")
+            return self._models[version]
+
+    def _served(self) -> str:
+        if not self.pinned:
+            # Publishing replaces LATEST, so a changed file means a new version
+            try:
+                stat = os.stat(os.path.join(self.root, LATEST))
+                marker = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                marker = None
+            if marker != self._marker:
+                self._marker = marker
+                self.version = self.latest()
+                self._models = {version: model for version, model in self._models.items() if version == self.version}
+        if self.version is None:
+            raise LookupError(f"No model published in {self.root}")
+        return self.version
+
+def main() -> None:
+    """
+    Train a model on the historical data in HISTORICAL_DATA, a JSON list of
+    {"features": [...], "label": ...} records, and publish it to MODEL_REGISTRY_PATH.
+    """
+    from dotenv import load_dotenv
+    from model import TimetableAIModel, train_ai_model
+    load_dotenv()
+
+    with open(os.environ['HISTORICAL_DATA']) as file:
+        historical_data = json.load(file)
+    registry = ModelRegistry(os.getenv('MODEL_REGISTRY_PATH', 'models'), save=TimetableAIModel.save, load=TimetableAIModel.load)
+    model = train_ai_model(historical_data)
+    version = registry.publish(model, {"samples": len(historical_data)})
+    print(f"Published model version {version}")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,319 @@
+"""
+Sandboxed pool of solver processes.
+
+Solves run in long-lived worker processes that are started ahead of time with
+the solver modules already imported, so a request pays for neither a process
+start nor the imports. Every worker caps its address space and every task its
+CPU time with resource limits, so a runaway search fails its own task instead
+of exhausting the host. A worker is replaced by a fresh one after a number of
+tasks, after a limit breach, and when the task it runs is cancelled, which kills
+the process. Tasks that return a generator stream its items back while it runs.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Sequence
+import importlib
+import inspect
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Modules imported by every worker before it takes its first task.
+PRELOAD = ('numpy', 'csp', 'portfolio', 'jobs')
+
+RESULT = 'result'
+ITEM = 'item'
+ERROR = 'error'
+LIMIT = 'limit'
+
+class LimitExceeded(RuntimeError):
+    """
+    Raised for a task that broke its CPU time or memory limit.
+    """
+
+class WorkerLost(RuntimeError):
+    """
+    Raised for a task whose worker process died.
+    """
+
+class TaskCancelled(RuntimeError):
+    """
+    Raised for a task that was cancelled while it ran.
+    """
+
+class _CpuTimeExceeded(Exception):
+    pass
+
+def _cpu_time_exceeded(signum, frame):
+    raise _CpuTimeExceeded()
+
+def _send(connection, message) -> None:
+    # SIGXCPU is held back while a message is written, so the limit never cuts one in half
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGXCPU})
+    try:
+        connection.send(message)
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGXCPU})
+
+def serve(connection, preload: Sequence[str], memory_limit: int = None) -> None:
+    """
+    Run tasks received on the connection until told to stop or a limit is broken.
+
+    Every task is a tuple of a function, its positional and keyword arguments and
+    its CPU time limit in seconds; the reply is a tuple of RESULT, ERROR or LIMIT
+    and the return value, the exception or a description of the breach. A returned
+    generator is run here and every item it yields is sent as an ITEM reply first;
+    the RESULT is then None.
+    """
+    for module in preload:
+        importlib.import_module(module)
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    # The kernel sends SIGXCPU once the soft CPU limit is reached
+    signal.signal(signal.SIGXCPU, _cpu_time_exceeded)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        function, args, kwargs, cpu_limit = task
+        if cpu_limit is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        try:
+            value = function(*args, **kwargs)
+            if inspect.isgenerator(value):
+                for item in value:
+                    _send(connection, (ITEM, item))
+                value = None
+            reply = (RESULT, value)
+        except _CpuTimeExceeded:
+            reply = (LIMIT, f"CPU time limit of {cpu_limit} seconds exceeded")
+        except LimitExceeded as error:
+            # Raised by tasks whose own child processes broke their limits
+            reply = (LIMIT, str(error))
+        except MemoryError:
+            reply = (LIMIT, f"Memory limit of {memory_limit} bytes exceeded")
+        except Exception as error:
+            reply = (ERROR, error)
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGXCPU})
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        # A signal for the finished task must not interrupt its reply or the next task
+        if signal.SIGXCPU in signal.sigpending():
+            signal.sigwait({signal.SIGXCPU})
+        try:
+            connection.send(reply)
+        except Exception as error:
+            connection.send((ERROR, RuntimeError(f"Task reply could not be sent: {error}")))
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGXCPU})
+        if reply[0] == LIMIT:
+            return
+
+class SolverTask(Future):
+    """
+    Future of a task submitted to a SolverPool.
+
+    Unlike other futures it can be cancelled while it runs: its worker is killed
+    and the task fails with TaskCancelled.
+    """
+
+    def __init__(self, pool: 'SolverPool', function: Callable, args: tuple, kwargs: Dict, on_item: Callable[[Any], None] = None):
+        super().__init__()
+        self._pool = pool
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.on_item = on_item
+        self.process = None
+        self.killed = False
+
+    def cancel(self) -> bool:
+        if super().cancel():
+            return True
+        return self._pool._kill(self)
+
+class SolverPool:
+    """
+    Pool of pre-started solver processes with per-task resource limits.
+
+    Every worker process is served by a thread of the pool that hands it one task
+    at a time and replaces it when needed. The pool counts its tasks, recycled
+    workers, limit breaches, cancelled tasks and lost workers in ``stats``.
+    """
+
+    def __init__(self, size: int = None, max_tasks: int = 100, cpu_limit: float = None, memory_limit: int = None, preload: Sequence[str] = PRELOAD):
+        """
+        Args:
+            size (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            max_tasks (int, optional): Tasks a worker runs before it is replaced. Defaults to 100.
+            cpu_limit (float, optional): CPU seconds a task may use. Defaults to None (unlimited).
+            memory_limit (int, optional): Bytes of address space a worker may use. Defaults to None (unlimited).
+            preload (Sequence[str], optional): Modules every worker imports before its first task.
+                Defaults to PRELOAD.
+        """
+        self.size = size or os.cpu_count() or 1
+        self.max_tasks = max_tasks
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.preload = tuple(preload)
+        self.stats = {'tasks': 0, 'recycled': 0, 'breaches': 0, 'cancelled': 0, 'lost': 0}
+        self._context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self) -> None:
+        """
+        Start the worker processes, unless they already run.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            if self._context.get_start_method() == 'forkserver':
+                self._context.set_forkserver_preload(list(self.preload))
+            self._threads = [threading.Thread(target=self._serve, name=f'solver-pool-{slot}', daemon=True) for slot in range(self.size)]
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, function: Callable, *args, **kwargs) -> SolverTask:
+        """
+        Queue a call of a picklable function in a worker process.
+
+        Returns:
+            SolverTask: Future of the return value.
+        """
+        self.start()
+        task = SolverTask(self, function, args, kwargs)
+        self._tasks.put(task)
+        return task
+
+    def stream(self, on_item: Callable[[Any], None], function: Callable, *args, **kwargs) -> SolverTask:
+        """
+        Queue a call of a picklable generator function in a worker process.
+
+        Every item the generator yields is passed to ``on_item`` as soon as it
+        arrives, in a thread of the pool. Cancelling the task stops the generator.
+
+        Returns:
+            SolverTask: Future completing with None once the generator is exhausted.
+        """
+        self.start()
+        task = SolverTask(self, function, args, kwargs, on_item)
+        self._tasks.put(task)
+        return task
+
+    def shutdown(self) -> None:
+        """
+        Stop the workers once the queued tasks are done.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _kill(self, task: SolverTask) -> bool:
+        with self._lock:
+            if task.done():
+                return False
+            task.killed = True
+            if task.process is not None:
+                task.process.kill()
+            return True
+
+    def _start_worker(self):
+        connection, child = self._context.Pipe()
+        process = self._context.Process(target=serve, args=(child, self.preload, self.memory_limit))
+        process.start()
+        child.close()
+        return process, connection
+
+    def _stop_worker(self, process, connection, kill: bool = False) -> None:
+        if kill:
+            process.kill()
+        else:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        process.join()
+        connection.close()
+
+    def _serve(self) -> None:
+        process, connection = self._start_worker()
+        served = 0
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            if not task.set_running_or_notify_cancel():
+                continue
+            try:
+                if not process.is_alive():
+                    self._stop_worker(process, connection)
+                    self._count('lost')
+                    process, connection = self._start_worker()
+                    served = 0
+                connection.send((task.function, task.args, task.kwargs, self.cpu_limit))
+            except Exception as error:
+                task.set_exception(error)
+                continue
+            with self._lock:
+                task.process = process
+                if task.killed:
+                    process.kill()
+            try:
+                kind, value = connection.recv()
+                while kind == ITEM:
+                    try:
+                        task.on_item(value)
+                    except Exception:
+                        logger.exception("Solver task item callback failed")
+                    kind, value = connection.recv()
+            except (EOFError, OSError):
+                kind, value = None, None
+            with self._lock:
+                task.process = None
+            served += 1
+            self._count('tasks')
+
+            if kind == RESULT:
+                task.set_result(value)
+            elif kind == ERROR:
+                task.set_exception(value)
+            elif kind == LIMIT:
+                self._count('breaches')
+                logger.warning(f"Solver worker {process.pid} broke its limits: {value}")
+                task.set_exception(LimitExceeded(value))
+            elif task.killed:
+                self._count('cancelled')
+                task.set_exception(TaskCancelled("Task was cancelled while it ran"))
+            else:
+                process.join()
+                self._count('lost')
+                logger.warning(f"Solver worker {process.pid} exited with code {process.exitcode}")
+                task.set_exception(WorkerLost(f"Solver process exited with code {process.exitcode}"))
+
+            # A worker killed just after it replied is replaced as well
+            if kind not in (RESULT, ERROR) or task.killed or served >= self.max_tasks:
+                self._stop_worker(process, connection, kill=kind is None or task.killed)
+                self._count('recycled')
+                process, connection = self._start_worker()
+                served = 0
+        self._stop_worker(process, connection)
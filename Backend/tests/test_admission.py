@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from admission import AdmissionController, Overloaded, BATCH, INTERACTIVE
+
+# Test freed slots go to interactive requests first, then batch ones, each in arrival order
+def test_admission_priorities():
+    async def run():
+        controller = AdmissionController(concurrency=1, queue_limits={INTERACTIVE: 2, BATCH: 2})
+        order = []
+        release = asyncio.Event()
+
+        async def request(name, priority):
+            async with controller.admit(priority):
+                order.append(name)
+                if name == "first":
+                    await release.wait()
+
+        first = asyncio.create_task(request("first", BATCH))
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(request(name, priority)) for name, priority in (("batch", BATCH), ("interactive", INTERACTIVE), ("interactive-2", INTERACTIVE))]
+        await asyncio.sleep(0)
+        queued = controller.queued(BATCH), controller.queued(INTERACTIVE)
+        release.set()
+        await asyncio.gather(first, *waiting)
+        return order, queued, controller.running, controller.stats
+    order, queued, running, stats = asyncio.run(run())
+    assert order == ["first", "interactive", "interactive-2", "batch"]
+    assert queued == (3, 2)
+    assert running == 0
+    assert stats["admitted_interactive"] == stats["admitted_batch"] == 2
+
+# Test full queues turn requests away with a retry estimate from observed solve durations
+def test_admission_overloaded():
+    async def run():
+        controller = AdmissionController(concurrency=2, queue_limits={INTERACTIVE: 1, BATCH: 1}, default_duration=30)
+        estimates = [controller.retry_after(INTERACTIVE)]
+        async with controller.admit():
+            await asyncio.sleep(0.2)
+        estimates.append(controller.retry_after(INTERACTIVE))
+        # Unrecorded work, like a slowly read stream, leaves the estimate alone
+        async with controller.admit(record=False):
+            await asyncio.sleep(1.2)
+        estimates.append(controller.retry_after(INTERACTIVE))
+        controller._durations.clear()
+        controller._durations.extend([10.0, 20.0])
+        release = asyncio.Event()
+
+        async def hold(priority):
+            async with controller.admit(priority):
+                await release.wait()
+
+        holders = [asyncio.create_task(hold(priority)) for priority in (INTERACTIVE, INTERACTIVE, INTERACTIVE, BATCH)]
+        await asyncio.sleep(0)
+        errors = []
+        for priority in (INTERACTIVE, BATCH):
+            with pytest.raises(Overloaded) as error:
+                async with controller.admit(priority):
+                    pass
+            errors.append(error.value.retry_after)
+        # A waiter that gives up leaves its place, and its slot, to the others
+        holders[2].cancel()
+        release.set()
+        await asyncio.gather(*holders, return_exceptions=True)
+        with pytest.raises(ValueError):
+            async with controller.admit("urgent"):
+                pass
+        return estimates, errors, controller.running, controller.stats
+    estimates, errors, running, stats = asyncio.run(run())
+    assert estimates == [15, 1, 1]
+    # Solves take 15 seconds on average over two slots; an interactive request waits behind one, a batch one behind two
+    assert errors == [15, 23]
+    assert running == 0
+    assert stats["rejected_interactive"] == stats["rejected_batch"] == 1
+    assert stats["admitted_interactive"] == 4
+    assert stats["admitted_batch"] == 1
@@ -71,6 +71,35 @@ async def test_generate_timetable():
         response = await ac.get("/generate-timetable")
     assert response.status_code == 200 or response.status_code == 400
 
+@pytest.mark.asyncio
+async def test_timetable_jobs():
+    """
+    Test the /timetable-jobs endpoints to ensure a job can be submitted, polled and fetched.
+    """
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/timetable-jobs")
+        assert response.status_code == 202 or response.status_code == 400
+        if response.status_code == 202:
+            job_id = response.json()["job_id"]
+            status = await ac.get(f"/timetable-jobs/{job_id}")
+            assert status.json()["status"] in ("queued", "running", "done", "failed")
+            result = await ac.get(f"/timetable-jobs/{job_id}/result")
+            assert result.status_code in (200, 409, 500)
+        missing = await ac.get("/timetable-jobs/missing")
+    assert missing.status_code == 404
+
+@pytest.mark.asyncio
+async def test_solver_priority():
+    """
+    Test the solver endpoints to ensure they are admitted by priority class and reject unknown classes.
+    """
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for path in ("/generate-timetable", "/timetable-alternatives"):
+            response = await ac.get(path, params={"priority": "batch"})
+            assert response.status_code in (200, 400, 429)
+            response = await ac.get(path, params={"priority": "urgent"})
+            assert response.status_code == 400
+
 @pytest.mark.asyncio
 async def test_update_course():
     """
@@ -180,6 +209,9 @@ async def test_generate_timetable_scheduling_conflicts():
     async with AsyncClient(app=app, base_url="http://test") as ac:
         response = await ac.get("/generate-timetable")
     assert response.status_code == 200
+    # A timetable breaking the rules is returned with its status and violations
+    assert response.json()["status"] in ("optimal", "feasible", "partial", "infeasible")
+    assert "violations" in response.json()
 
 @pytest.mark.asyncio
 async def test_generate_timetable_ai_model_issues():
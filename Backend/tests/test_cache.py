@@ -0,0 +1,168 @@
+import asyncio
+import time
+from cache import SingleFlight, SolutionCache, problem_key
+
+CONSTRAINTS = {
+    "working_days": [
+        {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+        {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+    ],
+    "consecutive_subjects": [""],
+    "non_consecutive_subjects": ["History", "Art"]
+}
+
+COURSES = [
+    {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+]
+
+class FakeRedis:
+    """
+    In-memory stand-in for the few aioredis pool commands the cache uses.
+    """
+
+    SET_IF_NOT_EXIST = 'SET_IF_NOT_EXIST'
+
+    def __init__(self):
+        self.values = {}
+        self.deadlines = {}
+
+    def expired(self, key):
+        if key in self.deadlines and self.deadlines[key] <= time.monotonic():
+            self.values.pop(key, None)
+            self.deadlines.pop(key)
+
+    async def get(self, key):
+        self.expired(key)
+        return self.values.get(key)
+
+    async def set(self, key, value, expire=None, exist=None):
+        self.expired(key)
+        if exist == self.SET_IF_NOT_EXIST and key in self.values:
+            return False
+        self.values[key] = value.encode()
+        self.deadlines.pop(key, None)
+        if expire:
+            self.deadlines[key] = time.monotonic() + expire
+        return True
+
+    async def expire(self, key, seconds):
+        self.deadlines[key] = time.monotonic() + seconds
+
+    async def sadd(self, key, member):
+        self.values.setdefault(key, set()).add(member.encode())
+
+    async def smembers(self, key):
+        return list(self.values.get(key, set()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+# Test the problem key ignores the order and extra fields of the documents
+def test_problem_key_canonical():
+    reordered = dict(CONSTRAINTS, working_days=CONSTRAINTS["working_days"][::-1])
+    courses = [dict(course, instructor_name="Someone") for course in COURSES[::-1]]
+    assert problem_key(CONSTRAINTS, COURSES) == problem_key(CONSTRAINTS, courses)
+    assert problem_key(CONSTRAINTS, COURSES) != problem_key(reordered, COURSES)
+    assert problem_key(CONSTRAINTS, COURSES) != problem_key(CONSTRAINTS, COURSES[:3])
+
+# Test the in-process tier evicts the least recently used entry
+def test_solution_cache_lru():
+    async def run():
+        cache = SolutionCache(maxsize=2)
+        await cache.set("a", {"status": "optimal"})
+        await cache.set("b", {"status": "optimal"})
+        await cache.get("a")
+        await cache.set("c", {"status": "optimal"})
+        return [await cache.get(key) is not None for key in "abc"]
+    assert asyncio.run(run()) == [True, False, True]
+
+# Test results are shared through Redis and dropped from both tiers on invalidation
+def test_solution_cache_redis():
+    async def run():
+        redis = FakeRedis()
+        await SolutionCache(redis).set("a", {"status": "optimal"})
+        cache = SolutionCache(redis)
+        shared = await cache.get("a")
+        await cache.clear()
+        return shared, await cache.get("a"), await SolutionCache(redis).get("a")
+    assert asyncio.run(run()) == ({"status": "optimal"}, None, None)
+
+# Test the latest optimal result survives invalidation for warm starts
+def test_solution_cache_latest():
+    async def run():
+        redis = FakeRedis()
+        cache = SolutionCache(redis)
+        await cache.set("a", {"status": "optimal", "timetable": {}})
+        await cache.set("b", {"status": "infeasible", "timetable": None})
+        await cache.clear()
+        return await cache.latest(), await SolutionCache(redis).latest(), await SolutionCache().latest()
+    latest, shared, empty = asyncio.run(run())
+    assert latest == shared == {"status": "optimal", "timetable": {}}
+    assert empty is None
+
+# Test concurrent callers share one computation, within a process and across processes
+def test_single_flight():
+    async def run():
+        redis = FakeRedis()
+        processes = [SingleFlight(redis, poll_interval=0.01), SingleFlight(redis, poll_interval=0.01)]
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {"status": "optimal", "call": len(calls)}
+
+        results = await asyncio.gather(*(flight.run("a", compute) for flight in processes * 3))
+        # Finished flights release their lock, so the next caller computes again
+        again = await processes[1].run("a", compute)
+        return results, again, len(calls), [key for key in redis.values if "lock" in key]
+    results, again, calls, locks = asyncio.run(run())
+    assert [result for result, _ in results] == [{"status": "optimal", "call": 1}] * 6
+    assert sorted(shared for _, shared in results) == [False] + [True] * 5
+    assert again == ({"status": "optimal", "call": 2}, False)
+    assert calls == 2
+    assert locks == []
+
+# Test a failed computation fails its local callers and lets other processes take over
+def test_single_flight_failure():
+    async def run():
+        redis = FakeRedis()
+        first, second = SingleFlight(redis, poll_interval=0.01), SingleFlight(redis, poll_interval=0.01)
+
+        async def fail():
+            await asyncio.sleep(0.05)
+            raise ValueError("solver failed")
+
+        async def compute():
+            return {"status": "optimal"}
+
+        return await asyncio.gather(first.run("a", fail), first.run("a", compute), second.run("a", compute), return_exceptions=True)
+    failed, follower, takeover = asyncio.run(run())
+    assert isinstance(failed, ValueError) and isinstance(follower, ValueError)
+    assert takeover == ({"status": "optimal"}, False)
+
+# Test the lock of a computation is renewed while it runs longer than the lock lives
+def test_single_flight_renewal():
+    async def run():
+        redis = FakeRedis()
+        first, second = SingleFlight(redis, lock_ttl=0.15, poll_interval=0.01), SingleFlight(redis, lock_ttl=0.15, poll_interval=0.01)
+        calls = []
+
+        async def compute():
+            # E.g. waiting for a solver slot before solving
+            calls.append(1)
+            await asyncio.sleep(0.6)
+            return {"status": "optimal"}
+
+        async def late():
+            await asyncio.sleep(0.3)
+            return await second.run("a", compute)
+
+        return await asyncio.gather(first.run("a", compute), late()), len(calls)
+    results, calls = asyncio.run(run())
+    assert results == [({"status": "optimal"}, False), ({"status": "optimal"}, True)]
+    assert calls == 1
@@ -1,5 +1,7 @@
+import random
 import pytest
-from csp import generate, generate_timetable_genetic
+from constraint import Problem
+from csp import build_model, generate, generate_timetable_genetic, get_time_slots, compile_problem, solve, resolve, iter_timetables, solve_genetic, solve_timetable_genetic, weighted_penalty, solve_min_conflicts, solve_timetable_min_conflicts, LocalSearchState, TimetableSolver, BackjumpingSolver, GlobalCardinalityConstraint, ORDERINGS, DOM_WDEG, LECTURES, SYMMETRIES, OPTIMAL, FEASIBLE, PARTIAL, INFEASIBLE
 
 # Test the generate_timetable function with valid constraints and courses
 def test_generate_timetable():
@@ -484,3 +486,665 @@ def test_generate_timetable_genetic_scheduling_conflicts_edge_cases():
     assert "friday" in result
     assert "saturday" in result
     assert "sunday" in result
+
+# Test the generate_timetable function schedules every subject the required number of times
+def test_generate_timetable_feasible_counts():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = generate(constraints, courses)
+    names = [slot["name"] for slot in result["monday"] + result["tuesday"]]
+    for course in courses:
+        assert names.count(course["name"]) == 2
+    for left, right in zip(names, names[1:]):
+        assert {left, right} != {"History", "Art"}
+
+# Test the generate_timetable function keeps multi-hour lectures together within a day
+def test_generate_timetable_consecutive_blocks():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 6},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 6}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 1, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Lab", "lectureno": 1, "duration": 3, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 1, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = generate(constraints, courses)
+    for name, duration in (("Math", 2), ("Lab", 3)):
+        days = [[slot["name"] for slot in result[day]] for day in ("monday", "tuesday")]
+        day = next(names for names in days if name in names)
+        start = day.index(name)
+        assert day[start:start + duration] == [name] * duration
+        assert sum(names.count(name) for names in days) == duration
+
+# Test the generate_timetable function respects the teaching window of each course
+def test_generate_timetable_teacher_timings():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 11, "end_hr": 13},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = generate(constraints, courses)
+    assert [slot["name"] for slot in result["monday"]] == ["Science", "Science", "Math", "Math"]
+
+# Test the generate_timetable function rejects violations on partial assignments
+def test_generate_timetable_prunes_partial_assignments():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 8},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 8}
+        ],
+        "consecutive_subjects": ["Math", "Science"],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    solver = TimetableSolver(max_nodes=10000)
+    generate(constraints, courses, solver)
+    assert not solver.stats["exhausted"]
+    assert solver.stats["nodes"] < 1000
+
+# Test the generate_timetable function rejects courses without enough eligible slots before searching
+def test_generate_timetable_rejects_before_search():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 10},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = solve(constraints, courses)
+    assert result.status == INFEASIBLE
+    assert result.reasons
+    assert result.stats["nodes"] == 0
+    assert isinstance(result.timetable, dict)
+    assert result.violations["teacher_timings"] == 0
+
+# Test the solve function reports an optimal timetable with its statistics
+def test_solve_optimal():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = solve(constraints, courses, time_limit=10)
+    assert result.status == OPTIMAL
+    assert not any(result.violations.values())
+    assert result.stats["depth"] == 8
+    assert result.to_dict()["timetable"] == result.timetable
+
+# Test the solve function returns the best partial timetable when its budget runs out
+def test_solve_node_budget():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = solve(constraints, courses, node_limit=3)
+    assert result.status in (OPTIMAL, FEASIBLE, PARTIAL)
+    assert result.stats["exhausted"]
+    assert result.stats["nodes"] == 3
+    assert 0 < result.stats["depth"] <= 3
+    assert result.violations["lecture_counts"] == 0
+    assert sum(len(day) for day in result.timetable.values()) == 8
+
+# Test the global cardinality constraint keeps exact counts across backtracking
+def test_global_cardinality_constraint():
+    problem = Problem(TimetableSolver())
+    problem.addVariables(["a", "b", "c", "d"], ["Math", "Art"])
+    problem.addConstraint(GlobalCardinalityConstraint({"Math": 1, "Art": 3}), ["a", "b", "c", "d"])
+    solutions = problem.getSolutions()
+    assert len(solutions) == 4
+    for solution in solutions:
+        assert list(solution.values()).count("Math") == 1
+
+# Test the generate_timetable_genetic function never splits a multi-hour lecture
+def test_generate_timetable_genetic_consecutive_blocks():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 1, "duration": 3, "start_hr": 9, "end_hr": 17},
+        {"name": "Math", "lectureno": 1, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    result = generate_timetable_genetic(constraints, courses, population_size=20, generations=20)
+    names = [slot["name"] for slot in result["monday"]]
+    start = names.index("Lab")
+    assert names[start:start + 3] == ["Lab"] * 3
+
+# Test the get_time_slots function gives days sharing an initial distinct slots
+def test_get_time_slots_unique_keys():
+    time_slots, slot_time, mapping = get_time_slots({"Tuesday": 3, "Thursday": 3}, {"Tuesday": 9, "Thursday": 12})
+    assert len(set(time_slots)) == 4
+    assert [mapping[slot] for slot in time_slots] == ["tuesday", "tuesday", "thursday", "thursday"]
+    assert [slot_time[slot] for slot in time_slots] == [9, 10, 12, 14]
+
+# Test the compile_problem function builds equal, hashable problems from equal inputs
+def test_compile_problem():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "History", "lectureno": 1, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 10, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    assert problem == compile_problem(constraints, courses[::-1])
+    assert len({problem, compile_problem(constraints, courses[::-1])}) == 1
+    assert problem.subjects == ("Art", "History")
+    assert problem.apart == (1, 0)
+    assert problem.eligible.tolist() == [[False, True, True, True], [True, True, True, True]]
+    assert problem.start_slots(1) == [0, 1, 2]
+    assert problem.blocks == ((1, 0),)
+
+# Test seeded solvers find valid timetables in different orders
+def test_solve_seeded_solver():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    results = [solve(constraints, courses, TimetableSolver(seed=seed)) for seed in range(5)]
+    assert all(result.status == OPTIMAL for result in results)
+    assert len({str(result.values) for result in results}) > 1
+
+# Test every variable and value ordering finds a valid timetable and enumerates every solution
+def test_solve_orderings():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 1, "duration": 3, "start_hr": 9, "end_hr": 13},
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 1, "duration": 1, "start_hr": 12, "end_hr": 17}
+    ]
+    for ordering in ORDERINGS:
+        for lcv in (False, True):
+            result = solve(constraints, courses, time_limit=10, ordering=ordering, lcv=lcv)
+            assert result.status == OPTIMAL
+            assert not any(result.violations.values())
+            problem = Problem(TimetableSolver(ordering=ordering, lcv=lcv))
+            problem.addVariables(["a", "b", "c", "d"], ["Math", "Art"])
+            problem.addConstraint(GlobalCardinalityConstraint({"Math": 1, "Art": 3}), ["a", "b", "c", "d"])
+            assert len(problem.getSolutions()) == 4
+    timetable = generate(constraints, courses, ordering=DOM_WDEG, lcv=True)
+    assert sum(slot["name"] == "Lab" for day in timetable.values() for slot in day) == 3
+    with pytest.raises(ValueError):
+        TimetableSolver(ordering="alphabetical")
+
+# Test the backjumping solver finds valid timetables as a drop-in for the backtracking search
+def test_backjumping_solver():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 1, "duration": 3, "start_hr": 9, "end_hr": 13},
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 1, "duration": 1, "start_hr": 12, "end_hr": 17}
+    ]
+    solver = BackjumpingSolver()
+    result = solve(constraints, courses, solver)
+    assert result.status == OPTIMAL
+    assert not any(result.violations.values())
+    assert solver.stats["depth"] == 8
+    timetable = generate(constraints, courses, BackjumpingSolver())
+    assert sum(slot["name"] == "Lab" for day in timetable.values() for slot in day) == 3
+
+# Test the backjumping solver proves infeasibility, with or without room for its nogoods
+def test_backjumping_solver_infeasible():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 8, "end_hr": 20, "total_hours": 6},
+            {"day": "Tuesday", "start_hr": 10, "end_hr": 20, "total_hours": 6},
+            {"day": "Wednesday", "start_hr": 9, "end_hr": 20, "total_hours": 6},
+            {"day": "Thursday", "start_hr": 10, "end_hr": 20, "total_hours": 4}
+        ],
+        "consecutive_subjects": ["Math", "Science"],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 11, "end_hr": 20},
+        {"name": "Studio", "lectureno": 1, "duration": 3, "start_hr": 10, "end_hr": 15},
+        {"name": "Math", "lectureno": 6, "duration": 1, "start_hr": 8, "end_hr": 14},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 10, "end_hr": 20},
+        {"name": "Art", "lectureno": 3, "duration": 1, "start_hr": 8, "end_hr": 20}
+    ]
+    assert solve(constraints, courses).status == INFEASIBLE
+    for max_nogoods in (10000, 1):
+        solver = BackjumpingSolver(max_nodes=10000, max_nogoods=max_nogoods)
+        result = solve(constraints, courses, solver)
+        assert result.status == INFEASIBLE
+        assert not solver.stats["exhausted"]
+        assert solver.stats["jumped"] > 0
+        assert solver.stats["learned"] > 1
+        assert len(solver.nogoods) <= max_nogoods
+    assert solver.stats["evicted"] == solver.stats["learned"] - 1
+
+# Test min-conflicts repairs lecture blocks and teacher timings
+def test_solve_min_conflicts():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 4},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 10}
+    ]
+    problem = compile_problem(constraints, courses)
+    values = solve_min_conflicts(problem, time_limit=10)
+    assert not any(problem.violations(values).values())
+    assert not problem.conflicted_slots(values)
+
+# Test the local search keeps its penalty and conflicted slots up to date move by move
+def test_local_search_state_deltas():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 6},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 6}
+        ],
+        "consecutive_subjects": ["Math", "Science"],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 12},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 12, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Lab", "lectureno": 1, "duration": 2, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    rng = random.Random(0)
+    state = LocalSearchState(problem, rng)
+    hours = sorted(state.values)
+    for _ in range(500):
+        moves = state.moves(rng.randrange(problem.size), 3)
+        if moves:
+            move = rng.choice(moves)
+            state.commit(move, state.delta(move))
+        assert state.penalty == weighted_penalty(problem.violations(state.values))
+        assert sorted(state.values) == hours
+        assert sorted(state.conflicted) == problem.conflicted_slots(state.values)
+
+# Test min-conflicts scales to instances with thousands of slots
+def test_solve_timetable_min_conflicts_large():
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 0, "end_hr": 24, "total_hours": 301}
+            for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "History", "lectureno": 525, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6},
+        {"name": "Art", "lectureno": 525, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6},
+        {"name": "Lab", "lectureno": 7, "duration": 2, "start_hr": 0, "end_hr": 150},
+        {"name": "Music", "lectureno": 210, "duration": 1, "start_hr": 150, "end_hr": 10 ** 6},
+        {"name": "Math", "lectureno": 826, "duration": 1, "start_hr": 0, "end_hr": 10 ** 6}
+    ]
+    random.seed(0)
+    result = solve_timetable_min_conflicts(constraints, courses, time_limit=60)
+    assert result.status == OPTIMAL
+    assert len(result.values) == 2100
+    assert result.stats["penalty"] == 0
+
+# Test violations are counted per day, so blocks ending and starting two days stay apart
+def test_violations_day_boundaries():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 4},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    values = [problem.subject_ids[name] for name in ["Art", "Lab", "Lab", "Lab", "Lab", "Art"]]
+    assert not any(problem.violations(values).values())
+    assert not problem.conflicted_slots(values)
+    assert problem.values_from_timetable(problem.timetable(values)) == values
+
+# Test resolve repairs a changed course while the other lectures keep their slots
+def test_resolve_warm_start():
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 6}
+            for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": name, "lectureno": 3, "duration": 1, "start_hr": 9, "end_hr": 17}
+        for name in ["Math", "Science", "History", "Art", "Music", "Bio", "Chem"]
+    ]
+    courses.append({"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17})
+    previous = solve(constraints, courses)
+    assert previous.status == OPTIMAL
+
+    unchanged = resolve(constraints, courses, previous.timetable)
+    assert unchanged.status == OPTIMAL
+    assert unchanged.values == previous.values
+    assert unchanged.stats["moved"] == 0
+    assert unchanged.stats["freed"] == 0
+
+    courses[4] = dict(courses[4], start_hr=12)
+    repaired = resolve(constraints, courses, previous.timetable)
+    assert repaired.status == OPTIMAL
+    assert not any(repaired.violations.values())
+    assert 0 < repaired.stats["moved"] < 10
+    assert repaired.stats["freed"] < len(previous.values)
+
+# Test iter_timetables yields distinct valid timetables lazily
+def test_iter_timetables():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 4},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    timetables = list(iter_timetables(constraints, courses))
+    # Art-Lab-Lab or Lab-Lab-Art on each day; the two mixed weeks are one day swap apart
+    assert len(timetables) == 3
+    for timetable in timetables:
+        assert [slot["name"] for slot in timetable["monday"] + timetable["tuesday"]].count("Lab") == 4
+    assert len(list(iter_timetables(constraints, courses, limit=2))) == 2
+    assert next(iter_timetables(constraints, courses)) == timetables[0]
+    assert list(iter_timetables(dict(constraints, working_days=[]), courses)) == []
+
+# Test symmetry breaking keeps one of every group of interchangeable timetables
+def test_build_model_symmetry_breaking():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 4},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    assert problem.interchangeable_days() == [[0, 1]]
+    # Pair rules hold across day boundaries, so they tie days to their neighbours unless no course is named
+    assert compile_problem(dict(constraints, non_consecutive_subjects=["Lab", "Art"]), courses).interchangeable_days() == []
+    assert compile_problem(dict(constraints, non_consecutive_subjects=["Music", "Drama"]), courses).interchangeable_days() == [[0, 1]]
+    later = dict(constraints, working_days=constraints["working_days"] + [
+        {"day": "Wednesday", "start_hr": 10, "end_hr": 17, "total_hours": 4},
+        {"day": "Thursday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+    ])
+    assert compile_problem(later, courses).interchangeable_days() == [[0, 1, 3]]
+
+    counts = []
+    for symmetries in ((), (LECTURES,), SYMMETRIES):
+        solver = TimetableSolver()
+        solutions = list(build_model(problem, solver, symmetries).getSolutionIter())
+        for solution in solutions:
+            assert not any(problem.violations([solution[slot] for slot in range(problem.size)]).values())
+        counts.append((len(solutions), solver.stats["symmetry_pruned"] > 0))
+    # Two Lab lectures trade places, then the Art-Lab-Lab and Lab-Lab-Art days trade places
+    assert counts == [(8, False), (4, True), (3, True)]
+    assert solve(constraints, courses).status == OPTIMAL
+
+# Test the genetic solver is reproducible from the random seed and handles tiny populations
+def test_solve_genetic_population():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 4},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 4}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["Lab", "Art"]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    random.seed(3)
+    first = solve_genetic(problem, population_size=5, generations=10)
+    random.seed(3)
+    assert solve_genetic(problem, population_size=5, generations=10) == first
+    assert len(first) == problem.size
+    assert [first[slot:slot + 2].count(problem.subject_ids["Lab"]) for slot in range(problem.size - 1)].count(2) >= 2
+
+# Test every genome of the genetic solver keeps the lecture counts, even with teacher windows in the way
+def test_solve_genetic_keeps_lecture_counts():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 11},
+        {"name": "Art", "lectureno": 3, "duration": 1, "start_hr": 11, "end_hr": 17},
+        {"name": "Math", "lectureno": 1, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    for seed in range(5):
+        random.seed(seed)
+        values = solve_genetic(problem, population_size=20, generations=seed * 5, mutation_rate=0.2)
+        assert sorted(values) == sorted(problem.subject_ids[name] for name in ["Lab"] * 4 + ["Art"] * 3 + ["Math"])
+        assert problem.violations(values)["lecture_counts"] == 0
+
+# Test the genetic solver grades its timetable and reports the penalty with it
+def test_solve_timetable_genetic_penalty():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    random.seed(0)
+    result = solve_timetable_genetic(constraints, courses, generations=200)
+    assert result.status == OPTIMAL
+    assert result.stats["penalty"] == weighted_penalty(result.violations) == 0
+    assert result.stats["feasible_at"] is not None
+
+    # Lecture count deviations weigh more than pair conflicts
+    assert weighted_penalty({"lecture_counts": 1}) > weighted_penalty({"non_consecutive_subjects": 2})
+    result = solve_timetable_genetic(dict(constraints, working_days=constraints["working_days"][:1]), courses, generations=50)
+    assert result.status == INFEASIBLE
+    assert result.stats["penalty"] > 0
+
+# Test the genetic solver exchanges genomes through its migration hook and stops when told to
+def test_solve_genetic_migration():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": [""]
+    }
+    courses = [
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 11},
+        {"name": "Art", "lectureno": 4, "duration": 1, "start_hr": 11, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    calls = []
+
+    def migrate(population, scores):
+        calls.append(scores.copy())
+        return None if len(calls) == 3 else population[:2][:, ::-1]
+
+    stats = {}
+    solve_genetic(problem, population_size=20, generations=1000, stats=stats, migrate=migrate, migration_interval=4, target_penalty=None)
+    assert stats["generations"] == 12
+    assert stats["stopped"] == "migration"
+    assert all((scores[:-1] <= scores[1:]).all() for scores in calls)
+
+# Test the genetic solver stops at the target penalty, on stalling and at its deadline
+def test_solve_genetic_early_termination():
+    constraints = {
+        "working_days": [
+            {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+            {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    random.seed(0)
+    stats = {}
+    history = []
+    solve_genetic(problem, generations=10000, stats=stats, history=history)
+    assert stats["stopped"] == "target"
+    assert stats["penalty"] == 0
+    assert stats["generations"] < 10000
+    assert len(history) == stats["generations"] + 1
+    assert history[-1][0] == 0
+    assert all(later[0] <= earlier[0] and later[1] >= later[0] for earlier, later in zip(history, history[1:]))
+
+    # Art only fits into two of its three lecture hours, so the penalty never reaches zero
+    problem = compile_problem(constraints, [dict(course, lectureno=3, end_hr=10) if course["name"] == "Art" else course for course in courses[1:]])
+    stats = {}
+    solve_genetic(problem, generations=10000, stall_generations=20, stats=stats)
+    assert stats["stopped"] == "stalled"
+    assert stats["penalty"] > 0
+    assert stats["generations"] < 10000
+
+    stats = {}
+    solve_genetic(problem, generations=10000, time_limit=0, stats=stats)
+    assert stats["stopped"] == "deadline"
+    assert stats["generations"] == 0
+
+# Test the memetic genetic solver repairs teacher windows of its elite genomes with local search
+def test_solve_genetic_refine():
+    constraints = {
+        "working_days": [
+            {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 8}
+            for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+        ],
+        "consecutive_subjects": [""],
+        "non_consecutive_subjects": ["History", "Art"]
+    }
+    courses = [
+        {"name": "Math", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 11},
+        {"name": "Science", "lectureno": 5, "duration": 1, "start_hr": 11, "end_hr": 14},
+        {"name": "History", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Art", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Music", "lectureno": 6, "duration": 1, "start_hr": 14, "end_hr": 17},
+        {"name": "PE", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17},
+        {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 17}
+    ]
+    problem = compile_problem(constraints, courses)
+    random.seed(0)
+    stats = {}
+    values = solve_genetic(problem, generations=5, refine_steps=20, stats=stats)
+    assert stats["stopped"] == "target"
+    assert stats["refined"] > 0
+    assert not any(problem.violations(values).values())
+
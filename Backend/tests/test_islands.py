@@ -0,0 +1,46 @@
+import multiprocessing
+import time
+from islands import solve_timetable_islands
+from csp import OPTIMAL, INFEASIBLE
+
+CONSTRAINTS = {
+    "working_days": [
+        {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+        {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+    ],
+    "consecutive_subjects": [""],
+    "non_consecutive_subjects": ["History", "Art"]
+}
+
+COURSES = [
+    {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+]
+
+# Test the islands stop as soon as one of them finds a valid timetable
+def test_solve_timetable_islands():
+    result = solve_timetable_islands(CONSTRAINTS, COURSES, islands=3, generations=100000, migration_interval=5, time_limit=30)
+    assert result.status == OPTIMAL
+    assert result.stats["penalty"] == 0
+    assert result.stats["island"] in range(3)
+    assert result.stats["islands"] == 3
+    assert result.stats["generations"] < 100000
+    assert not multiprocessing.active_children()
+
+# Test the time limit stops islands that cannot find a valid timetable
+def test_solve_timetable_islands_time_limit():
+    courses = [dict(course, lectureno=3, end_hr=10) if course["name"] == "Art" else course for course in COURSES[1:]]
+    started = time.monotonic()
+    result = solve_timetable_islands(CONSTRAINTS, courses, islands=2, generations=10 ** 7, migration_interval=5, time_limit=1)
+    assert time.monotonic() - started < 10
+    assert result.status != OPTIMAL
+    assert result.stats["penalty"] > 0
+    assert not multiprocessing.active_children()
+
+# Test the islands reject impossible instances without starting processes
+def test_solve_timetable_islands_rejects_before_search():
+    result = solve_timetable_islands(CONSTRAINTS, [], islands=2)
+    assert result.status == INFEASIBLE
+    assert result.timetable is None
@@ -0,0 +1,232 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from cache import SolutionCache
+from csp import OPTIMAL, solve
+from jobs import JobQueue, CANCELLED, DONE, FAILED, QUEUED, RUNNING, job_status, run_worker
+from sandbox import SolverPool
+
+CONSTRAINTS = {
+    "working_days": [
+        {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+        {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+    ],
+    "consecutive_subjects": [""],
+    "non_consecutive_subjects": ["History", "Art"]
+}
+
+COURSES = [
+    {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+]
+
+class FakeCollection:
+    """
+    In-memory stand-in for the few motor collection methods the job queue uses.
+    """
+
+    def __init__(self):
+        self.documents = {}
+
+    @staticmethod
+    def matches(document, query):
+        for field, condition in query.items():
+            value = document.get(field)
+            if isinstance(condition, dict):
+                if '$lt' in condition and not (value is not None and value < condition['$lt']):
+                    return False
+                if '$gte' in condition and not (value is not None and value >= condition['$gte']):
+                    return False
+                if '$in' in condition and value not in condition['$in']:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    @staticmethod
+    def apply(document, update):
+        document.update(update.get('$set', {}))
+        for field, amount in update.get('$inc', {}).items():
+            document[field] = document.get(field, 0) + amount
+
+    async def create_index(self, keys):
+        pass
+
+    async def insert_one(self, document):
+        self.documents[document['_id']] = dict(document)
+
+    async def find_one(self, query):
+        found = [document for document in self.documents.values() if self.matches(document, query)]
+        return dict(found[0]) if found else None
+
+    async def find_one_and_update(self, query, update, sort=None):
+        found = [document for document in self.documents.values() if self.matches(document, query)]
+        for field, _ in sort or []:
+            found.sort(key=lambda document: document[field])
+        if not found:
+            return None
+        before = dict(found[0])
+        self.apply(found[0], update)
+        return before
+
+    async def update_one(self, query, update):
+        found = [document for document in self.documents.values() if self.matches(document, query)]
+        if found:
+            self.apply(found[0], update)
+        return SimpleNamespace(matched_count=len(found[:1]))
+
+    async def update_many(self, query, update):
+        found = [document for document in self.documents.values() if self.matches(document, query)]
+        for document in found:
+            self.apply(document, update)
+        return SimpleNamespace(matched_count=len(found))
+
+# Test a worker solves queued jobs oldest first and stores the results on them
+def test_run_worker():
+    async def run():
+        queue = JobQueue(FakeCollection())
+        cache = SolutionCache()
+        first = await queue.submit(CONSTRAINTS, COURSES)
+        second = await queue.submit(CONSTRAINTS, COURSES, warm_start=False)
+        assert job_status(await queue.get(first["_id"]))["status"] == QUEUED
+        processed = await run_worker(queue, cache, worker="test", time_limit=10, max_jobs=2)
+        return processed, await queue.get(first["_id"]), await queue.get(second["_id"]), await cache.get(first["key"])
+    processed, first, second, cached = asyncio.run(run())
+    assert processed == 2
+    assert first["status"] == second["status"] == DONE
+    assert first["result"]["status"] == OPTIMAL
+    assert first["result"]["timetable"]["monday"]
+    assert first["attempts"] == 1 and first["worker"] == "test"
+    # The second job finds the first one's result in the solution cache
+    assert second["result"] == cached == first["result"]
+    assert job_status(second)["solver_status"] == OPTIMAL
+
+# Test jobs only repair the latest timetable when asked to, and otherwise race the portfolio
+def test_run_worker_warm_start_opt_in():
+    async def run():
+        queue = JobQueue(FakeCollection())
+        cache = SolutionCache()
+        await cache.set("previous", solve(CONSTRAINTS, COURSES).to_dict())
+        fresh = await queue.submit(CONSTRAINTS, COURSES)
+        repaired = await queue.submit(CONSTRAINTS, COURSES[:3] + [dict(COURSES[3], start_hr=11)], warm_start=True)
+        await run_worker(queue, cache, worker="test", workers=2, time_limit=10, max_jobs=2)
+        return (await queue.get(fresh["_id"]))["result"], (await queue.get(repaired["_id"]))["result"]
+    fresh, repaired = asyncio.run(run())
+    assert fresh["status"] == repaired["status"] == OPTIMAL
+    # The latest result exists, but only the job that opted in starts from it
+    assert fresh["stats"]["strategy"] and "moved" not in fresh["stats"]
+    assert "moved" in repaired["stats"] and "strategy" not in repaired["stats"]
+
+# Test jobs submitted with a known result are done without a worker
+def test_submit_cached_result():
+    async def run():
+        queue = JobQueue(FakeCollection())
+        job = await queue.submit(CONSTRAINTS, COURSES, result={"status": OPTIMAL, "timetable": {}})
+        return job, await queue.claim("test")
+    job, claimed = asyncio.run(run())
+    assert job["status"] == DONE and job["cached"]
+    assert claimed is None
+
+# Test jobs are claimed once, reclaimed when their lease expires and failed after too many claims
+def test_job_leases():
+    async def run():
+        collection = FakeCollection()
+        queue = JobQueue(collection, lease=60, max_attempts=2)
+        job = await queue.submit(CONSTRAINTS, COURSES)
+        claims = [await queue.claim("a"), await queue.claim("b")]
+        collection.documents[job["_id"]]["heartbeat"] -= timedelta(seconds=61)
+        claims.append(await queue.claim("b"))
+        # The first worker lost the job, so its result is dropped
+        stored = [await queue.heartbeat(job["_id"], "a"), await queue.finish(job["_id"], "a", {}), await queue.heartbeat(job["_id"], "b")]
+        collection.documents[job["_id"]]["heartbeat"] -= timedelta(seconds=61)
+        claims.append(await queue.claim("c"))
+        return claims, stored, await queue.get(job["_id"])
+    claims, stored, job = asyncio.run(run())
+    assert claims[0]["status"] == RUNNING and claims[0]["attempts"] == 1
+    assert claims[1] is None
+    assert claims[2]["worker"] == "b" and claims[2]["attempts"] == 2
+    assert stored == [False, False, True]
+    assert claims[3] is None
+    assert job["status"] == FAILED and job["error"]
+
+# Test solver errors fail the job instead of the worker
+def test_run_worker_failure():
+    async def run():
+        queue = JobQueue(FakeCollection())
+        job = await queue.submit(CONSTRAINTS, COURSES, warm_start=False)
+        await queue.collection.update_one({"_id": job["_id"]}, {"$set": {"courses": [{"name": "Math"}]}})
+        await run_worker(queue, SolutionCache(), worker="test", max_jobs=1)
+        return await queue.get(job["_id"])
+    job = asyncio.run(run())
+    assert job["status"] == FAILED
+    assert job["error"]
+    assert job["finished"] <= datetime.utcnow()
+
+# Backtracking needs several seconds to prove this week has no timetable
+SLOW_CONSTRAINTS = {
+    "working_days": [
+        {"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 8 if day in ("Monday", "Tuesday") else 7}
+        for day in ["Monday", "Tuesday", "Wednesday", "Thursday"]
+    ],
+    "consecutive_subjects": [""],
+    "non_consecutive_subjects": ["History", "Art"]
+}
+
+SLOW_COURSES = [
+    {"name": "Lab", "lectureno": 2, "duration": 2, "start_hr": 9, "end_hr": 12},
+    {"name": "Math", "lectureno": 1, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 7, "duration": 1, "start_hr": 9, "end_hr": 15},
+    {"name": "History", "lectureno": 7, "duration": 1, "start_hr": 9, "end_hr": 15},
+    {"name": "Art", "lectureno": 7, "duration": 1, "start_hr": 9, "end_hr": 15}
+]
+
+# Test cancelled jobs are not claimed, and running ones have their solver process killed
+def test_cancel_job():
+    constraints, courses = SLOW_CONSTRAINTS, SLOW_COURSES
+    pool = SolverPool(size=1)
+    # Warm the worker up, so the job is already running when it is cancelled
+    pool.submit(time.monotonic).result(timeout=30)
+
+    async def run():
+        queue = JobQueue(FakeCollection(), lease=0.3)
+        queued = await queue.submit(constraints, courses)
+        cancelled = [await queue.cancel(queued["_id"]), await queue.cancel(queued["_id"])]
+        assert await queue.claim("test") is None
+        job = await queue.submit(constraints, courses, warm_start=False)
+        worker = asyncio.create_task(run_worker(queue, SolutionCache(), worker="test", time_limit=30, max_jobs=1, pool=pool))
+        while (await queue.get(job["_id"]))["status"] != RUNNING:
+            await asyncio.sleep(0.05)
+        started = time.monotonic()
+        cancelled.append(await queue.cancel(job["_id"]))
+        await worker
+        return cancelled, time.monotonic() - started, await queue.get(queued["_id"]), await queue.get(job["_id"])
+
+    try:
+        cancelled, elapsed, queued, job = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert cancelled == [True, False, True]
+    assert queued["status"] == job["status"] == CANCELLED
+    assert job["result"] is None
+    assert elapsed < 3
+    assert pool.stats["cancelled"] == 1
+
+# Test a cancelled job solved in a thread is reported once and keeps its thread until the budget is used up
+def test_cancel_job_thread(caplog):
+    async def run():
+        queue = JobQueue(FakeCollection(), lease=0.15)
+        job = await queue.submit(SLOW_CONSTRAINTS, SLOW_COURSES)
+        worker = asyncio.create_task(run_worker(queue, SolutionCache(), worker="test", time_limit=1, max_jobs=1))
+        while (await queue.get(job["_id"]))["status"] != RUNNING:
+            await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await queue.cancel(job["_id"])
+        await worker
+        return time.monotonic() - started, await queue.get(job["_id"])
+    elapsed, job = asyncio.run(run())
+    assert job["status"] == CANCELLED and job["result"] is None
+    assert 0.5 < elapsed < 5
+    assert len([record for record in caplog.records if "runs until its budget is used up" in record.getMessage()]) == 1
@@ -1,6 +1,7 @@
 import pytest
 from model import CreateCourse, Course, CreateConstraints, Constraints, TimetableAIModel, train_ai_model, predict_timetable, commit_timetable, get_commits, get_commit, merge_commits, branch_commit, TimetableVersion, TaskAssignment, CollaborationAction, ChatMessage, TimetableCommit, TimetableBranch
 import numpy as np
+from registry import ModelRegistry
 from datetime import datetime
 
 def test_create_course():
@@ -626,3 +627,19 @@ def test_predict_timetable_performance_metrics():
     assert mse >= 0
     assert mae >= 0
     assert rmse >= 0
+
+def test_timetable_ai_model_registry(tmp_path):
+    """
+    Test a trained model published to the registry is loaded back with the same predictions.
+    """
+    historical_data = [
+        {"features": np.array([1, 2, 3]), "label": 1},
+        {"features": np.array([4, 5, 6]), "label": 0}
+    ]
+    model = train_ai_model(historical_data)
+    registry = ModelRegistry(str(tmp_path), save=TimetableAIModel.save, load=TimetableAIModel.load)
+    version = registry.publish(model, {"samples": len(historical_data)})
+    loaded = registry.get()
+    assert registry.latest() == version
+    assert loaded is registry.get()
+    np.testing.assert_allclose(predict_timetable(loaded, [1, 2, 3]), predict_timetable(model, [1, 2, 3]))
@@ -0,0 +1,82 @@
+import multiprocessing
+import pytest
+from portfolio import solve_portfolio, default_strategies, BACKTRACKING, GENETIC, MIN_CONFLICTS
+from csp import OPTIMAL, INFEASIBLE, DOM_WDEG, MRV
+from sandbox import SolverPool, LimitExceeded
+
+CONSTRAINTS = {
+    "working_days": [
+        {"day": "Monday", "start_hr": 9, "end_hr": 17, "total_hours": 5},
+        {"day": "Tuesday", "start_hr": 9, "end_hr": 17, "total_hours": 5}
+    ],
+    "consecutive_subjects": [""],
+    "non_consecutive_subjects": ["History", "Art"]
+}
+
+COURSES = [
+    {"name": "Math", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Science", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "History", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17},
+    {"name": "Art", "lectureno": 2, "duration": 1, "start_hr": 9, "end_hr": 17}
+]
+
+# Test the default strategies mix the search kinds and fill every worker
+def test_default_strategies():
+    strategies = default_strategies(5)
+    assert len(strategies) == 5
+    assert {kind for _, kind, _, _ in strategies} == {BACKTRACKING, GENETIC, MIN_CONFLICTS}
+    assert len({name for name, _, _, _ in strategies}) == 5
+    # Backtracking also races other variable and value orderings
+    assert {(options.get("ordering"), options.get("lcv")) for _, _, _, options in strategies} == {(None, None), (DOM_WDEG, True), (MRV, False)}
+    seeded = default_strategies(10)
+    assert [options for name, _, _, options in seeded if name == "backtracking-1"] == [{}]
+
+# Test the portfolio returns the first valid timetable and stops the other workers
+def test_solve_portfolio():
+    result = solve_portfolio(CONSTRAINTS, COURSES, workers=3, time_limit=30)
+    assert result.status == OPTIMAL
+    assert not any(result.violations.values())
+    assert result.stats["strategy"] in {name for name, _, _, _ in default_strategies(3)}
+    assert not multiprocessing.active_children()
+
+# Test the portfolio accepts a timetable found by local search
+def test_solve_portfolio_min_conflicts():
+    result = solve_portfolio(CONSTRAINTS, COURSES, time_limit=30, strategies=[("local", MIN_CONFLICTS, 1, {})])
+    assert result.status == OPTIMAL
+    assert result.stats["strategy"] == "local"
+
+# Test the portfolio rejects impossible instances without starting workers
+def test_solve_portfolio_rejects_before_search():
+    constraints = dict(CONSTRAINTS, working_days=CONSTRAINTS["working_days"][:1])
+    result = solve_portfolio(constraints, COURSES, workers=2)
+    assert result.status == INFEASIBLE
+    assert result.reasons
+    assert result.stats["strategy"] is None
+
+# Test the portfolio races backtracking with another variable and value ordering
+def test_solve_portfolio_orderings():
+    result = solve_portfolio(CONSTRAINTS, COURSES, time_limit=30, strategies=[("dom/wdeg", BACKTRACKING, None, {"ordering": DOM_WDEG, "lcv": True})])
+    assert result.status == OPTIMAL
+    assert result.stats["strategy"] == "dom/wdeg"
+
+# Test the node limit bounds the backtracking strategies of the portfolio
+def test_solve_portfolio_node_limit():
+    result = solve_portfolio(CONSTRAINTS, COURSES, node_limit=1, strategies=[("bounded", BACKTRACKING, None, {})])
+    assert result.stats["strategy"] == "bounded"
+    assert result.stats["nodes"] <= 1 and result.stats["exhausted"]
+
+# Test a strategy breaking the CPU limit of its sandboxed worker fails the portfolio as a breach
+def test_solve_portfolio_cpu_limit():
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    constraints = dict(CONSTRAINTS, working_days=[{"day": day, "start_hr": 9, "end_hr": 17, "total_hours": 8} for day in days])
+    # Six early lectures cannot share five 9 o'clock slots, but the search does not prove it before the limit
+    courses = [{"name": f"Course {number}", "lectureno": 4, "duration": 1, "start_hr": 9, "end_hr": 17} for number in range(6)]
+    courses += [{"name": "Project", "lectureno": 5, "duration": 1, "start_hr": 9, "end_hr": 17}]
+    courses += [{"name": f"Early {number}", "lectureno": 3, "duration": 1, "start_hr": 9, "end_hr": 10} for number in range(2)]
+    pool = SolverPool(size=1, cpu_limit=1, preload=("portfolio",))
+    try:
+        with pytest.raises(LimitExceeded):
+            pool.submit(solve_portfolio, constraints, courses, strategies=[("spin", BACKTRACKING, None, {})]).result(timeout=30)
+    finally:
+        pool.shutdown()
+    assert pool.stats["breaches"] == 1
@@ -0,0 +1,61 @@
+import os
+import pickle
+import threading
+import pytest
+from registry import ModelRegistry
+
+LOADS = []
+
+def save(model, path):
+    with open(os.path.join(path, "model.pickle"), "wb") as file:
+        pickle.dump(model, file)
+
+def load(path):
+    LOADS.append(path)
+    with open(os.path.join(path, "model.pickle"), "rb") as file:
+        return pickle.load(file)
+
+def fail(model, path):
+    raise OSError("disk full")
+
+# Test published models get increasing versions and are loaded once, however many requests ask
+def test_model_registry(tmp_path):
+    LOADS.clear()
+    registry = ModelRegistry(str(tmp_path), save=save, load=load)
+    with pytest.raises(LookupError):
+        registry.get()
+    first = registry.publish({"weights": [1]}, {"samples": 2})
+    second = registry.publish({"weights": [2]})
+    assert (first, second) == ("000001", "000002")
+    assert registry.versions() == [first, second] and registry.latest() == second
+    assert registry.metadata(first)["samples"] == 2
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert models == [{"weights": [2]}] * 8
+    assert all(model is models[0] for model in models)
+    assert registry.get(first) == {"weights": [1]}
+    assert len(LOADS) == 2
+
+    # A new version is served from the next call on, without a restart, and loaded once as well
+    third = ModelRegistry(str(tmp_path), save=save, load=load).publish({"weights": [3]})
+    assert [registry.get(), registry.get()] == [{"weights": [3]}] * 2
+    assert LOADS[-1].endswith(third) and len(LOADS) == 3
+    assert registry.version == third
+    pinned = ModelRegistry(str(tmp_path), save=save, load=load, version=first)
+    assert pinned.get() == {"weights": [1]}
+    registry.publish({"weights": [4]})
+    assert pinned.get() == {"weights": [1]}
+
+# Test a failed save publishes nothing and leaves the latest version in place
+def test_model_registry_failed_publish(tmp_path):
+    registry = ModelRegistry(str(tmp_path), save=save, load=load)
+    version = registry.publish({"weights": [1]})
+    with pytest.raises(OSError):
+        ModelRegistry(str(tmp_path), save=fail, load=load).publish({"weights": [2]})
+    assert registry.versions() == [version] and registry.latest() == version
+    assert sorted(os.listdir(tmp_path)) == [version, "LATEST"]
@@ -0,0 +1,101 @@
+import os
+import time
+import pytest
+from sandbox import SolverPool, LimitExceeded, TaskCancelled, WorkerLost
+
+def spin():
+    while True:
+        pass
+
+def allocate(size):
+    return len(bytearray(size))
+
+def fail():
+    raise KeyError("missing")
+
+def exit_worker():
+    os._exit(3)
+
+# Test tasks run in warm workers that are replaced after max_tasks tasks
+def test_solver_pool_recycling():
+    pool = SolverPool(size=1, max_tasks=2, preload=("csp",))
+    try:
+        pids = [pool.submit(os.getpid).result(timeout=30) for _ in range(3)]
+        assert pids[0] == pids[1] != pids[2] != os.getpid()
+        with pytest.raises(KeyError):
+            pool.submit(fail).result(timeout=30)
+    finally:
+        pool.shutdown()
+    # Shutting down waits for the last worker to be replaced
+    assert pool.stats["tasks"] == 4
+    assert pool.stats["recycled"] == 2
+
+# Test limit breaches, crashes and cancellation fail their own task and replace the worker
+def test_solver_pool_isolation():
+    pool = SolverPool(size=1, cpu_limit=1, memory_limit=2 ** 30, preload=("csp",))
+    try:
+        with pytest.raises(LimitExceeded):
+            pool.submit(spin).result(timeout=30)
+        with pytest.raises(LimitExceeded):
+            pool.submit(allocate, 2 ** 31).result(timeout=30)
+        with pytest.raises(WorkerLost):
+            pool.submit(exit_worker).result(timeout=30)
+        task = pool.submit(spin)
+        while not task.running():
+            time.sleep(0.01)
+        started = time.monotonic()
+        assert task.cancel()
+        with pytest.raises(TaskCancelled):
+            task.result(timeout=30)
+        assert time.monotonic() - started < 1
+        assert pool.submit(allocate, 2 ** 20).result(timeout=30) == 2 ** 20
+    finally:
+        pool.shutdown()
+    assert pool.stats == {"tasks": 5, "recycled": 4, "breaches": 2, "cancelled": 1, "lost": 1}
+
+def count(limit):
+    for number in range(limit):
+        yield number
+
+def count_forever():
+    number = 0
+    while True:
+        yield number
+        number += 1
+
+def spin_and_yield(size):
+    while True:
+        yield bytes(size)
+
+# Test a stream breaking its CPU limit stops after whole items
+def test_solver_pool_stream_limit():
+    pool = SolverPool(size=1, cpu_limit=1, preload=("csp",))
+    try:
+        items = []
+        with pytest.raises(LimitExceeded):
+            pool.stream(items.append, spin_and_yield, 2 ** 22).result(timeout=30)
+        assert items and all(len(item) == 2 ** 22 for item in items)
+        assert pool.submit(allocate, 2 ** 20).result(timeout=30) == 2 ** 20
+    finally:
+        pool.shutdown()
+    assert pool.stats["breaches"] == 1
+
+# Test generator tasks stream their items as they run and stop when cancelled
+def test_solver_pool_stream():
+    pool = SolverPool(size=1, preload=("csp",))
+    try:
+        items = []
+        assert pool.stream(items.append, count, 3).result(timeout=30) is None
+        assert items == [0, 1, 2]
+        items = []
+        task = pool.stream(items.append, count_forever)
+        while len(items) < 10:
+            time.sleep(0.01)
+        assert task.cancel()
+        with pytest.raises(TaskCancelled):
+            task.result(timeout=30)
+        assert items[:10] == list(range(10))
+        assert pool.submit(os.getpid).result(timeout=30) != os.getpid()
+    finally:
+        pool.shutdown()
+    assert pool.stats["cancelled"] == 1